@@ -1,20 +1,25 @@
 # app.py
 import streamlit as st
 import pandas as pd
+import io
 import os
+import json
 import numpy as np
 
-# Import modules
+# Import modules (model training, SHAP, plotting and fairness load inside their stages,
+# so the page renders before xgboost/shap/matplotlib/scipy are imported)
 from profiler.stats_report import analyze_dataset
-from profiler.leakage_detector import detect_target_leakage, detect_high_correlation
-from models.trainer import evaluate_models
-from explainability.shap_engine import explain_model_with_shap
-from explainability.error_analysis import find_error_clusters
-from explainability.fairness_checker import check_fairness
+from profiler.leakage_detector import CorrelationEngine, detect_target_leakage, detect_high_correlation
+from models.serving import ModelBundle
 from recommender.fix_generator import generate_suggestions
-from visualizer.plots import plot_shap_summary, plot_confusion_matrix
 from reports.report_generator import generate_markdown_report, generate_pdf_report
-from utils.helpers import clean_column_names, safe_drop_target
+from utils.helpers import clean_column_names
+from utils.ingest import load_dataset, build_feature_matrix
+from utils.artifacts import ArtifactStore
+from utils.cache import StageCache, hash_bytes
+from utils.catalog import ColumnCatalog
+from utils.tracing import Tracer, span, use_tracer
+from utils.stage_graph import StageGraph, StageFailed
 
 # Page config
 st.set_page_config(
@@ -24,8 +29,33 @@ st.set_page_config(
 )
 st.title("🧠 ExplainML++ – Intelligent AutoML with Failure Diagnosis")
 
+@st.cache_resource
+def get_stage_cache():
+    return StageCache()
+
+stage_cache = get_stage_cache()
+
+LEAKAGE_SAMPLE_ROWS = 1_000_000  # leakage/correlation checks subsample taller tables
+
+@st.cache_resource
+def get_artifact_store():
+    return ArtifactStore()
+
+artifact_store = get_artifact_store()
+
+st.sidebar.header("⚙️ Settings")
+shap_sample_size = st.sidebar.slider("SHAP sample size", min_value=50, max_value=2000, value=200, step=50)
+shap_adaptive = st.sidebar.checkbox(
+    "Adaptive SHAP sampling", value=False,
+    help="Explain stratified batches until the feature ranking is stable (sample size becomes the cap)"
+)
+measure_fixes = st.sidebar.checkbox(
+    "Measure fix impact", value=False,
+    help="Score each suggested fix on a stratified subsample with a cheap proxy model and rank by the change"
+)
+
 st.markdown("""
-Upload a **CSV file** to automatically:
+Upload a **CSV, Parquet or Feather file** to automatically:
 - Analyze data quality
 - Train and compare models
 - Diagnose failures
@@ -34,12 +64,14 @@ Upload a **CSV file** to automatically:
 """)
 
 # File uploader
-uploaded_file = st.file_uploader("📁 Upload your dataset (CSV)", type="csv")
+uploaded_file = st.file_uploader("📁 Upload your dataset (CSV, Parquet, Feather)", type=["csv", "parquet", "feather"])
 
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
+        data_hash = hash_bytes(uploaded_file.getvalue())
+        df = load_dataset(uploaded_file)
         df = clean_column_names(df)
+        catalog = ColumnCatalog.build(df)  # per-column stats every stage reads instead of rescanning
 
         st.success(f"✅ Loaded `{uploaded_file.name}` with `{len(df)} rows` and `{len(df.columns)} columns`.")
 
@@ -61,7 +93,7 @@ if uploaded_file:
             st.stop()
 
         # === VALIDATION: Check if target is valid ===
-        if df[target_col].nunique() == len(df):
+        if catalog.exact_nunique(df, target_col) == len(df):
             st.error(f"""
             ❌ The column **`{target_col}`** has a unique value for every row — it looks like an **ID or name**, not a label.
 
@@ -71,7 +103,7 @@ if uploaded_file:
             """)
             st.stop()
 
-        if df[target_col].nunique() < 2:
+        if catalog.nunique(target_col) < 2:
             st.error("❌ Target column must have at least 2 unique values to learn from.")
             st.stop()
 
@@ -80,170 +112,322 @@ if uploaded_file:
 
         # Button to start
         if st.button("🚀 Start AutoML Analysis", type="primary"):
-            with st.spinner("🔍 Analyzing dataset and training models..."):
-                # --- 1. Profiling ---
-                try:
-                    profile = analyze_dataset(df, target_col)
-                except Exception as e:
-                    st.error(f"❌ Failed to analyze dataset: {e}")
-                    st.stop()
-
-                st.subheader("🔍 Dataset Profile")
-                st.json({
-                    "rows": profile["rows"],
-                    "columns": profile["columns"],
-                    "target": profile["target"],
-                    "task_type": profile["task_type"],
-                    "missing_percentage": {k: f"{v:.1f}%" for k, v in profile["missing_percentage"].items() if v > 0},
-                    "imbalance_ratio": round(profile["imbalance_ratio"], 2) if profile["task_type"] == "classification" else None,
-                    "class_distribution": profile["class_distribution"] if profile["task_type"] == "classification" else "N/A"
-                })
-
-                # --- 2. Prepare Features ---
-                X, y = safe_drop_target(df, target_col)
-                X_num = X.select_dtypes(include=[np.number]).fillna(0)
-
+            run_tracer = Tracer()
+            train_params = {"cv": 3}
+            shap_params = {"sample_size": shap_sample_size, "adaptive": shap_adaptive}
+
+            # A committed run of this file and target (e.g. from before a restart) stands in for
+            # training: model, OOF predictions and SHAP values load memory-mapped from disk
+            run = artifact_store.open(data_hash, target_col)
+            reused = run is not None and "model" in run and run.get("train_params") == train_params
+            if not reused:
+                run = artifact_store.begin(data_hash, target_col)
+
+            # --- Stage functions (run on worker threads; no Streamlit calls in here) ---
+            def run_profile(r):
+                return stage_cache.get_or_compute(
+                    "profile", (data_hash, target_col), lambda: analyze_dataset(df, target_col, catalog=catalog)
+                )
+
+            def run_features(r):
+                # One contiguous float32 matrix shared by every later stage
+                X_num, y = build_feature_matrix(df, target_col, catalog=catalog)
                 if X_num.empty:
-                    st.error("""
-                    ❌ No numeric features found. 
-                    
-                    💡 Add numeric columns (e.g., budget, score, age) or extend with feature engineering.
-                    """)
-                    st.stop()
-
-                # --- 3. Leakage & Correlation ---
-                try:
-                    leaks = detect_target_leakage(X_num, y, threshold=0.8)
-                    corrs = detect_high_correlation(X_num, threshold=0.9)
-
-                    if leaks:
-                        st.warning(f"⚠️ **Possible data leakage**: {leaks}")
-                    if corrs:
-                        st.warning(f"⚠️ **High correlation between features**: {corrs}")
-                except Exception as e:
-                    st.caption(f"🔍 Leakage/correlation check failed: {e}")
-
-                # --- 4. Model Training ---
-                try:
-                    results_df, best_model = evaluate_models(X_num, y, cv=3)
-                    task_type = results_df["task_type"].iloc[0]
-
-                    st.subheader("🏆 Model Performance")
-                    if task_type == "regression":
-                        results_df_display = results_df[["model", "score_mean", "score_std"]].rename(
-                            columns={"score_mean": "R² Mean", "score_std": "R² Std"}
-                        )
-                        st.dataframe(results_df_display.round(3))
-                        best_score = results_df.iloc[0]["score_mean"]
-                        st.success(f"✅ **Best Model**: `{results_df.iloc[0]['model']}` (R² = `{best_score:.3f}`)")
-                    else:
-                        results_df_display = results_df[["model", "score_mean", "score_std"]].rename(
-                            columns={"score_mean": "F1 Mean", "score_std": "F1 Std"}
-                        )
-                        st.dataframe(results_df_display.round(3))
-                        best_score = results_df.iloc[0]["score_mean"]
-                        st.success(f"✅ **Best Model**: `{results_df.iloc[0]['model']}` (F1 = `{best_score:.3f}`)")
-
-                    # Predictions for analysis
-                    y_pred = best_model.predict(X_num)
-
-                except Exception as e:
-                    st.error("❌ Model training failed.")
-                    st.exception(e)
-                    st.stop()
-
-                # --- 5. SHAP Explainability ---
-                try:
-                    shap_data = explain_model_with_shap(best_model, X_num, sample_size=min(200, len(X_num)))
-                    st.subheader("🧠 Model Explainability (SHAP)")
-                    fig = plot_shap_summary(shap_data)
-                    st.pyplot(fig)
-                    st.caption("Top features influencing predictions")
-                except Exception as e:
-                    st.warning(f"⚠️ SHAP explanation failed: {e}")
-
-                # --- 6. Error Analysis (Classification only) ---
-                if task_type == "classification" and 'shap_data' in locals():
-                    try:
-                        error_clusters = find_error_clusters(
-                            X_num, y, y_pred, shap_data["shap_values"], X_num.columns
-                        )
-                        if error_clusters:
-                            st.subheader("💥 Failure Patterns")
-                            for cluster in error_clusters[:3]:
-                                st.markdown(f"- 🔍 High errors in: `{cluster['condition']}` (size: {cluster['size']})")
-                    except Exception as e:
-                        st.caption(f"🔍 Error clustering failed: {e}")
-
-                # --- 7. Fairness Check (if binary column exists) ---
-                if task_type == "classification":
-                    sensitive_cols = [col for col in X.columns if X[col].nunique() == 2]
-                    if sensitive_cols:
-                        st.subheader("⚖️ Fairness Check")
-                        for col in sensitive_cols[:2]:
-                            try:
-                                fairness = check_fairness(y, y_pred, X[col])
-                                st.write(f"**{col}**: {fairness}")
-                            except Exception as e:
-                                st.caption(f"Fairness check failed for {col}: {e}")
-
-                # --- 8. Fix Suggestions ---
+                    raise ValueError("No numeric features found.")
+                return X_num, y
+
+            def run_leakage(r):
+                X_num, y = r["features"]
+
+                def run_leakage_checks():
+                    # Standardize once for both checks; tall tables are subsampled
+                    corr_engine = CorrelationEngine(X_num, sample_rows=LEAKAGE_SAMPLE_ROWS, catalog=catalog)
+                    leaks, error_bound = detect_target_leakage(X_num, y, threshold=0.8, engine=corr_engine,
+                                                               return_error_bound=True)
+                    corrs = detect_high_correlation(X_num, threshold=0.9, engine=corr_engine)
+                    return leaks, corrs, error_bound
+
+                return stage_cache.get_or_compute(
+                    "leakage", (data_hash, target_col, 0.8, 0.9, LEAKAGE_SAMPLE_ROWS), run_leakage_checks
+                )
+
+            def run_training(r):
+                from models.trainer import evaluate_models, load_training, save_training
+                X_num, y = r["features"]
+                if reused:
+                    with span("training", reused=True):
+                        results_df, best_model = load_training(run)
+                else:
+                    results_df, best_model = evaluate_models(X_num, y, catalog=catalog, **train_params)
+                    save_training(run, results_df, best_model)
+                    run.put("train_params", train_params)
+                # Diagnostics use the winner's out-of-fold predictions, not an in-sample pass
+                return results_df, best_model, results_df.iloc[0]["oof_pred"]
+
+            def run_shap(r):
+                from explainability.shap_engine import explain_model_with_shap, load_shap, save_shap
+                X_num, _ = r["features"]
+                results_df, best_model, _ = r["training"]
+                params = {**shap_params, "sample_size": min(shap_params["sample_size"], len(X_num))}
+                scaler = results_df.attrs.get("scaler")  # linear regressors are trained on scaled features
+                if reused and run.get("shap_params") == params:
+                    with span("shap", reused=True):
+                        return load_shap(run, best_model, scaler)
+                shap_data = stage_cache.get_or_compute(
+                    "shap", (data_hash, target_col, train_params, params),
+                    lambda: explain_model_with_shap(best_model, X_num, scaler=scaler, **params)
+                )
+                if not reused:  # a committed run is shared with other sessions; only extend our own
+                    save_shap(run, shap_data)
+                    run.put("shap_params", params)
+                return shap_data
+
+            def run_error_clusters(r):
+                from explainability.error_analysis import find_error_clusters
+                X_num, y = r["features"]
+                results_df, _, y_pred = r["training"]
+                shap_data = r.get("shap")
+                shap_values = shap_data["shap_values"] if shap_data else None
+                return stage_cache.get_or_compute(
+                    "error_clusters", (data_hash, target_col, train_params, shap_params, shap_data is not None),
+                    lambda: find_error_clusters(X_num, y, y_pred, shap_values, X_num.columns,
+                                                task_type=results_df["task_type"].iloc[0])
+                )
+
+            def run_fairness(r):
+                from explainability.fairness_checker import fairness_report, sensitive_candidates
+                _, y = r["features"]
+                results_df, _, y_pred = r["training"]
+                if results_df["task_type"].iloc[0] != "classification":
+                    return None
+                sensitive_cols = sensitive_candidates(df, exclude=(target_col,), catalog=catalog)
+                if not sensitive_cols:
+                    return None
+                y_score = None
+                oof_proba = results_df.iloc[0]["oof_proba"]
+                if oof_proba is not None and oof_proba.shape[1] == 2:
+                    y_score = oof_proba[:, 1]
+                # Rows without a target are not in y (see build_feature_matrix)
+                return fairness_report(y, y_pred, df.loc[y.index, sensitive_cols], y_score=y_score)
+
+            def run_suggestions(r):
+                profile = r["profile"]
+                results_df = r["training"][0]
+                leaks, corrs, _ = r.get("leakage", ([], [], 0.0))
                 issues = {
                     "imbalance_ratio": profile.get("imbalance_ratio"),
                     "missing_percentage": profile["missing_percentage"],
                     "numeric_skew": profile["numeric_skew"],
-                    "target_leakage": leaks if 'leaks' in locals() else [],
-                    "high_correlation": corrs if 'corrs' in locals() else [],
-                    "error_clusters": error_clusters if 'error_clusters' in locals() else []
+                    "target_leakage": leaks,
+                    "high_correlation": corrs,
+                    "error_clusters": r.get("error_clusters") or []
                 }
-
                 diag_data = {
                     "dataset": uploaded_file.name,
                     "target": target_col,
                     "best_model": results_df.iloc[0]["model"],
-                    "f1_score": best_score,
+                    "f1_score": results_df.iloc[0]["score_mean"],
+                    "metric": "R²" if results_df["task_type"].iloc[0] == "regression" else "F1",
                     "issues": issues
                 }
+                diag_data["suggestions"] = generate_suggestions(diag_data)
+                return diag_data
+
+            def run_fix_impact(r):
+                from recommender.what_if import evaluate_fixes
+                suggestions = r["suggestions"]["suggestions"]
+                if not measure_fixes or not suggestions:
+                    return None
+                return evaluate_fixes(df, target_col, suggestions, model=r["training"][1], time_budget=60.0)
+
+            def run_reports(r):
+                os.makedirs("reports", exist_ok=True)
+                generate_markdown_report(r["suggestions"], "reports/diagnostic_report.md", run=None if reused else run)
+                generate_pdf_report(r["suggestions"], "reports/diagnostic_report.pdf")
+                return "reports/diagnostic_report.md", "reports/diagnostic_report.pdf"
+
+            # Stages that start a process pool take turns: each pool sizes itself to every core
+            graph = (
+                StageGraph(max_workers=4)
+                .add("profile", run_profile)
+                .add("features", run_features)
+                .add("leakage", run_leakage, requires=("features",))
+                .add("training", run_training, requires=("features",), exclusive=True)
+                .add("shap", run_shap, requires=("features", "training"), exclusive=True)
+                .add("error_clusters", run_error_clusters, requires=("features", "training"), after=("shap",))
+                .add("fairness", run_fairness, requires=("features", "training"))
+                .add("suggestions", run_suggestions, requires=("profile", "training"),
+                     after=("leakage", "error_clusters"))
+                .add("fix_impact", run_fix_impact, requires=("training", "suggestions"), exclusive=True)
+                .add("reports", run_reports, requires=("suggestions",))
+            )
+
+            # --- Renderers (script thread), one per stage, into sections laid out up front ---
+            def show_profile(profile):
+                st.subheader("🔍 Dataset Profile")
+                st.json({
+                    "rows": profile["rows"],
+                    "columns": profile["columns"],
+                    "target": profile["target"],
+                    "task_type": profile["task_type"],
+                    "missing_percentage": {k: f"{v:.1f}%" for k, v in profile["missing_percentage"].items() if v > 0},
+                    "imbalance_ratio": round(profile["imbalance_ratio"], 2) if profile["task_type"] == "classification" else None,
+                    "class_distribution": profile["class_distribution"] if profile["task_type"] == "classification" else "N/A"
+                })
 
-                suggestions = generate_suggestions(diag_data)
-                diag_data["suggestions"] = suggestions
+            def show_leakage(result):
+                leaks, corrs, error_bound = result
+                if leaks:
+                    st.warning(f"⚠️ **Possible data leakage**: {leaks}")
+                if corrs:
+                    st.warning(f"⚠️ **High correlation between features**: {corrs}")
+                if error_bound:
+                    st.caption(f"Correlations from a {LEAKAGE_SAMPLE_ROWS:,}-row sample: ±{error_bound:.3f} (95%)")
+
+            def show_training(result):
+                results_df, _, _ = result
+                metric = "R²" if results_df["task_type"].iloc[0] == "regression" else "F1"
+                st.subheader("🏆 Model Performance")
+                results_df_display = results_df[["model", "score_mean", "score_std"]].rename(
+                    columns={"score_mean": f"{metric} Mean", "score_std": f"{metric} Std"}
+                )
+                st.dataframe(results_df_display.round(3))
+                best_score = results_df.iloc[0]["score_mean"]
+                st.success(f"✅ **Best Model**: `{results_df.iloc[0]['model']}` ({metric} = `{best_score:.3f}`)")
+
+                X_num, _ = completed["features"]
+                bundle_buffer = io.BytesIO()
+                ModelBundle.from_results(results_df, X_num).save(bundle_buffer)
+                st.download_button(
+                    "💾 Download Model Bundle",
+                    data=bundle_buffer.getvalue(),
+                    file_name="explainml_model.joblib",
+                    help="Serve it with: python -m models.serving explainml_model.joblib"
+                )
+
+            def show_shap(shap_data):
+                from visualizer.plots import plot_shap_summary
+                st.subheader("🧠 Model Explainability (SHAP)")
+                st.pyplot(plot_shap_summary(shap_data))
+                st.caption("Top features influencing predictions")
+                convergence = shap_data.get("convergence")
+                if convergence:
+                    st.caption(
+                        f"Adaptive sampling: {convergence['rows']} rows in {convergence['batches']} batches "
+                        f"({convergence['stop_reason'].replace('_', ' ')}, {convergence['seconds']:.1f}s)"
+                    )
+                    st.dataframe(convergence["importance"].head(10).round(4))
+
+            def show_error_clusters(error_clusters):
+                if error_clusters:
+                    st.subheader("💥 Failure Patterns")
+                    for cluster in error_clusters[:3]:
+                        st.markdown(
+                            f"- 🔍 High errors in: `{cluster['condition']}` "
+                            f"(size: {cluster['size']}, error rate: {cluster['error_rate']:.0%})"
+                        )
 
-                if suggestions:
+            def show_fairness(fairness):
+                if fairness is None:
+                    return
+                st.subheader("⚖️ Fairness Check")
+                if fairness.empty:
+                    st.caption("All groups are below the minimum size for a fairness report.")
+                else:
+                    st.dataframe(fairness.round(3))
+
+            def show_suggestions(diag_data):
+                if diag_data["suggestions"]:
                     st.subheader("🛠️ Suggested Improvements")
                     priority_icons = {"critical": "🔴", "high": "🟠", "medium": "🟡", "low": "🟢"}
-                    for s in suggestions:
+                    for s in diag_data["suggestions"]:
                         p = s["priority"].lower()
                         icon = priority_icons.get(p, "⚪")
                         st.markdown(f"{icon} **{p.upper()}**: {s['suggestion']}")
 
-                # --- 9. Generate Reports ---
+            def show_fix_impact(impact):
+                if impact is None:
+                    return
+                metric = "R²" if impact.attrs["metric"] == "r2" else "F1"
+                st.subheader("🧪 Measured Fix Impact")
+                st.caption(f"{metric} change per fix on {impact.attrs['rows']} rows "
+                           f"({impact.attrs['seconds']:.1f}s); leakage fixes first regardless of score")
+                st.dataframe(impact[["suggestion", "score_change", "ci_low", "ci_high", "folds", "status"]].round(4))
+
+            def show_reports(paths):
+                md_path, pdf_path = paths
                 st.subheader("📄 Auto-Generated Reports")
-
-                os.makedirs("reports", exist_ok=True)
-                try:
-                    generate_markdown_report(diag_data, "reports/diagnostic_report.md")
-                    generate_pdf_report(diag_data, "reports/diagnostic_report.pdf")
-
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        with open("reports/diagnostic_report.md", "r", encoding="utf-8") as f:
-                            st.download_button(
-                                "⬇️ Download Markdown Report",
-                                f.read(),
-                                "diagnostic_report.md",
-                                "text/markdown"
-                            )
-                    with col2:
-                        with open("reports/diagnostic_report.pdf", "rb") as f:
-                            st.download_button(
-                                "📄 Download PDF Report",
-                                f.read(),
-                                "diagnostic_report.pdf",
-                                "application/pdf"
-                            )
-                except Exception as e:
-                    st.error(f"📄 Report generation failed: {e}")
+                col1, col2 = st.columns(2)
+                with col1:
+                    with open(md_path, "r", encoding="utf-8") as f:
+                        st.download_button("⬇️ Download Markdown Report", f.read(), "diagnostic_report.md", "text/markdown")
+                with col2:
+                    with open(pdf_path, "rb") as f:
+                        st.download_button("📄 Download PDF Report", f.read(), "diagnostic_report.pdf", "application/pdf")
+
+            renderers = {
+                "profile": (show_profile, lambda e: st.error(f"❌ Failed to analyze dataset: {e}")),
+                "features": (None, lambda e: st.error(
+                    f"❌ {e} \n\n"
+                    "💡 Add numeric columns (e.g., budget, score, age) or extend with feature engineering."
+                )),
+                "leakage": (show_leakage, lambda e: st.caption(f"🔍 Leakage/correlation check failed: {e}")),
+                "training": (show_training, lambda e: (st.error("❌ Model training failed."), st.exception(e))),
+                "shap": (show_shap, lambda e: st.warning(f"⚠️ SHAP explanation failed: {e}")),
+                "error_clusters": (show_error_clusters, lambda e: st.caption(f"🔍 Error clustering failed: {e}")),
+                "fairness": (show_fairness, lambda e: st.caption(f"Fairness check failed: {e}")),
+                "suggestions": (show_suggestions, lambda e: st.caption(f"Suggestions unavailable: {e}")),
+                "fix_impact": (show_fix_impact, lambda e: st.caption(f"Fix impact evaluation failed: {e}")),
+                "reports": (show_reports, lambda e: st.error(f"📄 Report generation failed: {e}")),
+            }
+            sections = {name: st.container() for name in renderers}
+            waiting = {name: sections[name].empty() for name in renderers if renderers[name][0] is not None}
+            for name, placeholder in waiting.items():
+                placeholder.caption(f"⏳ {name.replace('_', ' ')}…")
+
+            completed = {}
+            with use_tracer(run_tracer), st.status("🔍 Analyzing dataset and training models...") as status:
+                for name, result, error in graph.run():
+                    if name in waiting:
+                        waiting[name].empty()
+                    show, show_error = renderers[name]
+                    with sections[name]:
+                        if error is None:
+                            completed[name] = result
+                            if show is not None:
+                                show(result)
+                        elif not isinstance(error, StageFailed):
+                            show_error(error)
+                    status.write(f"{'✅' if error is None else '⚠️'} {name.replace('_', ' ')}")
+                status.update(label="✅ Analysis complete", state="complete")
+
+            # Later sessions (and restarts) reuse this run once it holds a trained model
+            if not reused and "training" in completed:
+                artifact_store.commit(run)
+
+            # --- Performance breakdown for this run ---
+            with st.expander("⏱️ Performance", expanded=False):
+                perf = pd.DataFrame(run_tracer.summary(max_depth=0))
+                if not perf.empty:
+                    perf_cols = [c for c in ["span", "duration_s", "rows", "cols", "peak_rss_mb", "rss_growth_mb", "cached", "reused"]
+                                 if c in perf.columns]
+                    st.dataframe(perf[perf_cols])
+                    st.bar_chart(perf.groupby("span", sort=False)["duration_s"].sum())
+                st.download_button(
+                    "⬇️ Download Chrome Trace",
+                    json.dumps(run_tracer.to_chrome_trace(), default=str),
+                    "explainml_trace.json",
+                    "application/json"
+                )
+
+            # --- Stage cache statistics ---
+            cache_stats = stage_cache.stats()
+            with st.sidebar.expander("🗄️ Stage Cache", expanded=True):
+                st.metric("Hits", cache_stats["hits"])
+                st.metric("Misses", cache_stats["misses"])
+                st.caption(f"Size on disk: {cache_stats['size_mb']} MB")
+                st.json(cache_stats["by_stage"])
 
     except Exception as e:
-        st.error("❌ Failed to process file. Please upload a valid CSV.")
+        st.error("❌ Failed to process file. Please upload a valid CSV, Parquet or Feather file.")
         st.exception(e)
\ No newline at end of file
@@ -0,0 +1,301 @@
+# benchmark/bench.py
+"""
+End-to-end stage benchmarks.
+
+    python -m benchmark.bench run --preset default --output bench.json
+    python -m benchmark.bench compare bench.json baseline.json --tolerance 0.2
+    python -m benchmark.bench startup --budget-ms 1500
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from importlib import metadata
+
+import numpy as np
+
+from benchmark.synthetic import make_dataset
+from utils.tracing import RSSSampler
+
+PRESETS = {
+    "smoke": {"rows": [1_000], "cols": [10]},
+    "default": {"rows": [1_000, 100_000], "cols": [10, 100]},
+    "full": {"rows": [1_000, 100_000, 1_000_000, 10_000_000], "cols": [10, 100, 1_000, 10_000]},
+}
+# Scenarios whose dense float32 feature matrix exceeds this are skipped (10M x 10k would be ~400 GB)
+MAX_MATRIX_GB = 8.0
+
+STAGES = (
+    "analyze_dataset", "detect_target_leakage", "detect_high_correlation",
+    "evaluate_models", "explain_model_with_shap", "find_error_clusters", "check_fairness",
+)
+
+METRICS = ("wall_s", "peak_rss_mb", "alloc_peak_mb")
+
+# Entry points timed by `startup`, and modules none of them may import up front
+STARTUP_MODULES = ("explainml", "profiler.stats_report", "models.serving")
+LAZY_MODULES = ("xgboost", "shap", "matplotlib", "scipy.stats", "sklearn.ensemble", "sklearn.cluster")
+
+_STARTUP_PROBE = """
+import importlib, json, sys, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "loaded": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def measure(func, trace_allocations=False):
+    """
+    Run func(n_workers=None) and return (result, metrics); peak RSS includes the
+    stage's pool workers. With trace_allocations, a second run with n_workers=1 keeps
+    the work in-process, where tracemalloc can see its allocations.
+    """
+    with RSSSampler(include_children=True) as sampler:
+        start = time.perf_counter()
+        result = func(None)
+        wall = time.perf_counter() - start
+
+    metrics = {
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(sampler.peak / 2**20, 1) if sampler.peak else None,
+        "alloc_peak_mb": None,
+    }
+    if trace_allocations:
+        tracemalloc.start()
+        try:
+            func(1)
+            metrics["alloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        finally:
+            tracemalloc.stop()
+    return result, metrics
+
+
+def run_scenario(scenario, trace_allocations=False, shap_sample_size=200):
+    """Run every pipeline stage on one synthetic dataset, feeding outputs forward like app.py."""
+    from profiler.stats_report import analyze_dataset
+    from profiler.leakage_detector import detect_target_leakage, detect_high_correlation
+    from models.trainer import evaluate_models
+    from explainability.shap_engine import explain_model_with_shap
+    from explainability.error_analysis import find_error_clusters
+    from explainability.fairness_checker import check_fairness
+    from utils.helpers import safe_drop_target
+
+    df = make_dataset(**scenario)
+    X, y = safe_drop_target(df, "target")
+    X_num = X.select_dtypes(include=[np.number]).fillna(0)
+    sensitive = (X_num.iloc[:, 0] > 0).astype(int)
+
+    state = {}
+    # Each stage takes n_workers (None = default pool, 1 = in-process for allocation tracing)
+    stages = {
+        "analyze_dataset": lambda n_workers: analyze_dataset(df, "target"),
+        "detect_target_leakage": lambda n_workers: detect_target_leakage(X_num, y),
+        "detect_high_correlation": lambda n_workers: detect_high_correlation(X_num),
+        "evaluate_models": lambda n_workers: evaluate_models(X_num, y, cv=3, n_workers=n_workers),
+        "explain_model_with_shap": lambda n_workers: explain_model_with_shap(
+            state["best_model"], X_num, sample_size=shap_sample_size, n_workers=n_workers, scaler=state["scaler"]),
+        "find_error_clusters": lambda n_workers: find_error_clusters(
+            X_num, y, state["y_pred"], state["shap_data"]["shap_values"], X_num.columns),
+        "check_fairness": lambda n_workers: check_fairness(y, state["y_pred"], sensitive),
+    }
+
+    records = []
+    for stage in STAGES:
+        record = {"scenario": scenario, "stage": stage, "error": None}
+        try:
+            result, metrics = measure(stages[stage], trace_allocations)
+            record.update(metrics)
+            if stage == "evaluate_models":
+                state["best_model"] = result[1]
+                state["scaler"] = result[0].attrs.get("scaler")
+                X_model = X_num.to_numpy() if state["scaler"] is None else state["scaler"].transform(X_num.to_numpy())
+                state["y_pred"] = result[1].predict(X_model)
+            elif stage == "explain_model_with_shap":
+                state["shap_data"] = result
+        except Exception as e:
+            record.update({m: None for m in METRICS})
+            record["error"] = f"{type(e).__name__}: {e}"
+        print(f"⏱️ {_scenario_label(scenario)} {stage}: {record.get('wall_s')}s {record['error'] or ''}")
+        records.append(record)
+    return records
+
+
+def _scenario_label(scenario):
+    return "x".join(str(scenario[k]) for k in ("rows", "cols")) + (
+        f" imb={scenario['imbalance']} miss={scenario['missing_rate']} cat={scenario['n_categorical']}"
+        f"/{scenario['cardinality']}"
+    )
+
+
+def _library_versions():
+    versions = {}
+    for lib in ("pandas", "numpy", "scikit-learn", "xgboost", "shap", "scipy"):
+        try:
+            versions[lib] = metadata.version(lib)
+        except metadata.PackageNotFoundError:
+            versions[lib] = None
+    return versions
+
+
+def run(args):
+    grid = dict(PRESETS[args.preset])
+    if args.rows:
+        grid["rows"] = args.rows
+    if args.cols:
+        grid["cols"] = args.cols
+
+    results = []
+    for rows, cols, imbalance, missing, n_cat, card in itertools.product(
+        grid["rows"], grid["cols"], args.imbalance, args.missing, args.categorical, args.cardinality
+    ):
+        scenario = {
+            "rows": rows, "cols": cols, "task": args.task, "imbalance": imbalance,
+            "missing_rate": missing, "n_categorical": min(n_cat, cols - 1), "cardinality": card,
+            "seed": args.seed,
+        }
+        matrix_gb = rows * cols * 4 / 2**30
+        if matrix_gb > args.max_matrix_gb:
+            print(f"⚠️ Skipping {_scenario_label(scenario)}: ~{matrix_gb:.0f} GB feature matrix "
+                  f"(--max-matrix-gb {args.max_matrix_gb:g})")
+            continue
+        results.extend(run_scenario(scenario, args.alloc, args.shap_sample_size))
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "libraries": _library_versions(),
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Benchmark results saved: {args.output}")
+    return 0
+
+
+def measure_import(module, repeats=5):
+    """Median import time of `module` in fresh interpreters, plus any LAZY_MODULES it pulled in."""
+    times, loaded = [], set()
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, "-c", _STARTUP_PROBE, module, *LAZY_MODULES],
+            capture_output=True, text=True, check=True,
+        )
+        probe = json.loads(out.stdout.strip().splitlines()[-1])
+        times.append(probe["seconds"])
+        loaded.update(probe["loaded"])
+    return float(np.median(times)), sorted(loaded)
+
+
+def startup(args):
+    failed = False
+    for module in args.modules:
+        try:
+            seconds, loaded = measure_import(module, args.repeats)
+        except subprocess.CalledProcessError as e:
+            print(f"❌ import {module} failed: {e.stderr.strip().splitlines()[-1] if e.stderr else e}")
+            failed = True
+            continue
+        ms = seconds * 1000
+        over = ms > args.budget_ms
+        failed |= over or bool(loaded)
+        print(f"{'❌' if over else '✅'} import {module}: {ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+        if loaded:
+            print(f"❌ import {module} eagerly loads: {', '.join(loaded)}")
+    return 1 if failed else 0
+
+
+def _key(record):
+    return json.dumps(record["scenario"], sort_keys=True), record["stage"]
+
+
+def compare_results(current, baseline, tolerance=0.2, min_wall_s=0.05):
+    """Return a list of regressions: metrics more than `tolerance` above the baseline."""
+    base = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for record in current["results"]:
+        ref = base.get(_key(record))
+        if ref is None:
+            continue
+        if record["error"] and not ref["error"]:
+            regressions.append({"stage": record["stage"], "scenario": record["scenario"],
+                                "metric": "error", "baseline": None, "current": record["error"]})
+            continue
+        for metric in METRICS:
+            now, before = record.get(metric), ref.get(metric)
+            if now is None or before is None:
+                continue
+            if metric == "wall_s" and max(now, before) < min_wall_s:
+                continue  # too short to time reliably
+            if now > before * (1 + tolerance):
+                regressions.append({"stage": record["stage"], "scenario": record["scenario"],
+                                    "metric": metric, "baseline": before, "current": now})
+    return regressions
+
+
+def compare(args):
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    regressions = compare_results(current, baseline, args.tolerance, args.min_wall)
+    if not regressions:
+        print("✅ No regressions against baseline.")
+        return 0
+    for r in regressions:
+        print(f"❌ {_scenario_label(r['scenario'])} {r['stage']} {r['metric']}: "
+              f"{r['baseline']} -> {r['current']}")
+    return 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ExplainML++ stage benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Run the benchmark grid and save results to JSON")
+    p_run.add_argument("--preset", choices=sorted(PRESETS), default="smoke")
+    p_run.add_argument("--rows", type=int, nargs="+", help="Override preset row counts")
+    p_run.add_argument("--cols", type=int, nargs="+", help="Override preset column counts")
+    p_run.add_argument("--task", choices=["classification", "regression"], default="classification")
+    p_run.add_argument("--imbalance", type=float, nargs="+", default=[1.0])
+    p_run.add_argument("--missing", type=float, nargs="+", default=[0.0])
+    p_run.add_argument("--categorical", type=int, nargs="+", default=[0])
+    p_run.add_argument("--cardinality", type=int, nargs="+", default=[10])
+    p_run.add_argument("--seed", type=int, default=42)
+    p_run.add_argument("--shap-sample-size", type=int, default=200)
+    p_run.add_argument("--alloc", action="store_true",
+                       help="Add a second, in-process (n_workers=1) run per stage that traces allocations")
+    p_run.add_argument("--max-matrix-gb", type=float, default=MAX_MATRIX_GB,
+                       help="Skip scenarios whose float32 feature matrix is larger than this")
+    p_run.add_argument("--output", default="benchmark/results.json")
+
+    p_cmp = sub.add_parser("compare", help="Flag regressions against a stored baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    p_cmp.add_argument("--min-wall", type=float, default=0.05, help="Ignore timings below this (s)")
+
+    p_start = sub.add_parser("startup", help="Fail if importing the entry points exceeds a time budget")
+    p_start.add_argument("--modules", nargs="+", default=list(STARTUP_MODULES))
+    p_start.add_argument("--budget-ms", type=float, default=1500, help="Max median import time per module")
+    p_start.add_argument("--repeats", type=int, default=5, help="Fresh interpreters per module")
+
+    args = parser.parse_args(argv)
+    commands = {"run": run, "compare": compare, "startup": startup}
+    return commands[args.command](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
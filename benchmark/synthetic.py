@@ -0,0 +1,41 @@
+# benchmark/synthetic.py
+import numpy as np
+import pandas as pd
+
+
+def make_dataset(rows=1000, cols=10, task="classification", n_classes=2, imbalance=1.0,
+                 missing_rate=0.0, n_categorical=0, cardinality=10, seed=42):
+    """
+    Seeded synthetic table for benchmarks.
+    - cols: total feature columns (numeric + categorical)
+    - imbalance: majority / minority class ratio (classification)
+    - missing_rate: fraction of feature cells set to NaN
+    - n_categorical / cardinality: string columns and their distinct values
+    The target column is called "target" and depends on the first few numeric features.
+    """
+    rng = np.random.default_rng(seed)
+    n_numeric = max(1, cols - n_categorical)
+
+    X = rng.standard_normal((rows, n_numeric), dtype=np.float32)
+    df = pd.DataFrame(X, columns=[f"num_{i}" for i in range(n_numeric)])
+
+    for i in range(n_categorical):
+        codes = rng.integers(0, cardinality, size=rows)
+        df[f"cat_{i}"] = pd.Categorical.from_codes(codes, [f"v{j}" for j in range(cardinality)]).astype(str)
+
+    signal = X[:, :min(5, n_numeric)].sum(axis=1) + 0.5 * rng.standard_normal(rows, dtype=np.float32)
+    if task == "classification":
+        # Class boundaries at quantiles so the smallest class is 1/imbalance of the largest
+        weights = np.array([imbalance] + [1.0] * (n_classes - 1))
+        cuts = np.quantile(signal, np.cumsum(weights / weights.sum())[:-1])
+        df["target"] = np.searchsorted(cuts, signal)
+    else:
+        df["target"] = signal.astype(np.float64)
+
+    if missing_rate > 0:
+        mask = rng.random((rows, n_numeric)) < missing_rate
+        values = df.iloc[:, :n_numeric].to_numpy()
+        values[mask] = np.nan
+        df.iloc[:, :n_numeric] = values
+
+    return df
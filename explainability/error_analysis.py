@@ -1,43 +1,235 @@
 # explainability/error_analysis.py
+import heapq
+
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from utils.helpers import detect_task_type
+from utils.tracing import traced
+
+def _pack(mask, n_words):
+    """Bit-pack a boolean row mask into uint64 words (zero-padded)."""
+    packed = np.zeros(n_words * 8, dtype=np.uint8)
+    bits = np.packbits(mask)
+    packed[:len(bits)] = bits
+    return packed.view(np.uint64)
+
+
+def _bin_column(values: pd.Series, name, n_bins):
+    """Compact integer codes for one feature plus a readable predicate per code."""
+    if not pd.api.types.is_numeric_dtype(values) or isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = pd.factorize(values)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        top = np.argsort(counts)[::-1][:n_bins - 1]
+        remap = np.full(len(uniques) + 1, len(top), dtype=np.int64)
+        remap[top] = np.arange(len(top))
+        labels = [f"{name} = '{uniques[i]}'" for i in top]
+        if len(uniques) > len(top) or (codes < 0).any():
+            labels.append(f"{name} is other")
+        return remap[codes].astype(np.uint8), labels
+
+    arr = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    nan_mask = np.isnan(arr)
+    finite = arr[~nan_mask]
+    sample = finite if len(finite) <= 100_000 else np.random.default_rng(42).choice(finite, 100_000, replace=False)
+    uniques = np.unique(sample)
+    if len(uniques) <= n_bins:
+        # Values the sample missed get their own "other" code rather than a neighbour's
+        codes = np.searchsorted(uniques, arr)
+        matched = uniques[np.minimum(codes, len(uniques) - 1)] == arr if len(uniques) else np.zeros(len(arr), bool)
+        labels = [f"{name} = {u:g}" for u in uniques]
+        other = ~matched & ~nan_mask
+        if other.any():
+            codes[other] = len(labels)
+            labels.append(f"{name} is other")
+    else:
+        edges = np.unique(np.quantile(sample, np.linspace(0, 1, n_bins + 1)[1:-1]))
+        codes = np.searchsorted(edges, arr, side="right")
+        labels = [f"{name} < {edges[0]:.3g}"]
+        labels += [f"{lo:.3g} <= {name} < {hi:.3g}" for lo, hi in zip(edges[:-1], edges[1:])]
+        labels.append(f"{name} >= {edges[-1]:.3g}")
+    if nan_mask.any():
+        codes[nan_mask] = len(labels)
+        labels.append(f"{name} is missing")
+    return codes.astype(np.uint8), labels
+
+
+def _feature_ranking(shap_values, n_features):
+    """Mean |SHAP| per feature (any Explanation/array shape), or None."""
+    if shap_values is None:
+        return None
+    values = np.abs(np.asarray(getattr(shap_values, "values", shap_values), dtype=np.float64))
+    if values.ndim < 2 or values.shape[1] != n_features:
+        return None
+    return values.reshape(values.shape[0], n_features, -1).mean(axis=(0, 2))
+
+
+class SliceFinder:
+    """
+    Finds feature-value conjunctions (1-3 predicates) where the model errs most.
+    Features are binned once into uint8 codes and every (feature, bin) item keeps a
+    bit-packed row index. A slice's rows are the AND of its items' bitmaps; support
+    and error counts of all its one-predicate refinements then come from a single
+    weighted bincount over the codes of just those rows. Search is best-first on the
+    SliceLine score, pruned by minimum support (support only shrinks as predicates
+    are added) and by an upper bound on any refinement's score.
+    `magnitude` (e.g. |residual|) is averaged over each reported slice.
+    """
+
+    def __init__(self, X: pd.DataFrame, errors, n_bins=8, alpha=0.95, magnitude=None):
+        self.n = len(X)
+        self.alpha = alpha
+        self.magnitude = magnitude
+        self.errors = np.asarray(errors, dtype=bool)
+        self.n_words = (self.n + 63) // 64
+        self.total_errors = int(self.errors.sum())
+        self.base_rate = self.total_errors / max(self.n, 1)
+
+        self.item_feature, self.item_column, self.item_label = [], [], []
+        bitmaps, codes_per_feature, offsets = [], [], []
+        self.feature_names = list(X.columns)
+        for f, col in enumerate(self.feature_names):
+            codes, labels = _bin_column(X[col], col, n_bins)
+            if len(labels) < 2:
+                continue
+            offsets.append(len(self.item_label))
+            codes_per_feature.append(codes)
+            for b, label in enumerate(labels):
+                bitmaps.append(_pack(codes == b, self.n_words))
+                self.item_feature.append(f)
+                self.item_column.append(len(codes_per_feature) - 1)
+                self.item_label.append(label)
+        self.item_feature = np.array(self.item_feature, dtype=np.int64)
+        self.bitmaps = np.array(bitmaps, dtype=np.uint64).reshape(len(bitmaps), self.n_words)
+        # Row-major uint8 codes (one row per data row) plus each feature's first item id
+        self.codes = np.ascontiguousarray(np.array(codes_per_feature, dtype=np.uint8).reshape(-1, self.n).T)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.error_rows = np.flatnonzero(self.errors)
+
+    def _score(self, size, errors):
+        size = np.maximum(size, 1)
+        err_ratio = (errors / size) / max(self.base_rate, 1e-12)
+        return self.alpha * (err_ratio - 1) - (1 - self.alpha) * (self.n / size - 1)
+
+    def _upper_bound(self, size, n_err, min_support):
+        """
+        Best score any refinement could reach: children have min_support <= s <= size
+        and at most min(n_err, s) errors; the score is monotone in 1/s, so check the ends.
+        """
+        sizes = np.array([min_support, min(max(n_err, min_support), size), size], dtype=np.float64)
+        return float(self._score(sizes, np.minimum(n_err, sizes)).max())
+
+    def _rows(self, items):
+        """Row indices of the conjunction of `items` (AND of their bitmaps)."""
+        words = np.bitwise_and.reduce(self.bitmaps[list(items)], axis=0)
+        return np.flatnonzero(np.unpackbits(words.view(np.uint8))[:self.n])
+
+    def _item_counts(self, rows, first_column):
+        codes = self.codes[:, first_column:] if rows is None else self.codes[rows, first_column:]
+        return np.bincount((codes + self.offsets[first_column:]).ravel(), minlength=len(self.item_label))
 
-def find_error_clusters(X_test, y_test, y_pred, shap_values, feature_names, n_clusters=3):
-    """Find clusters of misclassified samples."""
+    def _counts(self, rows=None, first_column=0):
+        """
+        Support and error counts of `slice AND item` for every item at once
+        (items of code columns before `first_column` are left at zero).
+        """
+        err_rows = self.error_rows if rows is None else rows[self.errors[rows]]
+        return self._item_counts(rows, first_column), self._item_counts(err_rows, first_column)
+
+    def search(self, top_k=3, max_depth=3, min_support=None, max_expansions=200):
+        if self.total_errors == 0 or len(self.item_feature) == 0:
+            return []
+        min_support = min_support or max(10, int(0.01 * self.n))
+
+        all_items = np.arange(len(self.item_feature))
+        sizes, errors = self._counts()
+        scores = self._score(sizes, errors)
+
+        heap, found = [], []
+        for i in np.flatnonzero(sizes >= min_support):
+            heapq.heappush(heap, (-scores[i], (int(i),), int(sizes[i]), int(errors[i])))
+
+        expansions = 0
+        while heap and expansions < max_expansions:
+            neg_score, items, size, n_err = heapq.heappop(heap)
+            expansions += 1
+            if -neg_score > 0:
+                found.append((-neg_score, items, size, n_err))
+            if len(items) >= max_depth:
+                continue
+            # Prune when no refinement can beat the current top-k
+            kth_best = sorted((s[0] for s in found), reverse=True)[top_k - 1] if len(found) >= top_k else 0.0
+            if self._upper_bound(size, n_err, min_support) <= max(kth_best, 0.0):
+                continue
+
+            # Only extend with higher item ids so each conjunction is generated once
+            used = self.item_feature[list(items)]
+            candidates = all_items[(all_items > max(items)) & ~np.isin(self.item_feature, used)]
+            if len(candidates) == 0:
+                continue
+            c_sizes, c_errors = self._counts(self._rows(items), self.item_column[max(items)] + 1)
+            c_sizes, c_errors = c_sizes[candidates], c_errors[candidates]
+            c_scores = self._score(c_sizes, c_errors)
+            for j in np.flatnonzero(c_sizes >= min_support):
+                child = items + (int(candidates[j]),)
+                heapq.heappush(heap, (-c_scores[j], child, int(c_sizes[j]), int(c_errors[j])))
+
+        return self._top_slices(found, top_k)
+
+    def _top_slices(self, found, top_k):
+        """Best-scoring slices, skipping ones that only refine an already chosen slice."""
+        slices, chosen = [], []
+        for score, items, size, n_err in sorted(found, key=lambda s: -s[0]):
+            if any(set(prev) <= set(items) for prev in chosen):
+                continue
+            chosen.append(items)
+            slice_info = {
+                "condition": " AND ".join(self.item_label[i] for i in items),
+                "size": size,
+                "features": [self.feature_names[self.item_feature[i]] for i in items],
+                "error_rate": round(n_err / size, 4),
+                "score": round(float(score), 4),
+            }
+            if self.magnitude is not None:
+                slice_info["mean_abs_residual"] = round(float(self.magnitude[self._rows(items)].mean()), 4)
+            slices.append(slice_info)
+            if len(slices) >= top_k:
+                break
+        return slices
+
+
+@traced()
+def find_error_clusters(X_test, y_test, y_pred, shap_values=None, feature_names=None, n_clusters=3,
+                        task_type=None, max_features=50, n_bins=8, min_support=None, error_quantile=0.8):
+    """
+    Find data slices where the model fails most (classification mismatches, or the
+    largest residuals for regression). Returns up to `n_clusters` slices shaped
+    {"condition", "size", "features"} for recommender.fix_generator.
+    With SHAP values, the search is limited to the `max_features` most important features.
+    """
     if len(y_test) != len(y_pred):
         return []
-    
-    # Get misclassified indices
-    errors_mask = (y_test != y_pred)
-    if not errors_mask.any():
-        return []
-    
-    X_err = X_test[errors_mask]
-    if len(X_err) < n_clusters:
+
+    X = X_test if isinstance(X_test, pd.DataFrame) else pd.DataFrame(X_test, columns=feature_names)
+    y_true = np.asarray(y_test)
+    y_hat = np.asarray(y_pred)
+    task_type = task_type or detect_task_type(pd.Series(y_true))
+
+    residual = None
+    if task_type == "regression":
+        residual = np.abs(y_true.astype(np.float64) - y_hat.astype(np.float64))
+        errors = residual > np.quantile(residual, error_quantile)
+    else:
+        errors = y_true != y_hat
+    if not errors.any():
         return []
-    
-    # Cluster top 2 most important features from SHAP
+
+    importance = _feature_ranking(shap_values, X.shape[1])
+    if importance is not None and X.shape[1] > max_features:
+        X = X.iloc[:, np.argsort(importance)[::-1][:max_features]]
+
     try:
-        err_shap = shap_values[errors_mask]
-        mean_abs_shap = np.mean(np.abs(err_shap.values), axis=0)
-        top_idx = np.argsort(mean_abs_shap)[-2:]
-        cluster_data = X_err.iloc[:, top_idx].values
-
-        kmeans = KMeans(n_clusters=min(n_clusters, len(cluster_data)), n_init=10, random_state=42)
-        labels = kmeans.fit_predict(cluster_data)
-
-        clusters = []
-        for i in range(kmeans.n_clusters):
-            group = X_err[labels == i]
-            center = kmeans.cluster_centers_[i]
-            desc = f"{feature_names[top_idx[0]]}≈{center[0]:.1f}, {feature_names[top_idx[1]]}≈{center[1]:.1f}"
-            clusters.append({
-                "condition": desc,
-                "size": len(group),
-                "features": [feature_names[j] for j in top_idx]
-            })
-        return clusters
+        finder = SliceFinder(X, errors, n_bins=n_bins, magnitude=residual)
+        return finder.search(top_k=n_clusters, min_support=min_support)
     except Exception as e:
-        print(f"Clustering failed: {e}")
-        return []
\ No newline at end of file
+        print(f"Slice finding failed: {e}")
+        return []
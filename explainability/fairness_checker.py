@@ -1,9 +1,187 @@
 # explainability/fairness_checker.py
+import warnings
+from itertools import combinations
+
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from utils.tracing import traced
+
+METRICS = ("accuracy", "selection_rate", "tpr", "fpr", "calibration_gap")
+SCORE_BINS = 10
+
+
+def _ratios(stats):
+    """Per-group metrics from summed sufficient statistics (works on any leading shape)."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return {
+            "accuracy": stats["correct"] / stats["count"],
+            "selection_rate": stats["pred_pos"] / stats["count"],
+            "tpr": stats["tp"] / stats["pos"],
+            "fpr": stats["fp"] / (stats["count"] - stats["pos"]),
+            "calibration_gap": (stats["score"] - stats["pos"]) / stats["count"],
+        }
+
+
+def _row_stats(y_true, y_pred, y_score, positive_label):
+    correct = (y_true == y_pred)
+    pred_pos = (y_pred == positive_label)
+    pos = (y_true == positive_label)
+    return {
+        "correct": correct.astype(np.float64),
+        "pred_pos": pred_pos.astype(np.float64),
+        "pos": pos.astype(np.float64),
+        "tp": (pred_pos & pos).astype(np.float64),
+        "fp": (pred_pos & ~pos).astype(np.float64),
+        "score": np.asarray(y_score, dtype=np.float64) if y_score is not None else np.full(len(pos), np.nan),
+    }
+
+
+def _cell_codes(group_codes, row_stats, score_bin):
+    """Collapse rows into cells that are identical for every statistic except the score."""
+    key = group_codes.astype(np.int64)
+    for name in ("correct", "pred_pos", "pos"):
+        key = key * 2 + row_stats[name].astype(np.int64)
+    key = key * (SCORE_BINS + 1) + score_bin
+    cells, cell_of_row = np.unique(key, return_inverse=True)
+    return cells, cell_of_row
+
+
+def _grouping_report(label, group_codes, group_names, row_stats, score_bin, min_group_size,
+                     n_bootstrap, ci, rng):
+    n_groups = len(group_names)
+    cells, cell_of_row = _cell_codes(group_codes, row_stats, score_bin)
+    cell_size = np.bincount(cell_of_row, minlength=len(cells)).astype(np.float64)
+    cell_group = np.zeros(len(cells), dtype=np.int64)
+    cell_group[cell_of_row] = group_codes
+    cell_means = {
+        name: np.bincount(cell_of_row, weights=values, minlength=len(cells)) / cell_size
+        for name, values in row_stats.items()
+    }
+
+    # Cell -> group indicator, so group sums are one sparse product
+    to_group = sparse.csr_matrix(
+        (np.ones(len(cells)), (np.arange(len(cells)), cell_group)), shape=(len(cells), n_groups)
+    )
+    count = to_group.T @ cell_size
+    keep = np.flatnonzero(count >= min_group_size)
+    if len(keep) == 0:
+        return []
+
+    point = _ratios({"count": count, **{k: to_group.T @ (cell_size * v) for k, v in cell_means.items()}})
+
+    bounds = {}
+    if n_bootstrap:
+        # Poisson bootstrap: a sum of Poisson(1) row weights over a cell is Poisson(cell size),
+        # so every replicate of every group comes from one (B x cells) resampling matrix
+        weights = rng.poisson(cell_size, size=(n_bootstrap, len(cells))).astype(np.float64)
+        boot_stats = {"count": (to_group.T @ weights.T).T}
+        for name, mean in cell_means.items():
+            boot_stats[name] = (to_group.T @ (weights * mean).T).T
+        boot = _ratios(boot_stats)
+        alpha = (1 - ci) / 2
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN metrics (e.g. TPR without positives)
+            for name in METRICS:
+                bounds[name] = np.nanquantile(boot[name][:, keep], [alpha, 1 - alpha], axis=0)
+
+    rows = []
+    for k, g in enumerate(keep):
+        row = {"attributes": label, "group": group_names[g], "size": int(count[g])}
+        for name in METRICS:
+            row[name] = float(point[name][g])
+            if name in bounds:
+                row[f"{name}_lo"] = float(bounds[name][0][k])
+                row[f"{name}_hi"] = float(bounds[name][1][k])
+        rows.append(row)
+    return rows
+
+
+def sensitive_candidates(df: pd.DataFrame, exclude=(), max_levels=10, max_columns=6, catalog=None):
+    """
+    Low-cardinality columns that could be sensitive attributes. Categoricals are judged
+    by their category count, floats are skipped, and the remaining columns only pay
+    for a nunique() on a sample before the exact check. With a ColumnCatalog no
+    column is scanned at all.
+    """
+    if catalog is not None:
+        table = catalog.table
+        eligible = ~table["dtype"].str.startswith("float") & table["cardinality"].between(2, max_levels)
+        return [col for col in table.index[eligible] if col not in exclude][:max_columns]
+
+    candidates = []
+    for col in df.columns:
+        if col in exclude or pd.api.types.is_float_dtype(df[col]):
+            continue
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            levels = len(s.cat.categories)
+        else:
+            if s.iloc[:10_000].nunique() > max_levels:
+                continue
+            levels = s.nunique()
+        if 2 <= levels <= max_levels:
+            candidates.append(col)
+        if len(candidates) >= max_columns:
+            break
+    return candidates
+
+
+@traced()
+def fairness_report(y_true, y_pred, sensitive: pd.DataFrame, y_score=None, max_order=2, min_group_size=30,
+                    n_bootstrap=200, ci=0.95, positive_label=1, random_state=42):
+    """
+    Accuracy, selection rate, TPR/FPR and calibration gap for every sensitive attribute
+    and every intersection of up to `max_order` attributes, with Poisson-bootstrap CIs.
+    Groups smaller than `min_group_size` are suppressed. Returns one row per group.
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    row_stats = _row_stats(y_true, y_pred, y_score, positive_label)
+    if y_score is not None:
+        score_bin = np.clip((row_stats["score"] * SCORE_BINS).astype(np.int64), 0, SCORE_BINS - 1) + 1
+    else:
+        score_bin = np.zeros(len(y_true), dtype=np.int64)
+
+    codes, names = {}, {}
+    for col in sensitive.columns:
+        c, uniques = pd.factorize(sensitive[col], use_na_sentinel=False)
+        codes[col], names[col] = c.astype(np.int64), [str(u) for u in uniques]
+
+    rng = np.random.default_rng(random_state)
+    rows = []
+    for order in range(1, max_order + 1):
+        for attrs in combinations(sensitive.columns, order):
+            # Mixed-radix code of the intersection, compacted to the groups present
+            combined = np.zeros(len(y_true), dtype=np.int64)
+            for col in attrs:
+                combined = combined * len(names[col]) + codes[col]
+            present, group_codes = np.unique(combined, return_inverse=True)
+            group_names = []
+            for code in present:
+                parts = []
+                for col in reversed(attrs):
+                    code, idx = divmod(code, len(names[col]))
+                    parts.append(names[col][idx])
+                group_names.append(" & ".join(reversed(parts)))
+            rows.extend(_grouping_report(
+                " & ".join(attrs), group_codes, group_names, row_stats, score_bin,
+                min_group_size, n_bootstrap, ci, rng
+            ))
+
+    report = pd.DataFrame(rows)
+    if y_score is None and not report.empty:
+        report = report.drop(columns=[c for c in report.columns if c.startswith("calibration_gap")])
+    return report
+
 
+@traced()
 def check_fairness(y_true, y_pred, sensitive_col: pd.Series):
-    df = pd.DataFrame({"true": y_true, "pred": y_pred, "group": sensitive_col})
-    group_stats = df.groupby("group").apply(
-        lambda g: {"accuracy": (g['true'] == g['pred']).mean(), "pred_positive_rate": g['pred'].mean()}
+    report = fairness_report(
+        y_true, y_pred, pd.DataFrame({"group": np.asarray(sensitive_col)}),
+        max_order=1, min_group_size=0, n_bootstrap=0
     )
-    return group_stats.to_dict()
\ No newline at end of file
+    return {
+        row["group"]: {"accuracy": row["accuracy"], "pred_positive_rate": row["selection_rate"]}
+        for _, row in report.iterrows()
+    }
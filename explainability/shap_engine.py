@@ -1,22 +1,349 @@
 # explainability/shap_engine.py
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
 import shap
-import matplotlib.pyplot as plt
 
-def explain_model_with_shap(model, X, sample_size=200):
-    """Generate SHAP values and return data + figure."""
-    if len(X) > sample_size:
+from models.scheduler import TaskScheduler, shared
+from utils.tracing import traced
+
+TREE_MODELS = (
+    "RandomForestClassifier", "RandomForestRegressor",
+    "ExtraTreesClassifier", "ExtraTreesRegressor",
+    "DecisionTreeClassifier", "DecisionTreeRegressor",
+    "GradientBoostingClassifier", "GradientBoostingRegressor",
+    "XGBClassifier", "XGBRegressor",
+)
+LINEAR_MODELS = (
+    "LogisticRegression", "LinearRegression",
+    "Ridge", "Lasso", "ElasticNet", "SGDClassifier", "SGDRegressor",
+)
+# Adaptive SHAP: rows predicted to form strata, and ranking positions that must be stable
+STRATA_SAMPLE_ROWS = 50_000
+RANKING_TOP_K = 10
+
+
+def model_family(model) -> str:
+    name = type(model).__name__
+    if name in TREE_MODELS:
+        return "tree"
+    if name in LINEAR_MODELS:
+        return "linear"
+    return "generic"
+
+
+def make_explainer(model, X):
+    """Pick the exact/fast explainer for the model family, generic shap.Explainer otherwise."""
+    family = model_family(model)
+    if family == "tree":
+        return shap.TreeExplainer(model), family
+    if family == "linear":
+        return shap.LinearExplainer(model, X), family
+    return shap.Explainer(model, X), family
+
+
+def model_space(X: pd.DataFrame, scaler=None) -> pd.DataFrame:
+    """X as the model saw it in training: passed through `scaler` when it was fit behind one."""
+    if scaler is None:
+        return X
+    return pd.DataFrame(scaler.transform(X.to_numpy()).astype(np.float32), columns=X.columns, index=X.index)
+
+
+def _with_data(explanation, X):
+    """The same attributions, with X's raw feature values as the explanation's data (for plots)."""
+    return shap.Explanation(
+        values=explanation.values,
+        base_values=explanation.base_values,
+        data=X.to_numpy(),
+        feature_names=list(X.columns)
+    )
+
+
+def _explain_chunk(start, stop, out_path):
+    """Pool task: explain rows [start, stop) and write them into the shared output memmap."""
+    ctx = shared("context")
+    X_chunk = pd.DataFrame(np.asarray(shared("X")[start:stop]), columns=ctx["columns"])
+    explanation = ctx["explainer"](X_chunk)
+    out = np.load(out_path, mmap_mode="r+")
+    out[start:stop] = explanation.values
+    out.flush()
+    return start, np.asarray(explanation.base_values)
+
+
+@traced()
+def explain_model_with_shap(model, X, sample_size=200, chunk_size=None, n_workers=None, output_path=None,
+                            adaptive=False, tolerance=0.05, time_budget=30.0, batch_size=100, ci=0.95,
+                            scaler=None):
+    """
+    Generate SHAP values and return data + figure.
+    sample_size=None explains every row. With chunk_size, rows are split into chunks
+    explained on a process pool and written into a preallocated memory-mapped array
+    (at output_path, which the returned values then map; otherwise a temp file that is
+    read back into memory and removed).
+    adaptive=True explains stratified batches until the mean |SHAP| ranking converges
+    (see explain_adaptive); sample_size then caps the rows explained.
+    `scaler` is the transform the model was trained behind (results_df.attrs["scaler"]):
+    attributions are computed in that space, data_sample and plot values stay raw.
+    """
+    if adaptive:
+        return explain_adaptive(model, X, tolerance=tolerance, time_budget=time_budget,
+                                batch_size=batch_size, max_rows=sample_size, ci=ci, scaler=scaler)
+
+    if sample_size is not None and len(X) > sample_size:
         X = X.sample(sample_size, random_state=42)
-    
-    # Use TreeExplainer for tree models, otherwise default
-    if hasattr(model, "tree_structure"):
-        explainer = shap.TreeExplainer(model)
+
+    X_model = model_space(X, scaler)
+    explainer, family = make_explainer(model, X_model)
+
+    if chunk_size is None or len(X) <= chunk_size:
+        shap_values = explainer(X_model)
+    else:
+        shap_values = _explain_chunked(explainer, X_model, chunk_size, n_workers, output_path)
+    if scaler is not None:
+        shap_values = _with_data(shap_values, X)
+
+    return {
+        "explainer": explainer,
+        "shap_values": shap_values,
+        "data_sample": X,
+        "model_family": family
+    }
+
+
+def _strata(model, X, n_bins=10):
+    """Stratum per row: predicted class for classifiers, prediction decile for regressors."""
+    from sklearn.base import is_classifier
+
+    pred = np.asarray(model.predict(X.to_numpy()))
+    if is_classifier(model):
+        return pd.factorize(pred)[0]
+    ranks = np.argsort(np.argsort(pred, kind="stable"), kind="stable")
+    return np.minimum(ranks * n_bins // len(pred), n_bins - 1)
+
+
+class _StratifiedMean:
+    """
+    Running stratified estimate of mean |SHAP| per feature: per-stratum sums are
+    combined with population weights, so oversampling rare strata does not bias it.
+    """
+
+    def __init__(self, sizes, n_features):
+        self.sizes = np.asarray(sizes, dtype=np.float64)
+        self.weights = self.sizes / self.sizes.sum()
+        self.count = np.zeros(len(sizes))
+        self.total = np.zeros((len(sizes), n_features))
+        self.total_sq = np.zeros((len(sizes), n_features))
+
+    def add(self, stratum, abs_values):
+        np.add.at(self.count, stratum, 1)
+        np.add.at(self.total, stratum, abs_values)
+        np.add.at(self.total_sq, stratum, abs_values ** 2)
+
+    def stratum_std(self):
+        n = self.count[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (self.total_sq - self.total ** 2 / n) / (n - 1)
+        return np.sqrt(np.clip(var, 0, None))
+
+    def estimate(self):
+        """(mean, standard error) per feature; the error is inf while any stratum has < 2 rows explained."""
+        n = self.count[:, None]
+        means = self.total / np.maximum(n, 1)
+        mean = (self.weights[:, None] * means).sum(axis=0)
+        # finite population correction: a fully explained stratum contributes no error
+        fpc = 1 - n / self.sizes[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(fpc <= 0, 0.0, self.weights[:, None] ** 2 * self.stratum_std() ** 2 / n * fpc)
+        return mean, np.sqrt(np.nan_to_num(var, nan=np.inf).sum(axis=0))
+
+
+def _allocate(estimator, remaining, batch_size):
+    """
+    Rows to take from each stratum for the next batch: Neyman allocation (population
+    weight x spread of |SHAP|) once spreads are known, and at least two rows per
+    stratum so every class gets an error bar.
+    """
+    spread = np.nan_to_num(estimator.stratum_std().mean(axis=1), nan=0.0)
+    need = np.where(estimator.count < 2, 2 - estimator.count, 0)
+    score = estimator.weights * spread if spread.any() else estimator.weights.copy()
+    score[remaining == 0] = 0
+    take = need.copy()
+    if score.sum() > 0:
+        take += np.floor(score / score.sum() * max(batch_size - need.sum(), 0))
+    return np.minimum(np.maximum(take, 0), remaining).astype(int)
+
+
+@traced()
+def explain_adaptive(model, X, tolerance=0.05, time_budget=30.0, batch_size=100, max_rows=None, ci=0.95,
+                     random_state=42, scaler=None):
+    """
+    Explain rows in stratified batches until the feature ranking is stable: every
+    feature's mean |SHAP| confidence half-width is within `tolerance` of the top
+    feature's importance and the top RANKING_TOP_K features did not change since the
+    last batch. Strata come from predictions on a random sample of at most
+    STRATA_SAMPLE_ROWS rows, which is also the pool batches are drawn from. Stops
+    earlier when `time_budget` seconds or `max_rows` rows are used up.
+    Returns the usual SHAP dict plus "convergence" with rows used and error bars.
+    """
+    from scipy.stats import norm
+
+    started = time.perf_counter()
+    rng = np.random.default_rng(random_state)
+    pool = np.arange(len(X))
+    if len(X) > STRATA_SAMPLE_ROWS:
+        pool = np.sort(rng.choice(len(X), STRATA_SAMPLE_ROWS, replace=False))
+    strata = _strata(model, model_space(X.iloc[pool], scaler))
+    queues = [rng.permutation(pool[strata == s]) for s in range(strata.max() + 1)]
+    taken = np.zeros(len(queues), dtype=int)
+    limit = len(pool) if max_rows is None else min(max_rows, len(pool))
+
+    background = X.sample(min(len(X), 200), random_state=random_state)
+    explainer, family = make_explainer(model, model_space(background, scaler))
+    estimator = _StratifiedMean([len(q) for q in queues], X.shape[1])
+    z = norm.ppf(0.5 + ci / 2)
+
+    rows, values, base_values = [], [], []
+    ranking, stop_reason = None, "exhausted"
+    while taken.sum() < limit:
+        take = _allocate(estimator, np.array([len(q) for q in queues]) - taken, min(batch_size, limit - taken.sum()))
+        if not take.any():
+            break
+        batch = np.concatenate([queues[s][taken[s]:taken[s] + k] for s, k in enumerate(take)])
+        batch_strata = np.repeat(np.arange(len(queues)), take)
+        taken += take
+
+        explanation = explainer(model_space(X.iloc[batch], scaler))
+        batch_values = np.asarray(explanation.values, dtype=np.float32)
+        abs_values = np.abs(batch_values.reshape(len(batch), X.shape[1], -1)).mean(axis=2)
+        estimator.add(batch_strata, abs_values)
+        rows.append(batch)
+        values.append(batch_values)
+        base_values.append(np.asarray(explanation.base_values))
+
+        mean, stderr = estimator.estimate()
+        previous, ranking = ranking, np.argsort(-mean, kind="stable")[:RANKING_TOP_K]
+        if previous is not None and np.array_equal(previous, ranking) and (z * stderr).max() <= tolerance * mean.max():
+            stop_reason = "converged"
+            break
+        if time.perf_counter() - started >= time_budget:
+            stop_reason = "time_budget"
+            break
     else:
-        explainer = shap.Explainer(model, X)
-    
-    shap_values = explainer(X)
-    
+        if limit < len(pool):
+            stop_reason = "max_rows"
+
+    rows = np.concatenate(rows)
+    data_sample = X.iloc[rows]
+    shap_values = shap.Explanation(
+        values=np.concatenate(values),
+        base_values=np.concatenate(base_values),
+        data=data_sample.to_numpy(),
+        feature_names=list(X.columns)
+    )
+
+    mean, stderr = estimator.estimate()
+    half_width = z * stderr
+    importance = pd.DataFrame({
+        "feature": X.columns,
+        "mean_abs_shap": mean,
+        "ci_low": np.clip(mean - half_width, 0, None),
+        "ci_high": mean + half_width,
+    }).sort_values("mean_abs_shap", ascending=False, ignore_index=True)
+
     return {
         "explainer": explainer,
         "shap_values": shap_values,
-        "data_sample": X
-    }
\ No newline at end of file
+        "data_sample": data_sample,
+        "model_family": family,
+        "convergence": {
+            "rows": len(rows),
+            "batches": len(values),
+            "seconds": round(time.perf_counter() - started, 3),
+            "stop_reason": stop_reason,
+            "importance": importance,
+        }
+    }
+
+
+def _explain_chunked(explainer, X, chunk_size, n_workers, output_path):
+    # First chunk in-process to learn the output shape (multi-class adds a trailing dim)
+    first = explainer(X.iloc[:chunk_size])
+    tmp_dir = None
+    if output_path is None:
+        tmp_dir = tempfile.mkdtemp(prefix="explainml_shap_")
+        output_path = os.path.join(tmp_dir, "shap_values.npy")
+
+    try:
+        out = np.lib.format.open_memmap(
+            output_path, mode="w+", dtype=np.float32, shape=(len(X),) + first.values.shape[1:]
+        )
+        out[:chunk_size] = first.values
+        out.flush()
+        del out  # workers open their own mappings
+
+        base_values = np.empty((len(X),) + np.shape(first.base_values)[1:], dtype=np.float64)
+        base_values[:chunk_size] = first.base_values
+
+        bounds = [(start, min(start + chunk_size, len(X))) for start in range(chunk_size, len(X), chunk_size)]
+        context = {"explainer": explainer, "columns": list(X.columns)}
+        with TaskScheduler({"X": X.to_numpy()}, n_workers=n_workers, max_tasks=len(bounds), context=context) as scheduler:
+            outcomes = scheduler.map(_explain_chunk, [(start, stop, output_path) for start, stop in bounds])
+
+        for (start, stop), (result, error) in zip(bounds, outcomes):
+            if error is not None:
+                raise error
+            base_values[start:stop] = result[1]
+
+        values = np.load(output_path, mmap_mode="r")
+        if tmp_dir is not None:
+            # Copy out of the temp file: a mapped file cannot be removed on Windows
+            values = np.array(values)
+    finally:
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return shap.Explanation(
+        values=values,
+        base_values=base_values,
+        data=X.to_numpy(),
+        feature_names=list(X.columns)
+    )
+
+
+def save_shap(run, shap_data):
+    """Persist explain_model_with_shap() output into an ArtifactRun (values as a mappable .npy)."""
+    shap_values = shap_data["shap_values"]
+    run.put("shap_values", np.asarray(getattr(shap_values, "values", shap_values)))
+    base_values = getattr(shap_values, "base_values", None)
+    if base_values is not None:
+        run.put("shap_base_values", np.asarray(base_values))
+    run.put("shap_sample", shap_data["data_sample"])
+    run.put("shap_meta", {"model_family": shap_data["model_family"], "convergence": shap_data.get("convergence")})
+
+
+def load_shap(run, model=None, scaler=None):
+    """
+    Inverse of save_shap: the SHAP matrix comes back memory-mapped. The explainer is
+    not stored; it is rebuilt from `model` (and its training `scaler`) when one is given.
+    """
+    sample = run.get("shap_sample")
+    meta = run.get("shap_meta")
+    shap_values = shap.Explanation(
+        values=run.get("shap_values"),
+        base_values=run.get("shap_base_values"),
+        data=sample.to_numpy(),
+        feature_names=list(sample.columns)
+    )
+    data = {
+        "explainer": make_explainer(model, model_space(sample, scaler))[0] if model is not None else None,
+        "shap_values": shap_values,
+        "data_sample": sample,
+        "model_family": meta["model_family"],
+    }
+    if meta.get("convergence"):
+        data["convergence"] = meta["convergence"]
+    return data
@@ -1,37 +1,136 @@
 # explainml.py
 import argparse
-import pandas as pd
-from profiler.stats_report import analyze_dataset
-from models.trainer import evaluate_models
-from reports.report_generator import generate_pdf_report
+from profiler.stats_report import analyze_dataset_file
+from models.serving import BACKGROUND_ROWS, ModelBundle
+from reports.report_generator import generate_pdf_report, generate_batch_report, report_from_run
+from utils.artifacts import ArtifactStore
+from utils.cache import hash_file
+from utils.catalog import ColumnCatalog
+from utils.ingest import load_dataset, build_feature_matrix
 
-def main():
-    parser = argparse.ArgumentParser(description="ExplainML++ - Intelligent AutoML")
-    parser.add_argument("data", help="Path to CSV file")
-    parser.add_argument("--target", required=True, help="Target column")
-    parser.add_argument("--output", default="reports/report.pdf", help="Output report path")
-    args = parser.parse_args()
+# Model libraries (sklearn estimators, xgboost) are imported by the stages that need
+# them, so --profile-only and a cached run never pay for loading them.
+
+def profile_dataset(args):
+    # Profile out-of-core in a single streaming pass
+    profile = analyze_dataset_file(args.data, args.target, chunksize=args.chunksize)
+    print(f"Profiled {profile['rows']} rows")
+    return profile
+
+def run_profile(args):
+    profile = profile_dataset(args)
+    imbalance = profile.get('imbalance_ratio')
+    print(f"Task: {profile['task_type']} | Imbalance: " + (f"{imbalance:.2f}x" if imbalance is not None else "n/a"))
+    missing = {col: pct for col, pct in profile["missing_percentage"].items() if pct > 0}
+    for col, pct in sorted(missing.items(), key=lambda kv: -kv[1])[:5]:
+        print(f"⚠️ Missing: {col} ({pct:.1f}%)")
+    skewed = {col: v for col, v in profile["numeric_skew"].items() if v == v and abs(v) > 1}
+    for col, v in sorted(skewed.items(), key=lambda kv: -abs(kv[1]))[:5]:
+        print(f"⚠️ Skewed: {col} ({v:.2f})")
+
+def train(args):
+    from models.trainer import evaluate_models
+
+    profile = profile_dataset(args)
+
+    if args.out_of_core:
+        # Features stream from a disk spill; the table is never loaded whole
+        from models.external import evaluate_models_external
+        results, best_model = evaluate_models_external(args.data, args.target, chunksize=args.chunksize,
+                                                       external_memory=args.external_memory)
+        X = results.attrs["sample"]
+    else:
+        df = load_dataset(args.data)
+        print(f"Loaded {len(df)} rows")
+
+        catalog = ColumnCatalog.build(df)
+        X, y = build_feature_matrix(df, args.target, catalog=catalog)
 
-    df = pd.read_csv(args.data)
-    print(f"Loaded {len(df)} rows")
+        results, best_model = evaluate_models(X, y, catalog=catalog)
+    return profile, results, best_model, X.sample(min(BACKGROUND_ROWS, len(X)), random_state=42)
 
-    profile = analyze_dataset(df, args.target)
-    print(f"Task: {profile['task_type']} | Imbalance: {profile.get('imbalance_ratio'):.2f}x")
+def run_single(args):
+    from models.trainer import load_training, save_training
 
-    X, y = df.drop(columns=[args.target]), df[args.target]
-    X = X.select_dtypes(include=[float, int]).fillna(0)
+    store = ArtifactStore(args.artifacts)
+    data_hash = hash_file(args.data)
+    run = None if args.retrain else store.open(data_hash, args.target)
+    reused = run is not None and "model" in run
+    if reused:
+        print(f"♻️ Reusing run v{run.version} from {run.path} (--retrain to recompute)")
+        profile, background = run.get("profile"), run.get("background")
+        results, best_model = load_training(run)
+    else:
+        profile, results, best_model, background = train(args)
+        run = store.begin(data_hash, args.target)
+        run.put("profile", profile)
+        run.put("background", background)
+        save_training(run, results, best_model)
+        store.commit(run)
 
-    results, best_model = evaluate_models(X, y)
-    print(f"🏆 Best: {results.iloc[0]['model']} | F1: {results.iloc[0]['f1_mean']:.3f}")
+    imbalance = profile.get('imbalance_ratio')
+    print(f"Task: {profile['task_type']} | Imbalance: " + (f"{imbalance:.2f}x" if imbalance is not None else "n/a"))
+    metric = "R²" if results.iloc[0]["task_type"] == "regression" else "F1"
+    print(f"🏆 Best: {results.iloc[0]['model']} | {metric}: {results.iloc[0]['score_mean']:.3f}")
+
+    if args.save_model:
+        ModelBundle.from_results(results, background).save(args.save_model)
+        print(f"💾 Saved model bundle to {args.save_model}")
 
     diag_data = {
         "dataset": args.data,
         "target": args.target,
         "best_model": results.iloc[0]["model"],
-        "f1_score": results.iloc[0]["f1_mean"],
+        "f1_score": results.iloc[0]["score_mean"],
+        "metric": metric,
         "suggestions": [{"suggestion": "Consider SMOTE", "priority": "high"}]
     }
-    generate_pdf_report(diag_data, args.output)
+    if reused and "diagnostics" in run:
+        report_from_run(run, args.output)  # re-rendered from the stored diagnostics
+    else:
+        # A committed run is shared with other sessions: only the run created here gets diagnostics
+        generate_pdf_report(diag_data, args.output, run=None if reused else run)
+
+def run_manifest(args):
+    from utils.batch_runner import run_batch
+
+    summaries = run_batch(
+        args.manifest, state_dir=args.state_dir, workers=args.workers, force=args.force, chunksize=args.chunksize
+    )
+    generate_batch_report(summaries, args.summary)
+    failed = sum(s["status"] == "failed" for s in summaries)
+    print(f"📦 {len(summaries)} datasets | {failed} failed")
+    return 1 if failed else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="ExplainML++ - Intelligent AutoML")
+    parser.add_argument("data", nargs="?", help="Path to CSV, Parquet or Feather file")
+    parser.add_argument("--target", help="Target column")
+    parser.add_argument("--output", default="reports/report.pdf", help="Output report path")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk when profiling")
+    parser.add_argument("--save-model", help="Write the best model bundle here (serve with python -m models.serving)")
+    parser.add_argument("--artifacts", default=".explainml_artifacts", help="Store of past runs reused on restart")
+    parser.add_argument("--retrain", action="store_true", help="Ignore stored runs for this dataset/target")
+    parser.add_argument("--profile-only", action="store_true", help="Only profile the dataset (no training or report)")
+    parser.add_argument("--out-of-core", action="store_true", help="Train from a chunked disk spill (tables larger than RAM)")
+    parser.add_argument("--external-memory", action="store_true", help="With --out-of-core, page XGBoost data from disk too")
+
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--manifest", help="CSV/JSON of dataset,target pairs to diagnose in one run")
+    batch.add_argument("--workers", type=int, default=None, help="Datasets processed concurrently")
+    batch.add_argument("--state-dir", default=".explainml_runs", help="Checkpoints and run index")
+    batch.add_argument("--summary", default="reports/batch_summary.md", help="Aggregated report path")
+    batch.add_argument("--force", action="store_true", help="Rerun datasets even if unchanged")
+    args = parser.parse_args()
+
+    if args.manifest:
+        raise SystemExit(run_manifest(args))
+    if not args.data or not args.target:
+        parser.error("data and --target are required unless --manifest is given")
+    if args.profile_only:
+        run_profile(args)
+    else:
+        run_single(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
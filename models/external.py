@@ -0,0 +1,360 @@
+# models/external.py
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.preprocessing import StandardScaler
+
+from models.scheduler import default_worker_budget
+from profiler.stats_report import iter_file_chunks
+from utils.tracing import span, traced
+
+# Folds own interleaved blocks of this many consecutive rows (fold = block % n_splits)
+FOLD_BLOCK_ROWS = 8192
+XGB_ROUNDS = 100
+XGB_BATCH_ROWS = 1 << 18
+LINEAR_EPOCHS = 2
+SAMPLE_ROWS = 1000
+MAX_CLASSES = 20
+
+
+def fold_slices(start, stop, fold, n_splits, block=FOLD_BLOCK_ROWS, holdout=True):
+    """
+    Row ranges of global rows [start, stop) that belong to `fold` (holdout=True) or to
+    its training complement, as slices relative to `start` - i.e. views, never copies.
+    """
+    slices = []
+    first_block = start // block
+    for b in range(first_block, (stop - 1) // block + 1):
+        if (b % n_splits == fold) != holdout:
+            continue
+        lo, hi = max(b * block, start), min((b + 1) * block, stop)
+        if slices and slices[-1].stop == lo - start:
+            slices[-1] = slice(slices[-1].start, hi - start)
+        else:
+            slices.append(slice(lo - start, hi - start))
+    return slices
+
+
+class FeatureStore:
+    """
+    A table's numeric features spilled once to a float32 memory-mapped file (NaN -> 0),
+    with the target beside it, so every later pass streams row ranges straight from
+    disk/page cache. The spill pass also collects the target's labels and the feature
+    scaler the linear learners train behind. Use as a context manager to delete the spill.
+    """
+
+    def __init__(self, path, target, chunksize=100_000, spill_dir=None):
+        self.target = target
+        self.spill_dir = tempfile.mkdtemp(prefix="explainml_ext_", dir=spill_dir)
+        self.features = None
+        self.scaler = StandardScaler()
+        self.rows = 0
+        labels, categorical = {}, None
+
+        x_path, y_path = os.path.join(self.spill_dir, "X.f32"), os.path.join(self.spill_dir, "y.f64")
+        with span("spill_features") as s, open(x_path, "wb") as fx, open(y_path, "wb") as fy:
+            for chunk in iter_file_chunks(path, chunksize):
+                chunk = chunk[chunk[target].notna()]
+                if self.features is None:
+                    self.features = [
+                        c for c in chunk.columns
+                        if c != target and pd.api.types.is_numeric_dtype(chunk[c]) and not pd.api.types.is_bool_dtype(chunk[c])
+                    ]
+                    if not self.features:
+                        raise ValueError("No numeric features available.")
+                X = np.empty((len(chunk), len(self.features)), dtype=np.float32)
+                for j, col in enumerate(self.features):
+                    X[:, j] = pd.to_numeric(chunk[col], errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+                np.nan_to_num(X, copy=False, nan=0.0)
+                self.scaler.partial_fit(X)
+                X.tofile(fx)
+
+                y = chunk[target]
+                if categorical is None:
+                    categorical = not pd.api.types.is_numeric_dtype(y)
+                if categorical:
+                    # Provisional codes in first-seen order; remapped to sorted labels below
+                    y = y.astype(str)
+                    for label in y.unique():
+                        labels.setdefault(label, len(labels))
+                    values = y.map(labels).to_numpy(dtype=np.float64)
+                else:
+                    values = pd.to_numeric(y, errors="raise").to_numpy(dtype=np.float64)
+                    if len(labels) <= MAX_CLASSES:
+                        labels.update(dict.fromkeys(np.unique(values).tolist()))
+                values.tofile(fy)
+                self.rows += len(chunk)
+            s.set(rows=self.rows, cols=len(self.features or ()))
+
+        if not self.rows:
+            raise ValueError("No rows with a target value.")
+        self.X = np.memmap(x_path, dtype=np.float32, mode="r", shape=(self.rows, len(self.features)))
+        self.task_type = "classification" if categorical or len(labels) <= MAX_CLASSES else "regression"
+        self.classes = sorted(labels) if self.task_type == "classification" else None
+        self.y = self._encode_target(y_path, labels if categorical else None)
+
+    def _encode_target(self, y_path, first_seen=None):
+        """Class codes (int32) for classification, float64 values for regression - on disk either way."""
+        raw = np.memmap(y_path, dtype=np.float64, mode="r", shape=(self.rows,))
+        if self.task_type == "regression":
+            return raw
+        remap = None
+        if first_seen is not None:
+            remap = np.empty(len(first_seen), dtype=np.int32)
+            remap[list(first_seen.values())] = np.argsort(np.argsort(list(first_seen)))
+        codes_path = os.path.join(self.spill_dir, "y.i32")
+        codes = np.memmap(codes_path, dtype=np.int32, mode="w+", shape=(self.rows,))
+        step = FOLD_BLOCK_ROWS * 16
+        for start in range(0, self.rows, step):
+            block = raw[start:start + step]
+            if remap is not None:
+                codes[start:start + step] = remap[block.astype(np.int64)]
+            else:
+                codes[start:start + step] = np.searchsorted(self.classes, block)
+        codes.flush()
+        return np.memmap(codes_path, dtype=np.int32, mode="r", shape=(self.rows,))
+
+    def ranges(self, fold=None, n_splits=None, holdout=False, chunk_rows=FOLD_BLOCK_ROWS * 16, shuffle=None):
+        """
+        Yield (X, y) views over the rows of `fold` (holdout=True), of every other fold
+        (holdout=False) or of all rows (fold=None). `shuffle` (a Generator) randomizes
+        the order of chunks, for SGD epochs over data that may be sorted.
+        """
+        starts = np.arange(0, self.rows, chunk_rows)
+        if shuffle is not None:
+            starts = shuffle.permutation(starts)
+        for start in starts:
+            stop = min(start + chunk_rows, self.rows)
+            if fold is None:
+                yield self.X[start:stop], self.y[start:stop]
+                continue
+            for s in fold_slices(start, stop, fold, n_splits, holdout=holdout):
+                yield self.X[start:stop][s], self.y[start:stop][s]
+
+    def batches(self, fold=None, n_splits=None, chunk_rows=XGB_BATCH_ROWS):
+        """
+        Like ranges(holdout=False) but one array per chunk, concatenating the chunk's
+        training ranges: XGBoost builds a page/quantile batch per call, so few large
+        batches beat many block-sized views. Memory stays bounded by one chunk.
+        """
+        for start in range(0, self.rows, chunk_rows):
+            stop = min(start + chunk_rows, self.rows)
+            if fold is None:
+                yield np.asarray(self.X[start:stop]), np.asarray(self.y[start:stop])
+                continue
+            slices = fold_slices(start, stop, fold, n_splits, holdout=False)
+            if slices:
+                X, y = self.X[start:stop], self.y[start:stop]
+                yield np.concatenate([X[s] for s in slices]), np.concatenate([y[s] for s in slices])
+
+    def sample(self, n=SAMPLE_ROWS):
+        """Evenly strided rows as a DataFrame (e.g. a SHAP background)."""
+        idx = np.unique(np.linspace(0, self.rows - 1, min(n, self.rows)).astype(np.int64))
+        return pd.DataFrame(np.asarray(self.X[idx]), columns=self.features)
+
+    def close(self):
+        self.X = self.y = None
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class _StreamingScore:
+    """f1_macro (from a running confusion matrix) or R² (from running sums), chunk by chunk."""
+
+    def __init__(self, task_type, n_classes=None):
+        self.task_type = task_type
+        if task_type == "classification":
+            self.confusion = np.zeros((n_classes, n_classes), dtype=np.int64)
+        else:
+            self.n = self.sum_y = self.sum_y2 = self.sse = 0.0
+
+    def update(self, y, pred):
+        if self.task_type == "classification":
+            k = len(self.confusion)
+            self.confusion += np.bincount(np.asarray(y, dtype=np.int64) * k + pred.astype(np.int64),
+                                          minlength=k * k).reshape(k, k)
+        else:
+            y = np.asarray(y, dtype=np.float64)
+            self.n += len(y)
+            self.sum_y += y.sum()
+            self.sum_y2 += (y ** 2).sum()
+            self.sse += ((y - pred) ** 2).sum()
+
+    def score(self):
+        if self.task_type == "classification":
+            tp = np.diag(self.confusion).astype(np.float64)
+            denom = self.confusion.sum(axis=0) + self.confusion.sum(axis=1)
+            present = self.confusion.sum(axis=1) + self.confusion.sum(axis=0) > 0
+            with np.errstate(invalid="ignore", divide="ignore"):
+                f1 = np.where(denom > 0, 2 * tp / denom, 0.0)
+            return float(f1[present].mean())
+        sst = self.sum_y2 - self.sum_y ** 2 / self.n
+        return float(1 - self.sse / sst) if sst > 0 else 0.0
+
+
+def _xgb_iter(store, fold, n_splits, cache_prefix):
+    import xgboost as xgb
+
+    class RangeIter(xgb.DataIter):
+        """Feeds XGBoost one chunk of training rows at a time."""
+
+        def __init__(self):
+            self._it = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def next(self, input_data):
+            if self._it is None:
+                self._it = store.batches(fold, n_splits)
+            batch = next(self._it, None)
+            if batch is None:
+                return 0
+            input_data(data=batch[0], label=batch[1])
+            return 1
+
+        def reset(self):
+            self._it = None
+
+    return RangeIter()
+
+
+def _xgb_params(store, n_threads):
+    params = {"tree_method": "hist", "nthread": n_threads, "seed": 42}
+    if store.task_type == "regression":
+        params.update(objective="reg:squarederror", eval_metric="rmse")
+    elif len(store.classes) == 2:
+        params.update(objective="binary:logistic", eval_metric="logloss")
+    else:
+        params.update(objective="multi:softprob", eval_metric="mlogloss", num_class=len(store.classes))
+    return params
+
+
+def _fit_xgb(store, fold, n_splits, n_threads, external_memory):
+    """Train boosted trees from row ranges: quantized in memory (QuantileDMatrix) or paged from disk."""
+    import xgboost as xgb
+
+    if external_memory:
+        data = xgb.DMatrix(_xgb_iter(store, fold, n_splits, os.path.join(store.spill_dir, f"xgb-{fold}")))
+    else:
+        data = xgb.QuantileDMatrix(_xgb_iter(store, fold, n_splits, None))
+    return xgb.train(_xgb_params(store, n_threads), data, num_boost_round=XGB_ROUNDS)
+
+
+def _xgb_predict(booster, X, task_type):
+    out = booster.inplace_predict(np.asarray(X))
+    if task_type == "regression":
+        return out
+    return (out > 0.5).astype(np.int64) if out.ndim == 1 else out.argmax(axis=1)
+
+
+def _wrap_booster(booster, store):
+    """sklearn-style XGBoost model around a trained booster (what bundles and SHAP expect)."""
+    from xgboost import XGBClassifier, XGBRegressor
+
+    if store.task_type == "regression":
+        model = XGBRegressor(n_estimators=XGB_ROUNDS, random_state=42)
+    else:
+        model = XGBClassifier(n_estimators=XGB_ROUNDS, random_state=42,
+                              objective=_xgb_params(store, 1)["objective"])
+        model.n_classes_ = len(store.classes)
+    model._Booster = booster
+    return model
+
+
+def _fit_linear(store, model, fold, n_splits, epochs, random_state=42):
+    """partial_fit over scaled row ranges, `epochs` passes in shuffled chunk order."""
+    model = clone(model)
+    rng = np.random.default_rng(random_state)
+    classes = np.arange(len(store.classes)) if store.task_type == "classification" else None
+    for _ in range(epochs):
+        for X, y in store.ranges(fold, n_splits, holdout=False, shuffle=rng):
+            X = store.scaler.transform(X)
+            if classes is not None:
+                model.partial_fit(X, y, classes=classes)
+            else:
+                model.partial_fit(X, y)
+    return model
+
+
+def _linear_candidate(task_type):
+    if task_type == "classification":
+        return "SGDClassifier", SGDClassifier(loss="log_loss", alpha=1e-4, random_state=42)
+    return "SGDRegressor", SGDRegressor(alpha=1e-4, random_state=42)
+
+
+@traced()
+def evaluate_models_external(path, target, cv=3, chunksize=100_000, n_workers=None, external_memory=False,
+                             epochs=LINEAR_EPOCHS, spill_dir=None):
+    """
+    Out-of-core evaluate_models for tables larger than RAM. The file is read once in
+    chunks into a memory-mapped float32 spill; folds are interleaved row-range views
+    of it. XGBoost trains through a data iterator into a QuantileDMatrix (or, with
+    external_memory=True, a disk-paged DMatrix); the linear candidate is an SGD model
+    trained with partial_fit. Scores are accumulated chunk by chunk.
+    Returns (results_df, best_model) shaped like evaluate_models; no out-of-fold
+    arrays are kept, and results_df.attrs["sample"] holds a small row sample.
+    """
+    n_threads = max(1, n_workers or default_worker_budget())
+    with FeatureStore(path, target, chunksize=chunksize, spill_dir=spill_dir) as store:
+        task_type = store.task_type
+        n_classes = len(store.classes) if task_type == "classification" else None
+        linear_name, linear_model = _linear_candidate(task_type)
+
+        def fit(name, fold):
+            if name == "XGBoost":
+                return _fit_xgb(store, fold, cv, n_threads, external_memory)
+            return _fit_linear(store, linear_model, fold, cv, epochs)
+
+        def predict(name, model, X):
+            if name == "XGBoost":
+                return _xgb_predict(model, X, task_type)
+            return model.predict(store.scaler.transform(X))
+
+        results = []
+        for name in (linear_name, "XGBoost"):
+            scores = []
+            try:
+                for fold in range(cv):
+                    with span("external_fold", model=name, fold=fold):
+                        model = fit(name, fold)
+                        scorer = _StreamingScore(task_type, n_classes)
+                        for X, y in store.ranges(fold, cv, holdout=True):
+                            scorer.update(y, predict(name, model, X))
+                        scores.append(scorer.score())
+            except Exception as e:
+                print(f"❌ Failed {name}: {e}")
+                continue
+            results.append({
+                "model": name,
+                "score_mean": float(np.mean(scores)),
+                "score_std": float(np.std(scores)),
+                "rows_evaluated": store.rows,
+                "model_obj": None,
+                "oof_pred": None,
+                "oof_proba": None,
+            })
+        if not results:
+            raise ValueError("No models were able to train successfully.")
+
+        results_df = pd.DataFrame(results).sort_values("score_mean", ascending=False)
+        best_name = results_df.iloc[0]["model"]
+        with span("external_refit", model=best_name):
+            best = fit(best_name, None)
+        best_model = _wrap_booster(best, store) if best_name == "XGBoost" else best
+
+        results_df.at[results_df.index[0], "model_obj"] = best_model
+        results_df["task_type"] = task_type
+        results_df.attrs["features"] = list(store.features)
+        results_df.attrs["scaler"] = store.scaler if best_name != "XGBoost" else None
+        results_df.attrs["classes"] = store.classes
+        results_df.attrs["sample"] = store.sample()
+    return results_df, best_model
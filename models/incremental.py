@@ -0,0 +1,157 @@
+# models/incremental.py
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import f1_score, r2_score
+
+from models.serving import ModelBundle
+from models.trainer import evaluate_models, warm_start_model
+from profiler.stats_report import ProfileAccumulator, iter_appended_chunks
+from utils.ingest import build_feature_matrix, load_dataset
+from utils.tracing import span, traced
+
+# Candidates that can keep learning from appended rows (see trainer.warm_start_model)
+WARM_START_CANDIDATES = ("RandomForest", "XGBoost")
+
+
+def _holdout_path(bundle_path):
+    return f"{bundle_path}.holdout.npz"
+
+
+def _score(bundle, model, X, y):
+    pred = model.predict(X)
+    if bundle.task_type == "regression":
+        return float(r2_score(y, pred))
+    return float(f1_score(y, pred, average="macro"))
+
+
+def _encode_target(bundle, y: pd.Series):
+    """New target values as the codes the bundle's model was trained on."""
+    if bundle.classes is None:
+        return y.to_numpy()
+    classes = pd.Index(bundle.classes)
+    # build_feature_matrix encodes a text target by its str() labels; anything else
+    # (e.g. float labels read back as ints) matches by value, so 1 == 1.0
+    values = y.astype(str) if classes.inferred_type == "string" else y
+    codes = classes.get_indexer(values)
+    if (codes < 0).any():
+        raise ValueError("New rows contain target labels the model has never seen.")
+    return codes.astype(np.int64)
+
+
+@traced()
+def warm_refresh(bundle: ModelBundle, delta: pd.DataFrame, target: str, history_rows: int,
+                 holdout_fraction=0.2, tolerance=0.01, carry=None):
+    """
+    Warm-start the bundle's model on appended rows. The newest `holdout_fraction` of the
+    delta is held out to score the old and the updated model; those rows are returned
+    as `carry` and trained on in the next refresh, so every row is eventually learned.
+    The update is kept unless the holdout score drops by more than `tolerance`.
+    """
+    delta = delta[delta[target].notna()]
+    X = bundle.prepare(delta)
+    y = _encode_target(bundle, delta[target])
+
+    n_holdout = int(len(X) * holdout_fraction)
+    split = len(X) - n_holdout
+    X_train, y_train = X[:split], y[:split]
+    if carry is not None:
+        X_train, y_train = np.concatenate([carry[0], X_train]), np.concatenate([carry[1], y_train])
+    X_hold, y_hold = X[split:], y[split:]
+
+    report = {"new_rows": len(X), "trained_rows": len(X_train), "holdout_rows": n_holdout}
+    with span("warm_start", data=X_train):
+        updated = warm_start_model(bundle.model, X_train, y_train, history_rows=history_rows)
+
+    if n_holdout:
+        report["score_before"] = _score(bundle, bundle.model, X_hold, y_hold)
+        report["score_after"] = _score(bundle, updated, X_hold, y_hold)
+        report["accepted"] = report["score_after"] >= report["score_before"] - tolerance
+    else:
+        report["accepted"] = True
+
+    if report["accepted"]:
+        bundle.model = updated
+        bundle._explainer = None
+    return bundle, report, (X_hold, y_hold)
+
+
+def _full_refresh(path, target, bundle_path, state_path, chunksize):
+    """Profile and train the warm-startable candidates from scratch, saving the state later refreshes build on."""
+    acc = ProfileAccumulator(target)
+    chunks, watermark = iter_appended_chunks(path, chunksize=chunksize)
+    for chunk in chunks:
+        acc.update(chunk)
+    X, y = build_feature_matrix(load_dataset(path), target)
+    results_df, _ = evaluate_models(X, y, candidates=WARM_START_CANDIDATES)
+    ModelBundle.from_results(results_df, X).save(bundle_path)
+    if os.path.exists(_holdout_path(bundle_path)):
+        os.remove(_holdout_path(bundle_path))
+    acc.source_bytes = watermark
+    acc.save(state_path)
+    return acc.result(), {"new_rows": acc.rows, "full_retrain": True, "model": results_df.iloc[0]["model"]}
+
+
+@traced()
+def refresh_from_file(path, target, bundle_path, state_path, holdout_fraction=0.2, chunksize=100_000):
+    """
+    Daily refresh for an append-only table. Rows past the saved profile's watermark are
+    read once: they are merged into the persisted profile and used to warm-start the
+    saved model. The first run (no bundle yet) profiles and trains on the full table.
+    Returns (profile, report).
+    """
+    acc = ProfileAccumulator.load(state_path) if os.path.exists(state_path) else None
+    if acc is None or not os.path.exists(bundle_path):
+        return _full_refresh(path, target, bundle_path, state_path, chunksize)
+
+    if acc.source_bytes is not None and os.path.getsize(path) < acc.source_bytes:
+        raise ValueError(f"{path} shrank since the last refresh; rerun from scratch.")
+
+    delta_acc, chunks = ProfileAccumulator(target), []
+    appended, watermark = iter_appended_chunks(path, acc, chunksize)
+    for chunk in appended:
+        delta_acc.update(chunk)
+        chunks.append(chunk)
+    if not chunks:
+        return acc.result(), {"new_rows": 0}
+
+    bundle = ModelBundle.load(bundle_path)
+    carry = None
+    if os.path.exists(_holdout_path(bundle_path)):
+        with np.load(_holdout_path(bundle_path)) as saved:
+            carry = (saved["X"], saved["y"])
+
+    delta = pd.concat(chunks, ignore_index=True)
+    try:
+        bundle, report, holdout = warm_refresh(bundle, delta, target, history_rows=acc.rows,
+                                               holdout_fraction=holdout_fraction, carry=carry)
+    except ValueError as e:
+        print(f"♻️ Warm start not possible ({e}); retraining on the full table")
+        return _full_refresh(path, target, bundle_path, state_path, chunksize)
+    report["model"] = bundle.model_name
+    bundle.save(bundle_path)
+    np.savez(_holdout_path(bundle_path), X=holdout[0], y=holdout[1])
+
+    acc.merge(delta_acc)
+    acc.source_bytes = watermark
+    acc.save(state_path)
+    return acc.result(), report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ExplainML++ - incremental profile + warm-start refresh")
+    parser.add_argument("data", help="Append-only CSV, Parquet or Feather table")
+    parser.add_argument("--target", required=True, help="Target column")
+    parser.add_argument("--bundle", default="model.joblib", help="Model bundle to create/refresh")
+    parser.add_argument("--state", default="profile_state.json", help="Persisted profile state")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Share of new rows held out for scoring")
+    args = parser.parse_args()
+
+    profile, report = refresh_from_file(args.data, args.target, args.bundle, args.state, args.holdout)
+    print(f"📊 {profile['rows']} rows profiled | {report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,190 @@
 # models/retrainer.py
+import json
+
 import pandas as pd
 import numpy as np
+from models.trainer import evaluate_models
+from utils.ingest import build_feature_matrix
+from utils.tracing import span, traced
+
+MISSING_TOKEN = "__explainml_missing__"
+
+
+class FixPlan:
+    """
+    Preprocessing compiled from fix suggestions: column drops, imputations, log
+    transforms and optional resampling. fit() learns the data-dependent parameters
+    (fill values, log shifts), after which the plan is plain JSON and can be saved,
+    reloaded and applied to new data without the original frame.
+    """
+
+    def __init__(self, target, drop=(), impute=(), log=(), resample=None,
+                 fill_values=None, log_shifts=None):
+        self.target = target
+        self.drop = list(dict.fromkeys(drop))
+        self.impute = [c for c in dict.fromkeys(impute) if c not in self.drop]
+        self.log = [c for c in dict.fromkeys(log) if c not in self.drop]
+        self.resample = resample
+        self.fill_values = dict(fill_values or {})
+        self.log_shifts = dict(log_shifts or {})
+
+    def __repr__(self):
+        return f"FixPlan({json.dumps(self.to_dict())})"
+
+    @property
+    def fitted(self):
+        return all(c in self.fill_values for c in self.impute) and all(c in self.log_shifts for c in self.log)
+
+    def fit(self, df: pd.DataFrame):
+        """Median (numeric) or mode (other) fill values and a shift that keeps log1p defined."""
+        for col in self.impute:
+            if col not in df.columns:
+                self.fill_values[col] = None
+                continue
+            s = df[col]
+            if pd.api.types.is_numeric_dtype(s):
+                value = s.median()
+            else:
+                modes = s.mode(dropna=True)
+                value = modes.iloc[0] if len(modes) else None
+            self.fill_values[col] = value.item() if hasattr(value, "item") else value
+        for col in self.log:
+            if col not in df.columns or not pd.api.types.is_numeric_dtype(df[col]):
+                self.log_shifts[col] = None
+                continue
+            low = df[col].min()
+            self.log_shifts[col] = float(-low) if pd.notna(low) and low < 0 else 0.0
+        return self
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        One pass over the columns: each kept column is imputed and log-transformed in a
+        single expression and untouched columns are passed through without a copy.
+        Resampling, if planned, runs once on the result.
+        """
+        if not self.fitted:
+            self.fit(df)
+        columns = {}
+        for col in df.columns:
+            if col in self.drop:
+                continue
+            s = df[col]
+            if col in self.fill_values and self.fill_values[col] is not None:
+                s = s.fillna(self.fill_values[col])
+            if self.log_shifts.get(col) is not None:
+                s = np.log1p(s + self.log_shifts[col]) if self.log_shifts[col] else np.log1p(s)
+            columns[col] = s
+        out = pd.DataFrame(columns, index=df.index, copy=False)
+        if self.resample == "smote":
+            out = _smote(out, self.target)
+        return out
+
+    def to_dict(self):
+        return {
+            "target": self.target,
+            "drop": self.drop,
+            "impute": self.impute,
+            "log": self.log,
+            "resample": self.resample,
+            "fill_values": self.fill_values,
+            "log_shifts": self.log_shifts,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
 
-def apply_fixes_and_retrain(df: pd.DataFrame, target: str, suggestions: list):
-    """Apply fixes and retrain best model."""
-    df_clean = df.copy()
 
+def compile_fix_plan(suggestions: list, target: str) -> FixPlan:
+    """
+    Fold a generate_suggestions() list into one FixPlan. Removal and leakage drop the
+    feature, collinearity drops the second column of the pair, imputation and
+    transformation become fill/log steps and balancing turns on SMOTE. Error-slice
+    suggestions have no automatic fix.
+    """
+    drop, impute, log, resample = [], [], [], None
     for suggestion in suggestions:
         sugg_type = suggestion["type"]
-        feature = suggestion["feature"]
-
-        if sugg_type == "removal" and feature in df_clean.columns:
-            df_clean = df_clean.drop(columns=[feature])
-            print(f"❌ Removed: {feature}")
+        feature = suggestion.get("feature")
 
+        if sugg_type in ("removal", "leakage"):
+            drop.append(feature)
+        elif sugg_type == "collinearity":
+            drop.append(feature.split(", ")[-1])
+        elif sugg_type == "imputation":
+            impute.append(feature)
+        elif sugg_type in ("transformation", "transform"):
+            log.append(feature)
         elif sugg_type == "balancing":
-            from imblearn.over_sampling import SMOTE
-            X, y = df_clean.drop(columns=[target]), df_clean[target]
-            X = X.select_dtypes(include=[float, int]).fillna(0)
-            smote = SMOTE(random_state=42)
-            X_res, y_res = smote.fit_resample(X, y)
-            df_clean = pd.concat([X_res, y_res], axis=1)
-            print("♻️ Applied SMOTE")
-
-        elif sugg_type == "transform" and feature in df_clean.columns:
-            df_clean[feature] = np.log1p(df_clean[feature])
-            print(f"📈 Log-transformed: {feature}")
-
-    return df_clean
\ No newline at end of file
+            resample = "smote"
+
+    # Fixes only ever touch features: never drop, fill or log-transform the label
+    drop, impute, log = ([c for c in cols if c != target] for cols in (drop, impute, log))
+    return FixPlan(target, drop=drop, impute=impute, log=log, resample=resample)
+
+
+def _smote(df: pd.DataFrame, target: str) -> pd.DataFrame:
+    """SMOTE on numeric features, SMOTENC when non-numeric columns have to be kept."""
+    from imblearn.over_sampling import SMOTE, SMOTENC
+
+    X, y = df.drop(columns=[target]), df[target]
+    categorical = [c for c in X.columns if not pd.api.types.is_numeric_dtype(X[c])]
+    numeric = [c for c in X.columns if c not in categorical]
+    X = X.copy()
+    X[numeric] = X[numeric].fillna(0)
+    dtypes = {c: X[c].dtype for c in categorical}
+    for col in categorical:
+        X[col] = X[col].astype(object).where(X[col].notna(), MISSING_TOKEN)
+
+    if categorical:
+        sampler = SMOTENC(categorical_features=[X.columns.get_loc(c) for c in categorical], random_state=42)
+    else:
+        sampler = SMOTE(random_state=42)
+    X_res, y_res = sampler.fit_resample(X, y)
+
+    for col in categorical:
+        X_res[col] = X_res[col].where(X_res[col] != MISSING_TOKEN).astype(dtypes[col])
+    print(f"♻️ Applied {type(sampler).__name__}: {len(df)} -> {len(X_res)} rows")
+    return pd.concat([X_res, y_res.rename(target)], axis=1)
+
+
+@traced()
+def apply_fixes_and_retrain(df: pd.DataFrame, target: str, suggestions: list, results_df=None, cv=3,
+                            n_workers=None, plan=None):
+    """
+    Apply fixes and retrain best model.
+    Suggestions are compiled into a FixPlan (or a saved `plan` is reused) and applied
+    in one pass. With `results_df` from evaluate_models only its best model is
+    re-scored and refit on the fixed data; without it every candidate is evaluated.
+    Returns {"plan", "data", "results_df", "model"}. Callers of the old version, which
+    returned only the fixed DataFrame, should read result["data"].
+    """
+    plan = plan or compile_fix_plan(suggestions, target)
+    with span("apply_fix_plan", data=df) as s:
+        df_clean = plan.apply(df)
+        s.set(rows_out=len(df_clean), cols_out=df_clean.shape[1])
+
+    for col in plan.drop:
+        print(f"❌ Removed: {col}")
+    for col in plan.log:
+        print(f"📈 Log-transformed: {col}")
+
+    candidates = None if results_df is None else [results_df.iloc[0]["model"]]
+    X_num, y = build_feature_matrix(df_clean, target)
+    new_results, best_model = evaluate_models(X_num, y, cv=cv, n_workers=n_workers, candidates=candidates)
+
+    return {
+        "plan": plan,
+        "data": df_clean,
+        "results_df": new_results,
+        "model": best_model,
+    }
@@ -0,0 +1,197 @@
+# models/scheduler.py
+import contextvars
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError  # not the builtin before Python 3.11
+
+import numpy as np
+from joblib import parallel_backend
+from sklearn.base import clone, is_classifier
+from sklearn.metrics import f1_score, get_scorer, r2_score
+from sklearn.model_selection import check_cv
+from threadpoolctl import threadpool_limits
+
+# Worker processes: memory-mapped arrays per scheduler id, attached by the pool initializer
+_SHARED = {}
+# Arrays of the scheduler whose task is running in this thread, set around each task
+_CURRENT = contextvars.ContextVar("explainml_shared")
+_SCHEDULER_IDS = itertools.count()
+
+# Scorings computed from a fold's predictions, so those predictions can be kept as out-of-fold output
+PREDICTION_METRICS = {
+    "f1_macro": lambda y, pred: f1_score(y, pred, average="macro"),
+    "r2": r2_score,
+}
+
+
+def default_worker_budget():
+    return os.cpu_count() or 1
+
+
+def assign_folds(cv, X, y, classifier: bool):
+    """Return a compact per-row fold id array equivalent to cross_val_score's splits."""
+    splitter = check_cv(cv, y, classifier=classifier)
+    folds = np.empty(len(y), dtype=np.int16)
+    for k, (_, test_idx) in enumerate(splitter.split(X, y)):
+        folds[test_idx] = k
+    return folds, splitter.get_n_splits()
+
+
+def cap_model_threads(model, n_threads: int):
+    """Limit a model's own parallelism (sklearn n_jobs / XGBoost n_jobs, a.k.a. nthread)."""
+    params = model.get_params()
+    capped = {k: n_threads for k in ("n_jobs", "nthread") if k in params}
+    if capped:
+        model.set_params(**capped)
+    return model
+
+
+def _attach(key, specs, context=None):
+    """Pool initializer: open every shared array read-only, memory-mapped."""
+    arrays = {name: np.load(path, mmap_mode="r") for name, path in specs.items()}
+    arrays["context"] = context
+    _SHARED[key] = arrays
+
+
+def _call(arrays, func, task):
+    """Run func(*task) with `arrays` visible to shared() in this thread only."""
+    token = _CURRENT.set(arrays)
+    try:
+        return func(*task)
+    finally:
+        _CURRENT.reset(token)
+
+
+def _run_task(key, func, task):
+    """
+    Pool task: run func(*task) against the arrays of scheduler `key`. A model's own
+    n_jobs runs on threads here: a nested loky pool would outlive the task and keep
+    the worker from exiting on shutdown.
+    """
+    with parallel_backend("threading"):
+        return _call(_SHARED[key], func, task)
+
+
+def shared(name):
+    """Access a shared array (or the scheduler's `context` object) from inside a task."""
+    try:
+        arrays = _CURRENT.get()
+    except LookupError:
+        raise RuntimeError("shared() called outside a TaskScheduler task") from None
+    return arrays[name]
+
+
+def run_fold(name, model, matrix, fold, scoring, n_threads, rows=None):
+    """
+    Fit a fresh clone on all rows outside `fold` and score it on `fold`.
+    With `rows`, only the first `rows` entries of the shared "order" array are used,
+    split by the shared "race_folds" ids (a stratified subsample for racing).
+    Returns (name, fold, score, predictions); on full-data folds the predictions are
+    (predicted labels/values, (classes, probabilities) or None) for the fold's rows.
+    """
+    X, y, folds = shared(matrix), shared("y"), shared("folds")
+    if rows is not None:
+        idx = np.sort(shared("order")[:rows])
+        X, y, folds = X[idx], y[idx], shared("race_folds")[idx]
+    test = folds == fold
+    model = cap_model_threads(clone(model), n_threads)
+    with threadpool_limits(limits=n_threads):
+        model.fit(X[~test], y[~test])
+        if rows is not None or scoring not in PREDICTION_METRICS:
+            return name, fold, get_scorer(scoring)(model, X[test], y[test]), None
+        pred = model.predict(X[test])
+        proba = None
+        if is_classifier(model) and hasattr(model, "predict_proba"):
+            proba = (model.classes_, model.predict_proba(X[test]).astype(np.float32))
+    return name, fold, PREDICTION_METRICS[scoring](y[test], pred), (pred, proba)
+
+
+def run_refit(name, model, matrix, n_threads):
+    """Fit `model` on every row and return the fitted estimator."""
+    X, y = shared(matrix), shared("y")
+    model = cap_model_threads(clone(model), n_threads)
+    with threadpool_limits(limits=n_threads):
+        model.fit(X, y)
+    return name, model
+
+
+class TaskScheduler:
+    """
+    Runs model tasks against arrays shared once with the workers.
+    Arrays are written to a temp dir as .npy and memory-mapped by every worker,
+    so the feature matrix is never pickled per task. `context` (e.g. a fitted explainer)
+    is sent to each worker once. With n_workers=1 tasks run inline.
+    Each scheduler keeps its arrays under its own id, so schedulers on concurrent
+    threads (app stages, sessions) never see each other's data.
+    """
+
+    def __init__(self, arrays: dict, n_workers=None, max_tasks=None, context=None):
+        self.arrays = arrays
+        self.context = context
+        self.n_workers = max(1, n_workers or default_worker_budget())
+        self.pool_size = min(self.n_workers, max_tasks or self.n_workers)
+        self.key = f"{os.getpid()}-{next(_SCHEDULER_IDS)}"
+        self.tmp_dir = None
+        self.pool = None
+
+    @property
+    def threads_per_task(self):
+        return max(1, self.n_workers // self.pool_size)
+
+    def __enter__(self):
+        if self.pool_size <= 1:
+            return self
+
+        self.tmp_dir = tempfile.mkdtemp(prefix="explainml_")
+        specs = {}
+        for name, arr in self.arrays.items():
+            path = os.path.join(self.tmp_dir, f"{name}.npy")
+            np.save(path, np.ascontiguousarray(arr))
+            specs[name] = path
+        self.pool = ProcessPoolExecutor(max_workers=self.pool_size, initializer=_attach,
+                                        initargs=(self.key, specs, self.context))
+        return self
+
+    def __exit__(self, *exc):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.tmp_dir is not None:
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        return False
+
+    def map(self, func, tasks, deadline=None):
+        """
+        Run func(*task) for every task; returns (result, error) pairs in task order.
+        With a `deadline` (time.monotonic() value), tasks not finished by then are
+        cancelled and reported as concurrent.futures.TimeoutError; tasks already running
+        are not interrupted.
+        """
+        if self.pool is None:
+            arrays = {**self.arrays, "context": self.context}
+            outcomes = []
+            for task in tasks:
+                if deadline is not None and time.monotonic() >= deadline:
+                    outcomes.append((None, FutureTimeoutError("time budget exhausted")))
+                    continue
+                try:
+                    outcomes.append((_call(arrays, func, task), None))
+                except Exception as e:
+                    outcomes.append((None, e))
+            return outcomes
+
+        futures = [self.pool.submit(_run_task, self.key, func, task) for task in tasks]
+        outcomes = []
+        for fut in futures:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                outcomes.append((fut.result(timeout=timeout), None))
+            except FutureTimeoutError:
+                fut.cancel()
+                outcomes.append((None, FutureTimeoutError("time budget exhausted")))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
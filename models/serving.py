@@ -0,0 +1,339 @@
+# models/serving.py
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BACKGROUND_ROWS = 100
+
+
+class ModelBundle:
+    """
+    Everything needed to score new rows with the model evaluate_models selected:
+    the fitted estimator, its feature order, the scaler it was trained behind (if any),
+    the original class labels and a small background sample for SHAP.
+    """
+
+    def __init__(self, model, features, task_type, model_name=None, scaler=None, classes=None, background=None):
+        self.model = model
+        self.features = list(features)
+        self.task_type = task_type
+        self.model_name = model_name or type(model).__name__
+        self.scaler = scaler
+        self.classes = classes
+        self.background = background
+        self._explainer = None
+
+    @classmethod
+    def from_results(cls, results_df: pd.DataFrame, X: pd.DataFrame = None):
+        """Bundle the best row of evaluate_models() output; X supplies the SHAP background."""
+        best = results_df.iloc[0]
+        bundle = cls(
+            best["model_obj"], results_df.attrs["features"], best["task_type"], model_name=best["model"],
+            scaler=results_df.attrs.get("scaler"), classes=results_df.attrs.get("classes")
+        )
+        if X is not None:
+            # Background goes through the same preparation as the rows being explained
+            bundle.background = bundle.prepare(X.sample(min(BACKGROUND_ROWS, len(X)), random_state=42))
+        return bundle
+
+    def save(self, path):
+        joblib.dump({k: v for k, v in self.__dict__.items() if k != "_explainer"}, path)
+
+    @classmethod
+    def load(cls, path):
+        return cls(**joblib.load(path))
+
+    def prepare(self, X: pd.DataFrame) -> np.ndarray:
+        """
+        Features in training order as float32 (missing -> 0), scaled like the training
+        matrix. Values that are present but not numbers raise ValueError.
+        """
+        missing = [c for c in self.features if c not in X.columns]
+        if missing:
+            raise ValueError(f"Missing feature columns: {missing}")
+        matrix = np.empty((len(X), len(self.features)), dtype=np.float32)
+        for j, col in enumerate(self.features):
+            try:
+                values = pd.to_numeric(X[col])
+            except (ValueError, TypeError) as e:
+                raise ValueError(f"Feature column '{col}' has non-numeric values: {e}") from None
+            matrix[:, j] = values.to_numpy(dtype=np.float32, na_value=np.nan)
+        np.nan_to_num(matrix, copy=False, nan=0.0)
+        if self.scaler is not None:
+            matrix = self.scaler.transform(matrix).astype(np.float32)
+        return matrix
+
+    def _decode(self, codes):
+        if self.classes is None:
+            return codes
+        return np.asarray(self.classes, dtype=object)[np.asarray(codes, dtype=np.int64)]
+
+    def predict(self, X: pd.DataFrame, matrix=None):
+        matrix = self.prepare(X) if matrix is None else matrix
+        output = {"predictions": self._decode(self.model.predict(matrix))}
+        if self.task_type == "classification" and hasattr(self.model, "predict_proba"):
+            output["probabilities"] = self.model.predict_proba(matrix)
+        return output
+
+    def explain(self, matrix: np.ndarray):
+        """Per-row SHAP values with the same explainer choice as shap_engine."""
+        from explainability.shap_engine import make_explainer
+
+        if self._explainer is None:
+            background = self.background if self.background is not None else matrix[:BACKGROUND_ROWS]
+            self._explainer, _ = make_explainer(self.model, pd.DataFrame(background, columns=self.features))
+        explanation = self._explainer(pd.DataFrame(matrix, columns=self.features))
+        return np.asarray(explanation.values), np.asarray(explanation.base_values)
+
+
+class ServingMetrics:
+    """Request/row counters plus a rolling window of request latencies."""
+
+    def __init__(self, window=10_000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = self.rows = self.batches = self.errors = 0
+
+    def record_batch(self, n_requests, n_rows, latencies, failed=0):
+        """`failed` is the number of the batch's requests that got an error."""
+        with self._lock:
+            self.batches += 1
+            self.requests += n_requests
+            self.rows += n_rows
+            self.errors += failed
+            self._latencies.extend(latencies)
+
+    def record_rejected(self):
+        """A request refused before batching (e.g. missing or non-numeric columns)."""
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000
+            uptime = time.perf_counter() - self.started
+            return {
+                "uptime_s": round(uptime, 3),
+                "requests": self.requests,
+                "rows": self.rows,
+                "batches": self.batches,
+                "errors": self.errors,
+                "rows_per_s": round(self.rows / uptime, 1) if uptime else 0.0,
+                "mean_batch_rows": round(self.rows / self.batches, 1) if self.batches else 0.0,
+                "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+            }
+
+
+class _Pending:
+    __slots__ = ("matrix", "explain", "arrived", "done", "result", "error")
+
+    def __init__(self, matrix, explain):
+        self.matrix = matrix
+        self.explain = explain
+        self.arrived = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent scoring requests into one model call. A batch closes when it
+    reaches `max_batch_rows` or when its oldest request has waited `max_wait_ms`, so
+    the latency budget bounds queueing delay while busy periods get large batches.
+    Each request is validated and prepared on its own caller's thread, so a bad request
+    is rejected without joining (and failing) a batch.
+    """
+
+    def __init__(self, bundle: ModelBundle, max_batch_rows=4096, max_wait_ms=5.0, metrics=None):
+        self.bundle = bundle
+        self.max_batch_rows = max_batch_rows
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServingMetrics()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._loop, name="explainml-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, frame: pd.DataFrame, explain=False, timeout=None):
+        """Score `frame` as part of the next batch; blocks until its results are ready."""
+        try:
+            matrix = self.bundle.prepare(frame)
+        except Exception:
+            self.metrics.record_rejected()
+            raise
+        pending = _Pending(matrix, explain)
+        self._queue.put(pending)
+        if not pending.done.wait(timeout):
+            raise TimeoutError("Scoring request timed out.")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, rows = [first], len(first.matrix)
+            deadline = first.arrived + self.max_wait
+            while rows < self.max_batch_rows:
+                # Requests already queued always join; waiting for new ones is capped by the budget
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item.matrix)
+            self._run(batch, rows)
+
+    def _run(self, batch, n_rows):
+        try:
+            self._score(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].error = e
+            else:
+                # Score requests one by one so a failure stays with the request that caused it
+                for pending in batch:
+                    try:
+                        self._score([pending])
+                    except Exception as single_error:
+                        pending.error = single_error
+        finished = time.perf_counter()
+        for pending in batch:
+            pending.done.set()
+        failed = sum(pending.error is not None for pending in batch)
+        self.metrics.record_batch(len(batch), n_rows, [finished - p.arrived for p in batch], failed=failed)
+
+    def _score(self, batch):
+        """One model call (plus one SHAP call) for every request in `batch`."""
+        matrix = np.concatenate([p.matrix for p in batch]) if len(batch) > 1 else batch[0].matrix
+        output = self.bundle.predict(None, matrix=matrix)
+        offsets = np.cumsum([0] + [len(p.matrix) for p in batch])
+
+        # Only the rows whose request asked for attributions go through SHAP
+        explain_rows = np.concatenate(
+            [np.arange(offsets[i], offsets[i + 1]) for i, p in enumerate(batch) if p.explain] or [[]]
+        ).astype(np.int64)
+        if len(explain_rows):
+            shap_values, base_values = self.bundle.explain(matrix[explain_rows])
+        explained = 0
+
+        for i, pending in enumerate(batch):
+            lo, hi = offsets[i], offsets[i + 1]
+            result = {key: value[lo:hi] for key, value in output.items()}
+            if pending.explain:
+                count = hi - lo
+                result["shap_values"] = shap_values[explained:explained + count]
+                result["base_values"] = base_values[explained:explained + count]
+                explained += count
+            pending.result = result
+
+
+def _to_jsonable(result):
+    return {key: np.asarray(value).tolist() for key, value in result.items()}
+
+
+def _make_handler(batcher: MicroBatcher):
+    class ScoringHandler(BaseHTTPRequestHandler):
+        """POST /predict with {"rows": [...]} or {"columns": [...], "data": [[...]]}; GET /metrics, /health."""
+
+        def _send(self, status, payload):
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, batcher.metrics.snapshot())
+            elif self.path == "/health":
+                self._send(200, {"status": "ok", "model": batcher.bundle.model_name})
+            else:
+                self._send(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": f"Unknown path {self.path}"})
+                return
+            try:
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if "rows" in payload:
+                    frame = pd.DataFrame(payload["rows"])
+                else:
+                    frame = pd.DataFrame(payload["data"], columns=payload["columns"])
+            except (ValueError, KeyError, TypeError) as e:
+                self._send(400, {"error": f"Bad request: {e}"})
+                return
+            try:
+                result = batcher.submit(frame, explain=bool(payload.get("explain")))
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+                return
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+                return
+            self._send(200, _to_jsonable(result))
+
+        def log_message(self, format, *args):
+            pass  # per-request logging would dominate at thousands of requests per second
+
+    return ScoringHandler
+
+
+class ScoringServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default of 5 resets connections under concurrent clients
+
+
+def serve(bundle: ModelBundle, host="127.0.0.1", port=8000, max_batch_rows=4096, max_wait_ms=5.0):
+    """Run the scoring server until interrupted."""
+    batcher = MicroBatcher(bundle, max_batch_rows=max_batch_rows, max_wait_ms=max_wait_ms)
+    server = ScoringServer((host, port), _make_handler(batcher))
+    print(f"🚀 Serving {bundle.model_name} on http://{host}:{server.server_port} "
+          f"(batch <= {max_batch_rows} rows, wait <= {max_wait_ms}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        print(f"📊 {json.dumps(batcher.metrics.snapshot())}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ExplainML++ - scoring server for a saved model bundle")
+    parser.add_argument("bundle", help="Path written by ModelBundle.save (e.g. explainml.py --save-model)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-rows", type=int, default=4096, help="Rows per model call")
+    parser.add_argument("--max-wait-ms", type=float, default=5.0, help="Latency budget for filling a batch")
+    args = parser.parse_args()
+    serve(ModelBundle.load(args.bundle), args.host, args.port, args.max_batch_rows, args.max_wait_ms)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 # models/trainer.py
-from sklearn.model_selection import cross_val_score
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
-from sklearn.linear_model import LogisticRegression, LinearRegression
-from xgboost import XGBClassifier, XGBRegressor
-from sklearn.preprocessing import StandardScaler
+import copy
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import LabelEncoder
+from sklearn.base import clone
+from models.scheduler import TaskScheduler, assign_folds, run_fold, run_refit
+from utils.ingest import numeric_features
+from utils.tracing import traced
 
 def get_models(task_type: str):
+    # Model libraries load on first use; xgboost alone costs a noticeable import
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+    from sklearn.linear_model import LogisticRegression, LinearRegression
+    from xgboost import XGBClassifier, XGBRegressor
+
     if task_type == "classification":
         return {
             "LogisticRegression": LogisticRegression(max_iter=1000, random_state=42, solver='lbfgs'),
@@ -23,18 +27,170 @@ def get_models(task_type: str):
         }
     return {}
 
-def evaluate_models(X: pd.DataFrame, y: pd.Series, cv=3):
-    X_num = X.select_dtypes(include=[np.number]).fillna(0)
+def warm_start_model(model, X, y, history_rows=None, extra_estimators=None):
+    """
+    Continue training a fitted tree ensemble on new rows only: XGBoost keeps boosting
+    from its current booster, RandomForest grows extra trees via warm_start. Unless
+    `extra_estimators` is given, the added rounds/trees scale with the new rows' share
+    of `history_rows` (capped at the model's n_estimators). Returns a new model.
+    """
+    name = type(model).__name__
+    if hasattr(model, "classes_") and set(np.unique(y)) != set(np.asarray(model.classes_).tolist()):
+        raise ValueError("Warm start needs every known class in the new rows.")
+    base = model.get_params().get("n_estimators") or 100
+    if extra_estimators is None:
+        extra_estimators = base if not history_rows else min(base, int(np.ceil(base * len(X) / history_rows)))
+    extra = max(1, int(extra_estimators))
+
+    if name in ("XGBClassifier", "XGBRegressor"):
+        updated = clone(model).set_params(n_estimators=extra)
+        updated.fit(X, y, xgb_model=model.get_booster())
+    elif name in ("RandomForestClassifier", "RandomForestRegressor"):
+        updated = copy.deepcopy(model)
+        updated.set_params(warm_start=True, n_estimators=len(model.estimators_) + extra)
+        updated.fit(X, y)
+    else:
+        raise ValueError(f"{name} does not support warm-start retraining.")
+    return updated
+
+
+def stratified_order(y, task_type: str, random_state=42):
+    """
+    Row order whose every prefix is a (nearly) stratified random subsample:
+    rows are spread evenly through the order within their own class.
+    """
+    rng = np.random.default_rng(random_state)
+    n = len(y)
+    if task_type != "classification":
+        return rng.permutation(n)
+    _, codes, counts = np.unique(y, return_inverse=True, return_counts=True)
+    shuffled = rng.permutation(n)
+    rank_in_class = np.empty(n)
+    for c in range(len(counts)):
+        members = shuffled[codes[shuffled] == c]
+        rank_in_class[members] = np.arange(len(members))
+    position = (rank_in_class + rng.random(n)) / counts[codes]
+    return np.argsort(position, kind="stable")
+
+
+def _score_models(scheduler, models, matrix_for, n_splits, scoring, rows=None):
+    """
+    CV-score every model as (model, fold) tasks; returns per-model scores, failures and
+    (full-data runs only) each model's per-fold predictions for _out_of_fold().
+    """
+    fold_tasks = [
+        (name, models[name], matrix_for[name], fold, scoring, scheduler.threads_per_task, rows)
+        for name in models
+        for fold in range(n_splits)
+    ]
+    outcomes = scheduler.map(run_fold, fold_tasks)
+
+    scores, failed, predictions = {name: [] for name in models}, {}, {}
+    for task, (result, error) in zip(fold_tasks, outcomes):
+        name = task[0]
+        if error is not None:
+            failed.setdefault(name, error)
+        else:
+            scores[name].append(result[2])
+            if result[3] is not None:
+                predictions.setdefault(name, []).append((result[1], result[3]))
+    scores = {name: np.array(s) for name, s in scores.items() if name not in failed}
+    return scores, failed, {name: p for name, p in predictions.items() if name in scores}
+
+
+def _out_of_fold(fold_predictions, folds, task_type, classes):
+    """
+    Stitch per-fold predictions into one array over all rows (labels in y's encoded
+    space, float32 values for regression) plus float32 probabilities with one column
+    per entry of `classes` (a class absent from a fold's training rows stays 0).
+    """
+    pred = proba = None
+    for fold, (fold_pred, fold_proba) in fold_predictions:
+        rows = np.flatnonzero(folds == fold)
+        if pred is None:
+            pred = np.empty(len(folds), dtype=np.float32 if task_type == "regression" else np.asarray(fold_pred).dtype)
+        pred[rows] = fold_pred
+        if fold_proba is not None:
+            if proba is None:
+                proba = np.zeros((len(folds), len(classes)), dtype=np.float32)
+            model_classes, values = fold_proba
+            proba[np.ix_(rows, np.searchsorted(classes, model_classes))] = values
+    return pred, proba
+
+
+def _race(scheduler, models, matrix_for, n_splits, scoring, n_rows, min_rows, drop_fraction, growth):
+    """
+    Successive halving: score candidates on a small stratified subsample, drop the
+    bottom `drop_fraction`, grow the sample by `growth` and repeat until the full data
+    is reached or one model is left. Returns last scores, rows used, the race log and
+    the full-data fold predictions of the finalists.
+    """
+    alive = dict(models)
+    final_scores, rows_used, race, predictions = {}, {}, [], {}
+    rows = min(max(min_rows, 1), n_rows)
+    round_no = 0
+    while alive:
+        full = rows >= n_rows or len(alive) == 1
+        if full:
+            rows = n_rows
+        scores, failed, predictions = _score_models(scheduler, alive, matrix_for, n_splits, scoring,
+                                                    rows=None if full else rows)
+        for name, error in failed.items():
+            print(f"❌ Failed {name}: {error}")
+        for name, model_scores in scores.items():
+            final_scores[name], rows_used[name] = model_scores, rows
+
+        ranked = sorted(scores, key=lambda name: scores[name].mean(), reverse=True)
+        keep = ranked if full else ranked[:max(1, int(np.ceil(len(ranked) * (1 - drop_fraction))))]
+        race.append({
+            "round": round_no,
+            "rows": rows,
+            "scores": {name: float(scores[name].mean()) for name in ranked},
+            "eliminated": [name for name in alive if name not in keep],
+        })
+        if full:
+            break
+        alive = {name: alive[name] for name in keep}
+        rows = max(rows + 1, int(rows * growth))  # always progress, even for growth close to 1
+        round_no += 1
+    return final_scores, rows_used, race, predictions
+
+
+@traced()
+def evaluate_models(X: pd.DataFrame, y: pd.Series, cv=3, n_workers=None, strategy="cv",
+                    race_min_rows=1000, race_drop_fraction=0.5, race_growth=3, candidates=None, catalog=None):
+    """
+    Cross-validate every candidate and refit the winner.
+    Each (model, fold) pair and the final refit run as tasks on a process pool of
+    `n_workers` (default: all cores); the feature matrix is shared memory-mapped and
+    each model's own n_jobs is capped so pool x threads never exceeds the budget.
+    strategy="race" runs successive halving over growing stratified subsamples instead
+    of full CV for every candidate; the race log is kept in results_df.attrs["race"].
+    `candidates` restricts the run to those model names (e.g. retraining only a winner).
+    Each model's out-of-fold predictions (in y's labels) and class probabilities are
+    kept in the "oof_pred"/"oof_proba" columns; race-eliminated models have none.
+    A ColumnCatalog holding y's column supplies its distinct count.
+    """
+    if strategy == "race" and not (race_growth > 1 and 0 <= race_drop_fraction < 1):
+        raise ValueError(
+            f"Race needs race_growth > 1 and 0 <= race_drop_fraction < 1 "
+            f"(got {race_growth}, {race_drop_fraction})."
+        )
+    X_num = numeric_features(X)
     if X_num.empty:
         raise ValueError("No numeric features available.")
 
     # Detect task type
-    task_type = 'classification' if y.nunique() <= 20 else 'regression'
+    n_unique = catalog.nunique(y.name) if catalog is not None and y.name in catalog else y.nunique()
+    task_type = 'classification' if n_unique <= 20 else 'regression'
 
     # Encode y only if classification and not already numeric
-    original_y = y.copy()
+    le = None
+    # Labels of a target build_feature_matrix already encoded
+    labels = y.attrs.get("classes") if task_type == "classification" else None
     if task_type == "classification":
-        if y.dtype == 'object' or y.dtype == 'float64':
+        if y.dtype == 'object' or y.dtype.kind == 'f' or isinstance(y.dtype, pd.CategoricalDtype):
+            from sklearn.preprocessing import LabelEncoder
             le = LabelEncoder()
             y = le.fit_transform(y)
         scoring = 'f1_macro'
@@ -42,42 +198,109 @@ def evaluate_models(X: pd.DataFrame, y: pd.Series, cv=3):
         scoring = 'r2'  # Use R² (better interpretation)
 
     models = get_models(task_type)
-    results = []
-
-    for name, model in models.items():
-        try:
-            # Scale only for linear models in regression
-            X_used = X_num.copy()
-            if task_type == "regression" and "Linear" in name:
-                scaler = StandardScaler()
-                X_used = scaler.fit_transform(X_used)
-            else:
-                X_used = X_used.values  # Just ensure array
-
-            scores = cross_val_score(model, X_used, y, cv=cv, scoring=scoring)
+    if candidates is not None:
+        models = {name: model for name, model in models.items() if name in candidates}
+        if not models:
+            raise ValueError(f"None of {list(candidates)} is a {task_type} model.")
+    X_arr = X_num.to_numpy()
+    y_arr = np.asarray(y)
+    folds, n_splits = assign_folds(cv, X_arr, y_arr, classifier=task_type == "classification")
+
+    # Scale only for linear models in regression
+    arrays = {"raw": X_arr, "y": y_arr, "folds": folds}
+    matrix_for = {name: "raw" for name in models}
+    scaler = None
+    if task_type == "regression" and any("Linear" in name for name in models):
+        from sklearn.preprocessing import StandardScaler
+        scaler = StandardScaler()
+        arrays["scaled"] = scaler.fit_transform(X_arr)
+        matrix_for.update({name: "scaled" for name in models if "Linear" in name})
+
+    if strategy == "race":
+        order = stratified_order(y_arr, task_type)
+        race_folds = np.empty(len(order), dtype=np.int16)
+        race_folds[order] = np.arange(len(order)) % n_splits
+        arrays.update({"order": order, "race_folds": race_folds})
+    elif strategy != "cv":
+        raise ValueError(f"Unknown strategy '{strategy}'.")
+
+    with TaskScheduler(arrays, n_workers=n_workers, max_tasks=len(models) * n_splits) as scheduler:
+        race = None
+        if strategy == "race":
+            scores, rows_used, race, predictions = _race(
+                scheduler, models, matrix_for, n_splits, scoring, len(y_arr),
+                race_min_rows, race_drop_fraction, race_growth
+            )
+        else:
+            scores, failed, predictions = _score_models(scheduler, models, matrix_for, n_splits, scoring)
+            for name, error in failed.items():
+                print(f"❌ Failed {name}: {error}")
+            rows_used = {name: len(y_arr) for name in scores}
+
+        classes = np.unique(y_arr) if task_type == "classification" else None
+        results = []
+        for name, model in models.items():
+            if name not in scores:
+                continue
+            oof_pred = oof_proba = None
+            if name in predictions:
+                oof_pred, oof_proba = _out_of_fold(predictions[name], folds, task_type, classes)
+                if le is not None:
+                    oof_pred = le.classes_[oof_pred]
             results.append({
                 "model": name,
-                "score_mean": scores.mean(),
-                "score_std": scores.std(),
-                "model_obj": model
+                "score_mean": scores[name].mean(),
+                "score_std": scores[name].std(),
+                "rows_evaluated": rows_used[name],
+                "model_obj": model,
+                "oof_pred": oof_pred,
+                "oof_proba": oof_proba,
             })
-        except Exception as e:
-            print(f"❌ Failed {name}: {e}")
-            continue
 
-    if not results:
-        raise ValueError("No models were able to train successfully.")
+        if not results:
+            raise ValueError("No models were able to train successfully.")
 
-    results_df = pd.DataFrame(results).sort_values("score_mean", ascending=False)
-    best_model = results_df.iloc[0]["model_obj"]
+        # Models that survived to larger samples rank ahead of early eliminations
+        results_df = pd.DataFrame(results).sort_values(["rows_evaluated", "score_mean"], ascending=False)
+        best_name = results_df.iloc[0]["model"]
 
-    # Refit on full data (with scaling if needed)
-    X_fit = X_num.copy()
-    if task_type == "regression" and "Linear" in results_df.iloc[0]["model"]:
-        scaler = StandardScaler()
-        X_fit = scaler.fit_transform(X_fit)
-        # Wrap model with scaler if needed (advanced)
-    best_model.fit(X_fit, y)
+        # Refit on full data (with scaling if needed) using the whole worker budget
+        (refit, error), = scheduler.map(
+            run_refit, [(best_name, models[best_name], matrix_for[best_name], scheduler.n_workers)]
+        )
+        if error is not None:
+            raise error
+        best_model = refit[1]
 
+    results_df.at[results_df.index[0], "model_obj"] = best_model
     results_df["task_type"] = task_type
-    return results_df, best_model
\ No newline at end of file
+    # What a caller needs to reproduce the best model's inputs (see models.serving.ModelBundle)
+    results_df.attrs["features"] = list(X_num.columns)
+    results_df.attrs["scaler"] = scaler if matrix_for[best_name] == "scaled" else None
+    results_df.attrs["classes"] = le.classes_.tolist() if le is not None else labels
+    if race is not None:
+        results_df.attrs["race"] = race
+    return results_df, best_model
+
+def save_training(run, results_df, best_model):
+    """Persist evaluate_models() output into an ArtifactRun; arrays go in as separate .npy files."""
+    for _, row in results_df.iterrows():
+        for column in ("oof_pred", "oof_proba"):
+            if row.get(column) is not None:
+                run.put(f"{column}-{row['model']}", np.asarray(row[column]))
+    run.put("results", results_df.drop(columns=["model_obj", "oof_pred", "oof_proba"], errors="ignore"))
+    run.put("model", best_model)
+
+
+def load_training(run):
+    """
+    Inverse of save_training: (results_df, best_model) with the model's arrays and the
+    out-of-fold predictions memory-mapped read-only from the run directory.
+    """
+    results_df = run.get("results").copy()
+    best_model = run.get("model")
+    results_df["model_obj"] = None
+    results_df.at[results_df.index[0], "model_obj"] = best_model
+    for column in ("oof_pred", "oof_proba"):
+        results_df[column] = [run.get(f"{column}-{name}") for name in results_df["model"]]
+    return results_df, best_model
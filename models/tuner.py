@@ -1,26 +1,175 @@
 # models/tuner.py
+import os
+import tempfile
+
 import optuna
-from sklearn.model_selection import cross_val_score
 import numpy as np
+from sklearn.base import is_classifier
+from sklearn.metrics import get_scorer
+from threadpoolctl import threadpool_limits
+
+from models.scheduler import TaskScheduler, assign_folds, cap_model_threads, shared
+
+# Search spaces for every estimator returned by models.trainer.get_models
+SEARCH_SPACES = {
+    "LogisticRegression": lambda trial: {
+        "C": trial.suggest_float("C", 1e-3, 1e2, log=True),
+        "max_iter": 1000,
+    },
+    "LinearRegression": lambda trial: {
+        "fit_intercept": trial.suggest_categorical("fit_intercept", [True, False]),
+    },
+    "RandomForestClassifier": lambda trial: {
+        "n_estimators": trial.suggest_int("n_estimators", 50, 200),
+        "max_depth": trial.suggest_int("max_depth", 2, 20),
+        "min_samples_leaf": trial.suggest_int("min_samples_leaf", 1, 20),
+        "max_features": trial.suggest_categorical("max_features", ["sqrt", "log2", None]),
+    },
+    "RandomForestRegressor": lambda trial: {
+        "n_estimators": trial.suggest_int("n_estimators", 50, 200),
+        "max_depth": trial.suggest_int("max_depth", 2, 20),
+        "min_samples_leaf": trial.suggest_int("min_samples_leaf", 1, 20),
+        "max_features": trial.suggest_categorical("max_features", [1.0, "sqrt", "log2"]),
+    },
+    "XGBClassifier": lambda trial: {
+        "n_estimators": trial.suggest_int("n_estimators", 50, 200),
+        "max_depth": trial.suggest_int("max_depth", 2, 10),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
+        "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+    },
+    "XGBRegressor": lambda trial: {
+        "n_estimators": trial.suggest_int("n_estimators", 50, 200),
+        "max_depth": trial.suggest_int("max_depth", 2, 10),
+        "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
+        "subsample": trial.suggest_float("subsample", 0.5, 1.0),
+        "colsample_bytree": trial.suggest_float("colsample_bytree", 0.5, 1.0),
+    },
+}
+
+# Models that take no random_state
+NO_RANDOM_STATE = ("LinearRegression",)
+
+DEFAULT_BUDGET_LEVELS = (0.25, 0.5, 1.0)
+
+
+def build_model(model_class, params, budget="folds", level=1.0):
+    """Instantiate a model, scaling n_estimators when it is the fidelity budget."""
+    params = dict(params)
+    if budget == "n_estimators" and "n_estimators" in params:
+        params["n_estimators"] = max(1, int(round(params["n_estimators"] * level)))
+    if model_class.__name__ not in NO_RANDOM_STATE:
+        params["random_state"] = 42
+    return model_class(**params)
+
+
+def objective(trial, model_class, scoring, budget="folds", budget_levels=(1.0,), n_threads=1):
+    """
+    Score one trial fold by fold on the shared X/y, reporting after every fold so
+    the pruner can stop losing trials early. With budget="rows" or "n_estimators",
+    every fidelity level in `budget_levels` is a rung of folds, cheapest first.
+    """
+    if model_class.__name__ not in SEARCH_SPACES:
+        raise ValueError(f"No search space for {model_class.__name__}.")
+    params = SEARCH_SPACES[model_class.__name__](trial)
+    if budget == "n_estimators" and "n_estimators" not in params:
+        budget = "rows"  # linear models have no trees to budget
+
+    X, y, folds, rank = shared("X"), shared("y"), shared("folds"), shared("rank")
+    n_folds = int(folds.max()) + 1
+    scorer = get_scorer(scoring)
+
+    score = float("nan")
+    for rung, level in enumerate(budget_levels):
+        fold_scores = []
+        model = cap_model_threads(build_model(model_class, params, budget, level), n_threads)
+        for fold in range(n_folds):
+            test = folds == fold
+            train = ~test
+            if budget == "rows":
+                train &= rank < level
+            with threadpool_limits(limits=n_threads):
+                model.fit(X[train], y[train])
+                fold_scores.append(scorer(model, X[test], y[test]))
+
+            score = float(np.mean(fold_scores))
+            trial.report(score, step=rung * n_folds + fold)
+            if trial.should_prune():
+                raise optuna.TrialPruned()
+    return score
+
+
+def _run_trials(study_name, storage_path, model_class, n_trials, scoring, budget, budget_levels, pruner, n_threads):
+    """Pool task: attach to the shared study store and run a share of the trials."""
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = optuna.load_study(study_name=study_name, storage=_storage(storage_path), pruner=pruner)
+    study.optimize(
+        lambda trial: objective(trial, model_class, scoring, budget, budget_levels, n_threads),
+        n_trials=n_trials
+    )
+    return n_trials
+
+
+def _storage(storage_path):
+    return optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(storage_path))
+
+
+def tune_model(model_class, X, y, n_trials=20, cv=3, n_workers=1, storage_path=None, study_name=None,
+               budget="folds", budget_levels=None, pruner=None, scoring=None):
+    """
+    Tune `model_class` with Optuna and return the best params, or {} (the model's
+    defaults) when no trial completes.
+    Trials run on `n_workers` processes sharing a file-backed journal study; pass a
+    `storage_path` to make the run resumable (finished trials count toward n_trials).
+    budget: "folds" (prune after each fold), "rows" or "n_estimators" (multi-fidelity).
+    """
+    classifier = is_classifier(model_class())
+    scoring = scoring or ("f1_macro" if classifier else "r2")
+    if budget_levels is None:
+        budget_levels = (1.0,) if budget == "folds" else DEFAULT_BUDGET_LEVELS
+    pruner = pruner or optuna.pruners.MedianPruner(n_startup_trials=5, n_warmup_steps=0)
+
+    temp_store = storage_path is None
+    if temp_store:
+        fd, storage_path = tempfile.mkstemp(prefix="explainml_study_", suffix=".log")
+        os.close(fd)
+    try:
+        study_name = study_name or f"tune-{model_class.__name__}"
+        study = optuna.create_study(
+            study_name=study_name, storage=_storage(storage_path),
+            direction="maximize", pruner=pruner, load_if_exists=True
+        )
+
+        done = sum(t.state in (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED) for t in study.trials)
+        remaining = max(0, n_trials - done)
+        if done:
+            print(f"♻️ Resuming '{study_name}': {done} trials already finished, {remaining} to go")
+
+        X_arr = np.asarray(X, dtype=np.float64)
+        y_arr = np.asarray(y)
+        folds, _ = assign_folds(cv, X_arr, y_arr, classifier=classifier)
+        rank = np.random.default_rng(42).random(len(y_arr)).astype(np.float32)
+        arrays = {"X": X_arr, "y": y_arr, "folds": folds, "rank": rank}
+
+        if remaining:
+            n_procs = max(1, min(n_workers, remaining))
+            shares = [remaining // n_procs + (i < remaining % n_procs) for i in range(n_procs)]
+            with TaskScheduler(arrays, n_workers=n_workers, max_tasks=n_procs) as scheduler:
+                outcomes = scheduler.map(_run_trials, [
+                    (study_name, storage_path, model_class, share, scoring, budget, budget_levels,
+                     pruner, scheduler.threads_per_task)
+                    for share in shares
+                ])
+            for _, error in outcomes:
+                if error is not None:
+                    raise error
 
-def objective(trial, model_class, X, y):
-    params = {}
-    if model_class.__name__ == "RandomForestClassifier":
-        params = {
-            "n_estimators": trial.suggest_int("n_estimators", 50, 200),
-            "max_depth": trial.suggest_int("max_depth", 2, 20),
-        }
-    elif model_class.__name__ == "XGBClassifier":
-        params = {
-            "n_estimators": trial.suggest_int("n_estimators", 50, 200),
-            "max_depth": trial.suggest_int("max_depth", 2, 10),
-            "learning_rate": trial.suggest_float("learning_rate", 0.01, 0.3),
-        }
-    model = model_class(**params, random_state=42)
-    return np.mean(cross_val_score(model, X, y, cv=3, scoring="f1"))
-
-def tune_model(model_class, X, y, n_trials=20):
-    study = optuna.create_study(direction="maximize")
-    func = lambda trial: objective(trial, model_class, X, y)
-    study.optimize(func, n_trials=n_trials)
-    return study.best_params
\ No newline at end of file
+        study = optuna.load_study(study_name=study_name, storage=_storage(storage_path))
+        # best_params raises when no trial completed, e.g. every one was pruned
+        if not any(t.state == optuna.trial.TrialState.COMPLETE for t in study.trials):
+            print(f"⚠️ No '{study_name}' trial completed; keeping {model_class.__name__} defaults")
+            return {}
+        return study.best_params
+    finally:
+        if temp_store:
+            os.remove(storage_path)
@@ -1,49 +1,153 @@
 # profiler/leakage_detector.py
 import pandas as pd
 import numpy as np
-from scipy.stats import pointbiserialr
 
-def detect_target_leakage(X: pd.DataFrame, y: pd.Series, threshold=0.8):
+from utils.tracing import traced
+
+ROW_CHUNK = 65_536  # rows per float64 partial product
+
+
+class CorrelationEngine:
     """
-    Detect features highly correlated with target (possible leakage).
-    Handles both pandas Series and numpy arrays.
+    Standardizes the numeric features once (float32) and serves both target
+    correlations and blocked feature-pair correlations from it. Like DataFrame.corr(),
+    correlations are pairwise-complete: with missing values each pair uses only the
+    rows where both are present (sums over the non-null mask, accumulated in float64).
+    With `sample_rows`, tall tables are subsampled and `error_bound` holds the 95%
+    worst-case half-width of any reported correlation (Fisher z at r=0).
     """
-    X_num = X.select_dtypes(include=[np.number])
-    if X_num.empty:
-        return []
 
-    # Convert y to pandas Series if it's a numpy array
-    if isinstance(y, np.ndarray):
-        y = pd.Series(y)
+    def __init__(self, X: pd.DataFrame, sample_rows=None, random_state=42, catalog=None):
+        if catalog is not None:
+            X_num = X[[c for c in catalog.columns("numeric") if c in X.columns]]
+        else:
+            X_num = X.select_dtypes(include=[np.number])
+        self.columns = list(X_num.columns)
+        self.rows_total = len(X_num)
 
-    leaks = []
-    for col in X_num.columns:
-        if y.nunique() <= 2:
-            # Binary classification: use point biserial correlation
-            try:
-                corr = pointbiserialr(y, X_num[col])[0]
-            except:
-                corr = 0.0
+        if sample_rows is not None and len(X_num) > sample_rows:
+            rng = np.random.default_rng(random_state)
+            self.row_idx = np.sort(rng.choice(len(X_num), size=sample_rows, replace=False))
+            X_num = X_num.iloc[self.row_idx]
         else:
-            # Regression or multi-class: use Pearson
-            corr = y.corr(X_num[col])
-        if abs(corr) > threshold:
-            leaks.append((col, round(corr, 3)))
-    return leaks
-
-def detect_high_correlation(X: pd.DataFrame, threshold=0.9):
-    """Detect multicollinearity between numeric features."""
-    X_num = X.select_dtypes(include=[np.number])
-    if X_num.empty:
-        return []
-    
-    corr_matrix = X_num.corr().abs()
-    upper = corr_matrix.where(
-        np.triu(np.ones(corr_matrix.shape), k=1).astype(bool)
-    )
+            self.row_idx = None
+
+        self.n = len(X_num)
+        self.error_bound = self._error_bound(self.n) if self.row_idx is not None else 0.0
+        values = X_num.to_numpy(dtype=np.float32, na_value=np.nan)
+        missing = np.isnan(values)
+        self.mask = ~missing if missing.any() else None
+        self.Z = self._standardize(values)
+
+    @staticmethod
+    def _error_bound(n):
+        if n <= 3:
+            return 1.0
+        return float(np.tanh(1.96 / np.sqrt(n - 3)))
+
+    @staticmethod
+    def _standardize(values):
+        """Z-score columns in place, missing -> 0; constant columns come out NaN (undefined corr)."""
+        mean = np.nanmean(values, axis=0, dtype=np.float64)
+        std = np.nanstd(values, axis=0, dtype=np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scale = np.where(std > 0, 1.0 / std, np.nan)
+        values -= mean.astype(np.float32)
+        values *= scale.astype(np.float32)
+        values[np.isnan(values)] = 0.0
+        values[:, ~(std > 0)] = np.nan
+        return values
+
+    @staticmethod
+    def _correlate(a, b, mask_a=None, mask_b=None):
+        """
+        Pearson correlation of every column of `a` with every column of `b` (standardized,
+        missing entries 0). Without masks it is a.T @ b / n; with masks each pair's
+        count, sums and sums of squares are taken over its jointly non-null rows.
+        """
+        n = len(a)
+        if mask_a is None and mask_b is None:
+            gram = np.zeros((a.shape[1], b.shape[1]))
+            for lo in range(0, n, ROW_CHUNK):
+                gram += a[lo:lo + ROW_CHUNK].T.astype(np.float64) @ b[lo:lo + ROW_CHUNK].astype(np.float64)
+            return gram / n
+
+        shape = (a.shape[1], b.shape[1])
+        count, sum_a, sum_b, sq_a, sq_b, prod = (np.zeros(shape) for _ in range(6))
+        for lo in range(0, n, ROW_CHUNK):
+            ca = a[lo:lo + ROW_CHUNK].astype(np.float64)
+            cb = b[lo:lo + ROW_CHUNK].astype(np.float64)
+            ma = np.ones_like(ca) if mask_a is None else mask_a[lo:lo + ROW_CHUNK].astype(np.float64)
+            mb = np.ones_like(cb) if mask_b is None else mask_b[lo:lo + ROW_CHUNK].astype(np.float64)
+            count += ma.T @ mb
+            sum_a += ca.T @ mb
+            sum_b += ma.T @ cb
+            sq_a += (ca * ca).T @ mb
+            sq_b += ma.T @ (cb * cb)
+            prod += ca.T @ cb
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cov = prod - sum_a * sum_b / count
+            var_a = sq_a - sum_a ** 2 / count
+            var_b = sq_b - sum_b ** 2 / count
+            corr = cov / np.sqrt(var_a * var_b)
+        corr[(count < 2) | ~(var_a > 0) | ~(var_b > 0)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    def target_correlations(self, y):
+        """Pearson (= point-biserial for binary y) correlation of every feature with y."""
+        if self.row_idx is not None:
+            y = y.iloc[self.row_idx] if isinstance(y, pd.Series) else np.asarray(y)[self.row_idx]
+        y = pd.Series(np.asarray(y))
+        if not pd.api.types.is_numeric_dtype(y):
+            y = pd.Series(pd.factorize(y)[0]).where(y.notna())
+        y_values = y.to_numpy(dtype=np.float32, na_value=np.nan)[:, None]
+        y_mask = ~np.isnan(y_values) if np.isnan(y_values).any() else None
+        z_y = self._standardize(y_values)
+        return self._correlate(self.Z, z_y, self.mask, y_mask)[:, 0]
+
+    def correlated_pairs(self, threshold=0.9, block_size=512):
+        """Yield (i, j, corr) for i < j with |corr| > threshold, one column block at a time."""
+        p = self.Z.shape[1]
+        for start in range(0, p, block_size):
+            stop = min(start + block_size, p)
+            block = self._correlate(
+                self.Z[:, start:stop], self.Z[:, start:],
+                None if self.mask is None else self.mask[:, start:stop],
+                None if self.mask is None else self.mask[:, start:],
+            )
+            rows, cols = np.nonzero(np.abs(block) > threshold)
+            for r, c in zip(rows, cols):
+                i, j = start + r, start + c
+                if i < j:
+                    yield i, j, float(block[r, c])
+
+
+@traced()
+def detect_target_leakage(X: pd.DataFrame, y: pd.Series, threshold=0.8, engine=None, sample_rows=None,
+                          return_error_bound=False):
+    """
+    Detect features highly correlated with target (possible leakage).
+    Handles both pandas Series and numpy arrays.
+    return_error_bound=True returns (leaks, error_bound): the engine's 95% half-width
+    on every correlation, 0.0 unless the rows were subsampled.
+    """
+    engine = engine or CorrelationEngine(X, sample_rows=sample_rows)
+    leaks = []
+    if engine.columns:
+        corrs = engine.target_correlations(y)
+        leaks = [
+            (engine.columns[i], round(float(corrs[i]), 3))
+            for i in np.flatnonzero(np.abs(corrs) > threshold)
+        ]
+    return (leaks, engine.error_bound) if return_error_bound else leaks
+
+@traced()
+def detect_high_correlation(X: pd.DataFrame, threshold=0.9, engine=None, sample_rows=None, block_size=512,
+                            return_error_bound=False):
+    """Detect multicollinearity between numeric features (see detect_target_leakage for return_error_bound)."""
+    engine = engine or CorrelationEngine(X, sample_rows=sample_rows)
     highly_corr = [
-        (X_num.columns[i], X_num.columns[j]) 
-        for i, j in zip(*np.where(upper > threshold)) 
-        if i < j
+        (engine.columns[i], engine.columns[j])
+        for i, j, _ in engine.correlated_pairs(threshold, block_size=block_size)
     ]
-    return highly_corr
\ No newline at end of file
+    return (highly_corr, engine.error_bound) if return_error_bound else highly_corr
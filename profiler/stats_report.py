@@ -1,26 +1,39 @@
 # profiler/stats_report.py
+import base64
+import io
+import json
+import os
+
 import pandas as pd
 import numpy as np
-from scipy.stats import skew
-from utils.helpers import detect_task_type
+from utils.catalog import hll_estimate, hll_registers
+from utils.helpers import detect_task_type, task_type_from_stats
+from utils.tracing import traced
 
-def analyze_dataset(df: pd.DataFrame, target_col: str):
-    """Analyze dataset structure, missingness, imbalance, skew."""
+@traced()
+def analyze_dataset(df: pd.DataFrame, target_col: str, catalog=None):
+    """
+    Analyze dataset structure, missingness, imbalance, skew.
+    A ColumnCatalog of `df` supplies cardinality, null counts and numeric columns.
+    """
     if target_col not in df.columns:
         raise ValueError(f"Target column '{target_col}' not found.")
 
+    # Catalog null counts only hold while no rows are dropped for a missing target
+    if catalog is not None and catalog.table.at[target_col, "null_count"]:
+        catalog = None
     df = df.dropna(subset=[target_col])  # Ensure target is clean
 
     # Detect task type
     y = df[target_col]
-    task_type = detect_task_type(y)
+    task_type = detect_task_type(y, catalog.nunique(target_col) if catalog is not None else None)
 
     # Convert y to Series if needed (e.g., after prior encoding)
     if isinstance(y, np.ndarray):
         y = pd.Series(y, name=target_col)
 
     # Missing data
-    missing = df.isnull().sum()
+    missing = pd.Series(catalog.null_counts()) if catalog is not None else df.isnull().sum()
     missing_pct = (missing / len(df)) * 100
 
     # Class imbalance or target stats
@@ -31,9 +44,12 @@ def analyze_dataset(df: pd.DataFrame, target_col: str):
     else:
         class_counts = None
         imbalance_ratio = None
+    target_cardinality = catalog.nunique(target_col) if catalog is not None else y.nunique()
 
     # Skewness
-    numeric_skew = df.select_dtypes(include=[np.number]).apply(skew).to_dict()
+    numeric = df[catalog.columns("numeric")] if catalog is not None else df.select_dtypes(include=[np.number])
+    from scipy.stats import skew  # scipy.stats is slow to import; only this pass needs it
+    numeric_skew = numeric.apply(skew).to_dict()
 
     return {
         "rows": len(df),
@@ -45,5 +61,376 @@ def analyze_dataset(df: pd.DataFrame, target_col: str):
         "numeric_skew": numeric_skew,
         "class_distribution": class_counts.to_dict() if class_counts is not None else None,
         "imbalance_ratio": float(imbalance_ratio) if imbalance_ratio else None,
+        "target_cardinality": int(target_cardinality),
         "dtypes": df.dtypes.astype(str).to_dict(),
-    }
\ No newline at end of file
+    }
+
+class ProfileAccumulator:
+    """
+    Single-pass, chunk-mergeable profile state.
+    Keeps null counts, per-column moments (count, mean, M2, M3; merged with the
+    pairwise Welford/Chan update) and target class counts, so memory stays flat
+    no matter how many rows are streamed through `update`. Past MAX_TRACKED_CLASSES
+    labels the class counts give way to a HyperLogLog sketch of the distinct labels. Two accumulators combine
+    with `merge`, and `save`/`load` persist the state as JSON so appended rows can be
+    profiled on their own and folded into yesterday's profile.
+    """
+
+    MAX_TRACKED_CLASSES = 20  # beyond this a numeric target is regression
+    TARGET_SKETCH_PRECISION = 12  # 4 KB of HLL registers, ~1.6% standard error
+
+    def __init__(self, target_col: str):
+        self.target_col = target_col
+        self.rows = 0
+        self.columns = None
+        self.dtypes = {}
+        self.missing = None
+        self.n = self.mean = self.m2 = self.m3 = None
+        self.has_null = None
+        self.class_counts = {}
+        self.track_classes = True
+        self.target_sketch = None  # HLL registers of the target once track_classes is off
+        self.source_rows = 0  # rows read from the source, including ones with a null target
+        self.source_bytes = None  # CSV byte offset read up to (file size for Parquet/Feather)
+
+    def _add_columns(self, columns):
+        """Start tracking columns first seen now; every earlier row counts as missing them."""
+        if self.columns is None:
+            self.columns = []
+            self.missing = pd.Series(dtype="int64")
+            self.n, self.mean, self.m2, self.m3 = (np.zeros(0) for _ in range(4))
+        new = [c for c in columns if c not in self.columns]
+        if not new:
+            return
+        self.columns += new
+        self.missing = pd.concat([self.missing, pd.Series(self.rows, index=new, dtype="int64")])
+        self.n, self.mean, self.m2, self.m3 = (
+            np.concatenate([a, np.zeros(len(new))]) for a in (self.n, self.mean, self.m2, self.m3)
+        )
+
+    def update(self, chunk: pd.DataFrame):
+        if self.target_col not in chunk.columns:
+            raise ValueError(f"Target column '{self.target_col}' not found.")
+
+        self.source_rows += len(chunk)
+        chunk = chunk[chunk[self.target_col].notna()]  # Ensure target is clean
+        self._add_columns(chunk.columns)
+        self._merge_dtypes(chunk.dtypes.items())
+        if chunk.empty:
+            return self
+
+        nulls = chunk.isnull().sum().reindex(self.columns, fill_value=len(chunk))
+        self.missing += nulls
+        self.rows += len(chunk)
+
+        # Moments for every column that is numeric in this chunk
+        numeric = [c for c in chunk.columns if pd.api.types.is_numeric_dtype(chunk[c]) and not pd.api.types.is_bool_dtype(chunk[c])]
+        if numeric:
+            idx = [self.columns.index(c) for c in numeric]
+            values = chunk[numeric].to_numpy(dtype="float64", na_value=np.nan)
+            n_b = (~np.isnan(values)).sum(axis=0).astype("float64")
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean_b = np.where(n_b > 0, np.nansum(values, axis=0) / n_b, 0.0)
+                dev = values - mean_b
+                m2_b = np.nansum(dev ** 2, axis=0)
+                m3_b = np.nansum(dev ** 3, axis=0)
+            self._merge_moments(idx, n_b, mean_b, m2_b, m3_b)
+
+        if self.track_classes:
+            self._merge_classes(chunk[self.target_col].value_counts().items())
+        else:
+            self._merge_sketch(self._sketch(chunk[self.target_col]))
+        return self
+
+    def _sketch(self, labels):
+        hashes = pd.util.hash_array(pd.Series(labels, dtype=object).astype(str).to_numpy())
+        return hll_registers(hashes, self.TARGET_SKETCH_PRECISION)
+
+    def _merge_sketch(self, registers):
+        """Drop the class counts (if still kept) and fold `registers` into the target sketch."""
+        if self.track_classes:
+            self.target_sketch = self._sketch(list(self.class_counts))
+            self.track_classes = False
+            self.class_counts = {}
+        elif self.target_sketch is None:
+            self.target_sketch = self._sketch([])
+        self.target_sketch = np.maximum(self.target_sketch, registers)
+
+    def _merge_classes(self, counts):
+        if not self.track_classes:
+            return
+        for label, count in counts:
+            self.class_counts[label] = self.class_counts.get(label, 0) + int(count)
+        if len(self.class_counts) > self.MAX_TRACKED_CLASSES:
+            # Too many labels to keep a histogram (an ID-like column, or a numeric regression target)
+            self._merge_sketch(self._sketch(list(self.class_counts)))
+
+    def _merge_dtypes(self, dtypes):
+        for col, dtype in dtypes:
+            prev = self.dtypes.get(col)
+            if prev is None or prev == dtype:
+                self.dtypes[col] = dtype
+            elif pd.api.types.is_numeric_dtype(prev) and pd.api.types.is_numeric_dtype(dtype):
+                self.dtypes[col] = np.result_type(prev, dtype)
+            else:
+                self.dtypes[col] = np.dtype("object")
+
+    def _merge_moments(self, idx, n_b, mean_b, m2_b, m3_b):
+        n_a, mean_a, m2_a, m3_a = self.n[idx], self.mean[idx], self.m2[idx], self.m3[idx]
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean_b - mean_a
+            mean = np.where(n > 0, mean_a + delta * n_b / n, 0.0)
+            m2 = m2_a + m2_b + np.where(n > 0, delta ** 2 * n_a * n_b / n, 0.0)
+            m3 = (m3_a + m3_b
+                  + np.where(n > 0, delta ** 3 * n_a * n_b * (n_a - n_b) / n ** 2, 0.0)
+                  + np.where(n > 0, 3 * delta * (n_a * m2_b - n_b * m2_a) / n, 0.0))
+        self.n[idx], self.mean[idx], self.m2[idx], self.m3[idx] = n, mean, m2, m3
+
+    def merge(self, other: "ProfileAccumulator"):
+        """Fold another accumulator (e.g. one built from appended rows) into this one."""
+        if other.target_col != self.target_col:
+            raise ValueError(f"Cannot merge profiles of '{other.target_col}' into '{self.target_col}'.")
+        self.source_rows += other.source_rows
+        if other.columns is None:
+            return self
+        self._add_columns(other.columns)
+        self._merge_dtypes(other.dtypes.items())
+        self.missing += other.missing.reindex(self.columns, fill_value=other.rows)
+        self.rows += other.rows
+        self._merge_moments([self.columns.index(c) for c in other.columns], other.n, other.mean, other.m2, other.m3)
+        if other.track_classes:
+            if self.track_classes:
+                self._merge_classes(other.class_counts.items())
+            else:
+                self._merge_sketch(self._sketch(list(other.class_counts)))
+        else:
+            self._merge_sketch(other.target_sketch if other.target_sketch is not None else self._sketch([]))
+        return self
+
+    def to_dict(self):
+        def plain(value):
+            return value.item() if hasattr(value, "item") else value
+
+        return {
+            "target_col": self.target_col,
+            "rows": self.rows,
+            "source_rows": self.source_rows,
+            "source_bytes": self.source_bytes,
+            "columns": self.columns,
+            "dtypes": {col: str(dtype) for col, dtype in self.dtypes.items()},
+            "missing": self.missing.astype(int).tolist() if self.missing is not None else None,
+            "moments": {name: getattr(self, name).tolist() for name in ("n", "mean", "m2", "m3")}
+            if self.columns is not None else None,
+            # Pairs rather than a mapping so non-string labels survive JSON
+            "class_counts": [[plain(label), int(count)] for label, count in self.class_counts.items()],
+            "track_classes": self.track_classes,
+            "target_sketch": base64.b64encode(self.target_sketch.tobytes()).decode()
+            if self.target_sketch is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        acc = cls(state["target_col"])
+        acc.rows, acc.source_rows, acc.source_bytes = state["rows"], state["source_rows"], state.get("source_bytes")
+        acc.columns = state["columns"]
+        acc.dtypes = {col: pd.api.types.pandas_dtype(dtype) for col, dtype in state["dtypes"].items()}
+        if acc.columns is not None:
+            acc.missing = pd.Series(state["missing"], index=acc.columns, dtype="int64")
+            acc.n, acc.mean, acc.m2, acc.m3 = (np.array(state["moments"][name], dtype=np.float64)
+                                               for name in ("n", "mean", "m2", "m3"))
+        acc.class_counts = {label: count for label, count in state["class_counts"]}
+        acc.track_classes = state["track_classes"]
+        if state.get("target_sketch") is not None:
+            acc.target_sketch = np.frombuffer(base64.b64decode(state["target_sketch"]), dtype=np.uint8).copy()
+        return acc
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def result(self):
+        """Return the same dict analyze_dataset builds from an in-memory frame."""
+        if self.columns is None:
+            raise ValueError("No data was profiled.")
+
+        if self.track_classes:
+            n_unique = len(self.class_counts)
+        else:
+            # The sketch is an estimate; it is past the cutoff by construction
+            sketched = hll_estimate(self.target_sketch) if self.target_sketch is not None else 0
+            n_unique = max(sketched, self.MAX_TRACKED_CLASSES + 1)
+        task_type = task_type_from_stats(self.dtypes[self.target_col], n_unique)
+
+        missing_pct = (self.missing / self.rows) * 100
+
+        if task_type == "classification" and self.track_classes:
+            class_counts = pd.Series(self.class_counts, dtype="int64").sort_values(ascending=False)
+            imbalance_ratio = class_counts.max() / class_counts.min()
+        else:
+            class_counts = None
+            imbalance_ratio = None
+
+        # Skewness (biased, NaN-propagating like scipy.stats.skew)
+        numeric_skew = {}
+        for i, col in enumerate(self.columns):
+            dtype = self.dtypes[col]
+            if not pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+                continue
+            if self.missing[col] > 0 or self.m2[i] <= 0:
+                numeric_skew[col] = float("nan")
+            else:
+                numeric_skew[col] = float(np.sqrt(self.n[i]) * self.m3[i] / self.m2[i] ** 1.5)
+
+        return {
+            "rows": self.rows,
+            "columns": len(self.columns),
+            "target": self.target_col,
+            "task_type": task_type,
+            "missing_data": self.missing.to_dict(),
+            "missing_percentage": missing_pct.to_dict(),
+            "numeric_skew": numeric_skew,
+            "class_distribution": class_counts.to_dict() if class_counts is not None else None,
+            "imbalance_ratio": float(imbalance_ratio) if imbalance_ratio else None,
+            "target_cardinality": int(n_unique),
+            "dtypes": {col: str(dtype) for col, dtype in self.dtypes.items()},
+        }
+
+
+def _is_columnar(path) -> bool:
+    return str(path).lower().endswith((".parquet", ".pq", ".feather", ".arrow", ".ipc"))
+
+
+class _ByteRange(io.RawIOBase):
+    """Read-only view of bytes [start, end) of an open binary file."""
+
+    def __init__(self, f, start, end):
+        self.f, self.end = f, end
+        f.seek(start)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self.end - self.f.tell())
+        if n <= 0:
+            return 0
+        data = self.f.read(n)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def csv_complete_bytes(path) -> int:
+    """Byte offset just past the last line break: a row still being appended is left for the next read."""
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(1 << 16, pos)
+            f.seek(pos - step)
+            newline = f.read(step).rfind(b"\n")
+            if newline >= 0:
+                return pos - step + newline + 1
+            pos -= step
+    return 0
+
+
+def iter_file_chunks(path: str, chunksize=100_000, skip_rows=0, byte_range=None):
+    """
+    Yield DataFrame chunks from a CSV, Parquet or Feather file without loading it whole,
+    starting after the first `skip_rows` data rows (Parquet skips whole row groups unread).
+    For a CSV, `byte_range=(start, end)` parses only those bytes (whole rows, with the
+    header from the first line), so reading an appended tail costs the tail alone.
+    """
+    if str(path).lower().endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(path)
+        groups, offset = [], skip_rows
+        for i in range(pf.num_row_groups):
+            n = pf.metadata.row_group(i).num_rows
+            if not groups and offset >= n:
+                offset -= n
+            else:
+                groups.append(i)
+        if not groups:
+            return
+        for batch in pf.iter_batches(batch_size=chunksize, row_groups=groups):
+            if offset:
+                batch, offset = batch.slice(min(offset, len(batch))), max(offset - len(batch), 0)
+            if len(batch):
+                yield batch.to_pandas()
+    elif _is_columnar(path):
+        import pyarrow.feather as feather
+        table = feather.read_table(path, memory_map=True).slice(skip_rows)
+        for batch in table.to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas()
+    elif byte_range is not None:
+        with open(path, "rb") as f:
+            header = f.readline()
+            start, end = max(byte_range[0], f.tell()), byte_range[1]
+            if start >= end:
+                return
+            names = pd.read_csv(io.BytesIO(header), nrows=0).columns
+            tail = io.BufferedReader(_ByteRange(f, start, end))
+            for chunk in pd.read_csv(tail, chunksize=chunksize, header=None, names=names):
+                yield chunk
+    else:
+        # skiprows still tokenizes every skipped line; appended tails use byte_range
+        skiprows = range(1, skip_rows + 1) if skip_rows else None
+        for chunk in pd.read_csv(path, chunksize=chunksize, skiprows=skiprows):
+            if len(chunk):  # nothing past the watermark still yields one empty chunk
+                yield chunk
+
+
+def iter_appended_chunks(path, acc=None, chunksize=100_000):
+    """
+    (chunks, watermark): the rows added since `acc` was last saved (all rows without
+    one) and the `source_bytes` to record once they are merged. A CSV is read from the
+    saved byte offset up to the last complete row, measured once here, so the cost
+    follows the appended bytes and a concurrent append is picked up next time.
+    """
+    source_rows = acc.source_rows if acc is not None else 0
+    source_bytes = acc.source_bytes if acc is not None else None
+    if not _is_columnar(path) and (source_bytes is not None or not source_rows):
+        end = csv_complete_bytes(path)
+        return iter_file_chunks(path, chunksize, byte_range=(source_bytes or 0, end)), end
+    return iter_file_chunks(path, chunksize, skip_rows=source_rows), os.path.getsize(path)
+
+
+@traced()
+def analyze_dataset_file(path: str, target_col: str, chunksize=100_000):
+    """Out-of-core analyze_dataset: one streaming pass over a CSV/Parquet/Feather file."""
+    acc = ProfileAccumulator(target_col)
+    for chunk in iter_file_chunks(path, chunksize):
+        acc.update(chunk)
+    return acc.result()
+
+
+@traced()
+def analyze_dataset_incremental(path: str, target_col: str, state_path: str, chunksize=100_000):
+    """
+    analyze_dataset_file for a table that only grows: the profile state saved at
+    `state_path` remembers how far the file was read, so each run streams just the
+    appended rows and merges them in. A file that shrank is re-profiled from scratch.
+    """
+    acc = ProfileAccumulator.load(state_path) if os.path.exists(state_path) else ProfileAccumulator(target_col)
+    size = os.path.getsize(path)
+    if acc.target_col != target_col or (acc.source_bytes is not None and size < acc.source_bytes):
+        print(f"♻️ {path} was rewritten or the target changed; profiling from scratch")
+        acc = ProfileAccumulator(target_col)
+
+    delta = ProfileAccumulator(target_col)
+    chunks, watermark = iter_appended_chunks(path, acc, chunksize)
+    for chunk in chunks:
+        delta.update(chunk)
+    acc.merge(delta)
+    acc.source_bytes = watermark
+    acc.save(state_path)
+    print(f"📈 Profiled {delta.source_rows} new rows ({acc.source_rows} total)")
+    return acc.result()
@@ -0,0 +1,197 @@
+# recommender/what_if.py
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pandas as pd
+
+from models.retrainer import compile_fix_plan
+from models.scheduler import PREDICTION_METRICS, TaskScheduler, cap_model_threads, shared
+from utils.helpers import detect_task_type
+from utils.ingest import build_feature_matrix
+from utils.tracing import traced
+
+PROXY_ESTIMATORS = 50
+# Fixes that remove leaked signal: their score drop is expected, so they rank first regardless
+CORRECTNESS_FIXES = ("leakage",)
+
+
+def proxy_model(task_type: str, model=None):
+    """
+    Cheap stand-in for the real model: a clone of `model` (e.g. the winner from
+    evaluate_models) with at most PROXY_ESTIMATORS trees, or a small random forest.
+    """
+    from sklearn.base import clone
+
+    if model is not None:
+        proxy = clone(model)
+        n_estimators = proxy.get_params().get("n_estimators")
+        if n_estimators is not None and n_estimators > PROXY_ESTIMATORS:
+            proxy.set_params(n_estimators=PROXY_ESTIMATORS)
+        return proxy
+    if task_type == "classification":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_estimators=PROXY_ESTIMATORS, max_depth=10, random_state=42)
+    from sklearn.ensemble import RandomForestRegressor
+    return RandomForestRegressor(n_estimators=PROXY_ESTIMATORS, max_depth=10, random_state=42)
+
+
+def _stratified_sample(y: pd.Series, task_type, sample_rows, random_state):
+    """Row positions of a stratified subsample: by class, or by target decile for regression."""
+    from models.trainer import stratified_order
+
+    if len(y) <= sample_rows:
+        return np.arange(len(y))
+    strata = y.to_numpy()
+    if task_type != "classification":
+        strata = pd.qcut(y.rank(method="first"), 10, labels=False).to_numpy()
+    return np.sort(stratified_order(strata, "classification", random_state)[:sample_rows])
+
+
+def _assign_repeated_folds(y, task_type, cv, repeats, random_state):
+    """(repeats, n_rows) fold ids from shuffled (stratified) K-fold, one seed per repeat."""
+    from sklearn.model_selection import KFold, StratifiedKFold
+
+    folds = np.empty((repeats, len(y)), dtype=np.int16)
+    for r in range(repeats):
+        splitter_cls = StratifiedKFold if task_type == "classification" else KFold
+        splitter = splitter_cls(n_splits=cv, shuffle=True, random_state=random_state + r)
+        for k, (_, test_idx) in enumerate(splitter.split(np.zeros(len(y)), y)):
+            folds[r, test_idx] = k
+    return folds
+
+
+def _score_fold(candidate, matrix, repeat, fold, resample, scoring, n_threads):
+    """Fit the proxy on one training fold (SMOTE-resampled in-fold if asked) and score the rest."""
+    from sklearn.base import clone
+    from threadpoolctl import threadpool_limits
+
+    X, y, folds = shared(matrix), shared("y"), shared("folds")[repeat]
+    test = folds == fold
+    X_train, y_train = X[~test], y[~test]
+    if resample == "smote":
+        from imblearn.over_sampling import SMOTE
+        X_train, y_train = SMOTE(random_state=42).fit_resample(X_train, y_train)
+    model = cap_model_threads(clone(shared("context")["proxy"]), n_threads)
+    with threadpool_limits(limits=n_threads):
+        model.fit(X_train, y_train)
+        pred = model.predict(X[test])
+    return candidate, repeat, fold, PREDICTION_METRICS[scoring](y[test], pred)
+
+
+def _interval(deltas, ci):
+    if len(deltas) < 2:
+        return float("nan"), float("nan")
+    from scipy.stats import t
+
+    half = t.ppf(0.5 + ci / 2, len(deltas) - 1) * np.std(deltas, ddof=1) / np.sqrt(len(deltas))
+    return float(np.mean(deltas) - half), float(np.mean(deltas) + half)
+
+
+@traced()
+def evaluate_fixes(df: pd.DataFrame, target: str, suggestions: list, model=None,
+                   sample_rows=5000, cv=3, repeats=2, time_budget=60.0, n_workers=None, ci=0.95,
+                   random_state=42):
+    """
+    What-if evaluation: apply each suggestion's fix on its own to a stratified
+    subsample and score a cheap proxy model on the same (repeated) CV folds as the
+    unfixed baseline. Fold tasks run on a process pool, baseline and all fixes
+    interleaved fold by fold, until `time_budget` seconds; fixes are compared only on
+    folds where both finished. SMOTE is applied to training folds only.
+    Returns one row per suggestion with the mean paired score change and its
+    t-interval (approximate: repeated-CV folds are not independent), ranked. The proxy
+    is `model` (e.g. evaluate_models' best) shrunk to PROXY_ESTIMATORS trees, else a
+    small random forest; note tree proxies are blind to monotone (log) transforms.
+    """
+    started = time.monotonic()
+    task_type = detect_task_type(df[target])
+    scoring = "f1_macro" if task_type == "classification" else "r2"
+
+    sample = df.iloc[_stratified_sample(df[target], task_type, sample_rows, random_state)]
+    X_base, y = build_feature_matrix(sample, target)
+    y = np.asarray(y)
+    if task_type == "classification":
+        y = np.unique(y, return_inverse=True)[1]
+
+    # One matrix per distinct fix; suggestions without an automatic fix are reported, not scored
+    arrays = {"y": y, "folds": _assign_repeated_folds(y, task_type, cv, repeats, random_state), "X0": X_base.to_numpy()}
+    candidates, records = [], []
+    for i, suggestion in enumerate(suggestions):
+        record = {
+            "type": suggestion["type"], "feature": suggestion.get("feature"),
+            "suggestion": suggestion["suggestion"], "priority": suggestion.get("priority"),
+            "score_change": np.nan, "ci_low": np.nan, "ci_high": np.nan,
+            "baseline": np.nan, "score": np.nan, "folds": 0, "status": "ok",
+        }
+        records.append(record)
+        plan = compile_fix_plan([suggestion], target)
+        resample, plan.resample = plan.resample, None
+        if not (plan.drop or plan.impute or plan.log or resample):
+            record["status"] = "no automatic fix"
+            continue
+        try:
+            X_fixed, _ = build_feature_matrix(plan.apply(sample), target)
+        except Exception as e:
+            record["status"] = f"failed: {e}"
+            continue
+        if X_fixed.empty:
+            record["status"] = "failed: no features left"
+            continue
+        arrays[f"X{i + 1}"] = X_fixed.to_numpy()
+        candidates.append((i, f"X{i + 1}", resample))
+
+    tasks = []
+    for repeat in range(repeats):
+        for fold in range(cv):
+            tasks.append((-1, "X0", repeat, fold, None, scoring))
+            tasks.extend((i, matrix, repeat, fold, resample, scoring) for i, matrix, resample in candidates)
+
+    context = {"proxy": proxy_model(task_type, model)}
+    deadline = started + time_budget
+    with TaskScheduler(arrays, n_workers=n_workers, max_tasks=len(tasks), context=context) as scheduler:
+        outcomes = scheduler.map(_score_fold, [task + (scheduler.threads_per_task,) for task in tasks],
+                                 deadline=deadline)
+
+    scores, errors = {}, {}
+    for (candidate, _, repeat, fold, _, _), (result, error) in zip(tasks, outcomes):
+        if error is None:
+            scores[candidate, repeat, fold] = result[3]
+        elif not isinstance(error, FutureTimeoutError):
+            errors.setdefault(candidate, error)
+
+    for i, _, _ in candidates:
+        record = records[i]
+        paired = [(scores[-1, r, k], scores[i, r, k]) for r in range(repeats) for k in range(cv)
+                  if (-1, r, k) in scores and (i, r, k) in scores]
+        if not paired:
+            error = errors.get(i) or errors.get(-1)
+            record["status"] = f"failed: {error}" if error is not None else "time budget exhausted"
+            continue
+        base, fixed = np.array(paired).T
+        deltas = fixed - base
+        record.update({
+            "score_change": float(deltas.mean()), "baseline": float(base.mean()), "score": float(fixed.mean()),
+            "folds": len(deltas),
+        })
+        record["ci_low"], record["ci_high"] = _interval(deltas, ci)
+
+    impact = pd.DataFrame.from_records(records)
+    impact["_scored"] = impact["folds"] > 0
+    impact["_correctness"] = impact["type"].isin(CORRECTNESS_FIXES)
+    impact = impact.sort_values(["_scored", "_correctness", "score_change"], ascending=False, kind="stable")
+    impact = impact.drop(columns=["_scored", "_correctness"])
+    impact.attrs.update({"metric": scoring, "rows": len(sample), "seconds": round(time.monotonic() - started, 2)})
+    print(f"🧪 Scored {len(candidates)} fixes on {len(sample)} rows in {impact.attrs['seconds']}s")
+    return impact
+
+
+def rank_suggestions(suggestions: list, impact: pd.DataFrame) -> list:
+    """`suggestions` in evaluate_fixes() order, each with its measured score change and interval."""
+    ranked = []
+    for idx, row in impact.iterrows():
+        suggestion = dict(suggestions[idx])
+        suggestion.update({
+            "score_change": row["score_change"], "ci": (row["ci_low"], row["ci_high"]), "impact_status": row["status"],
+        })
+        ranked.append(suggestion)
+    return ranked
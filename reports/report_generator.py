@@ -1,13 +1,15 @@
 # reports/report_generator.py
-def generate_markdown_report(diag_data, filepath="reports/report.md"):
+def generate_markdown_report(diag_data, filepath="reports/report.md", run=None):
     import os
     os.makedirs("reports", exist_ok=True)
+    if run is not None:
+        run.put("diagnostics", diag_data)
     
     with open(filepath, "w", encoding="utf-8") as f:  # ← Added encoding
         f.write("# 🧠 ExplainML++ Report\n\n")
         f.write(f"- Dataset: {diag_data.get('dataset', 'Unknown')}\n")
         f.write(f"- Target: {diag_data['target']}\n")
-        f.write(f"- Best Model: {diag_data['best_model']} (F1: {diag_data['f1_score']:.3f})\n")
+        f.write(f"- Best Model: {diag_data['best_model']} ({diag_data.get('metric', 'F1')}: {diag_data['f1_score']:.3f})\n")
         
         if diag_data.get("suggestions"):
             f.write("\n## 🛠️ Suggestions\n")
@@ -16,10 +18,12 @@ def generate_markdown_report(diag_data, filepath="reports/report.md"):
     
     print(f"✅ Report saved: {filepath}")
 
-def generate_pdf_report(diag_data, filepath="reports/report.pdf"):
+def generate_pdf_report(diag_data, filepath="reports/report.pdf", run=None):
     from fpdf import FPDF
     import os
     os.makedirs("reports", exist_ok=True)
+    if run is not None:
+        run.put("diagnostics", diag_data)
 
     pdf = FPDF()
     pdf.add_page()
@@ -30,7 +34,7 @@ def generate_pdf_report(diag_data, filepath="reports/report.pdf"):
     pdf.cell(0, 10, f"Dataset: {diag_data.get('dataset', 'Unknown')}", ln=True)
     pdf.cell(0, 10, f"Target: {diag_data['target']}", ln=True)
     pdf.cell(0, 10, f"Best Model: {diag_data['best_model']}", ln=True)
-    pdf.cell(0, 10, f"F1 Score: {diag_data['f1_score']:.3f}", ln=True)
+    pdf.cell(0, 10, f"{diag_data.get('metric', 'F1')} Score: {diag_data['f1_score']:.3f}", ln=True)
 
     if diag_data.get("suggestions"):
         pdf.ln(10)
@@ -41,4 +45,50 @@ def generate_pdf_report(diag_data, filepath="reports/report.pdf"):
             pdf.cell(0, 10, f"[{s['priority']}] {s['suggestion']}", ln=True)
 
     pdf.output(filepath)
-    print(f"📄 PDF report saved: {filepath}")
\ No newline at end of file
+    print(f"📄 PDF report saved: {filepath}")
+
+def report_from_run(run, filepath="reports/report.md"):
+    """Re-render a stored run's report (see utils.artifacts) without recomputing anything."""
+    diag_data = run.get("diagnostics")
+    if diag_data is None:
+        raise ValueError(f"Run {run.path} has no stored diagnostics.")
+    if filepath.lower().endswith(".pdf"):
+        generate_pdf_report(diag_data, filepath)
+    else:
+        generate_markdown_report(diag_data, filepath)
+
+def generate_batch_report(summaries, filepath="reports/batch_summary.md"):
+    """One table over every dataset of a batch run, plus the top suggestions per dataset."""
+    import json
+    import os
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+
+    counts = {}
+    for s in summaries:
+        counts[s["status"]] = counts.get(s["status"], 0) + 1
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write("# 🧠 ExplainML++ Batch Report\n\n")
+        f.write(", ".join(f"{n} {status}" for status, n in sorted(counts.items())) + "\n\n")
+        f.write("| Dataset | Target | Status | Rows | Best Model | Score | Critical | High |\n")
+        f.write("|---|---|---|---|---|---|---|---|\n")
+        for s in summaries:
+            if s["status"] == "failed":
+                f.write(f"| {s['name']} | {s['target']} | failed: {s['error']} | | | | | |\n")
+                continue
+            f.write(
+                f"| {s['name']} | {s['target']} | {s['status']} | {s['rows']} | {s['best_model']} "
+                f"| {s['metric']} {s['score']:.3f} | {s['critical']} | {s['high']} |\n"
+            )
+
+        f.write("\n## 🛠️ Top Suggestions\n")
+        for s in summaries:
+            if s.get("top_suggestions"):
+                f.write(f"\n### {s['name']}\n")
+                for suggestion in s["top_suggestions"]:
+                    f.write(f"- {suggestion}\n")
+
+    with open(os.path.splitext(filepath)[0] + ".json", "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2, default=str)
+
+    print(f"✅ Batch report saved: {filepath}")
@@ -0,0 +1,24 @@
+# tests/conftest.py
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def classification_df():
+    """400 rows, 4 numeric features (one with gaps) and a binary target driven by f0/f1."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 4))
+    df = pd.DataFrame(X, columns=["f0", "f1", "f2", "f3"])
+    df["target"] = (X[:, 0] + 0.5 * X[:, 1] + 0.3 * rng.normal(size=400) > 0).astype(int)
+    df.loc[df.index % 17 == 0, "f3"] = np.nan
+    return df
+
+
+@pytest.fixture
+def regression_df():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(300, 3))
+    df = pd.DataFrame(X, columns=["a", "b", "c"])
+    df["target"] = 3 * X[:, 0] - 2 * X[:, 1] + 0.1 * rng.normal(size=300)
+    return df
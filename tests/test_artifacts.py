@@ -0,0 +1,126 @@
+# tests/test_artifacts.py
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from models.trainer import evaluate_models, load_training, save_training
+from utils.artifacts import ArtifactStore
+from utils.ingest import build_feature_matrix
+
+DATA_HASH = "ab" * 16
+
+
+def test_round_trip(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    run = store.begin(DATA_HASH, "target")
+    run.put("matrix", np.arange(6, dtype=np.float32).reshape(2, 3))
+    run.put("frame", pd.DataFrame({"a": [1, 2]}))
+    run.put("meta", {"k": "v"})
+    assert store.open(DATA_HASH, "target") is None  # not committed yet
+    store.commit(run)
+
+    opened = store.open(DATA_HASH, "target")
+    assert opened.version == run.version and sorted(opened.names()) == ["frame", "matrix", "meta"]
+    matrix = opened.get("matrix")
+    assert isinstance(matrix, np.memmap) and not matrix.flags.writeable
+    np.testing.assert_array_equal(matrix, np.arange(6).reshape(2, 3))
+    assert opened.get("frame").equals(pd.DataFrame({"a": [1, 2]}))
+    assert opened.get("meta") == {"k": "v"}
+    assert opened.get("absent", "default") == "default"
+
+
+def test_newest_compatible_version_wins(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    for value in (1, 2):
+        run = store.begin(DATA_HASH, "target")
+        run.put("value", value)
+        store.commit(run)
+    assert [v["version"] for v in store.runs(DATA_HASH, "target")] == [2, 1]
+    assert store.open(DATA_HASH, "target").get("value") == 2
+    assert store.open(DATA_HASH, "target", version=1).get("value") == 1
+
+    other = ArtifactStore(str(tmp_path))
+    other.versions = {**other.versions, "numpy": "0.0"}
+    assert other.open(DATA_HASH, "target") is None
+
+
+def test_concurrent_runs_reserve_distinct_versions(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    interrupted = store.begin(DATA_HASH, "target")  # never committed
+    versions, lock = [], threading.Lock()
+
+    def begin():
+        run = store.begin(DATA_HASH, "target")
+        run.put("owner", threading.get_ident())
+        with lock:
+            versions.append(run.version)
+
+    threads = [threading.Thread(target=begin) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(versions) == list(range(interrupted.version + 1, interrupted.version + 7))
+
+
+def test_training_round_trip(classification_df, tmp_path):
+    X, y = build_feature_matrix(classification_df, "target")
+    results, best = evaluate_models(X, y, cv=3, n_workers=1)
+
+    store = ArtifactStore(str(tmp_path))
+    run = store.begin(DATA_HASH, "target")
+    save_training(run, results, best)
+    store.commit(run)
+    loaded, model = load_training(store.open(DATA_HASH, "target"))
+    assert list(loaded["model"]) == list(results["model"])
+    np.testing.assert_array_equal(loaded.iloc[0]["oof_pred"], results.iloc[0]["oof_pred"])
+    np.testing.assert_array_equal(model.predict(X.to_numpy()), best.predict(X.to_numpy()))
+
+
+def _commit_runs(root, n):
+    store = ArtifactStore(root)
+    for _ in range(n):
+        store.commit(store.begin(DATA_HASH, "target"))
+
+
+def test_concurrent_commits_keep_every_version(tmp_path):
+    root = str(tmp_path)
+    workers = [multiprocessing.Process(target=_commit_runs, args=(root, 10)) for _ in range(2)]
+    workers += [threading.Thread(target=_commit_runs, args=(root, 10)) for _ in range(2)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    versions = [v["version"] for v in ArtifactStore(root).runs(DATA_HASH, "target")]
+    assert sorted(versions) == list(range(1, 41))
+    assert not os.path.exists(os.path.join(root, "index.json.lock"))
+
+
+def test_shap_and_report_round_trip(classification_df, tmp_path, monkeypatch):
+    from explainability.shap_engine import explain_model_with_shap, load_shap, save_shap
+    from reports.report_generator import generate_markdown_report, report_from_run
+
+    X, y = build_feature_matrix(classification_df, "target")
+    results, best = evaluate_models(X, y, cv=3, n_workers=1)
+    shap_data = explain_model_with_shap(best, X, sample_size=100)
+    diag_data = {"target": "target", "best_model": results.iloc[0]["model"], "f1_score": 0.9, "suggestions": []}
+
+    store = ArtifactStore(str(tmp_path / "store"))
+    run = store.begin(DATA_HASH, "target")
+    save_training(run, results, best)
+    save_shap(run, shap_data)
+    monkeypatch.chdir(tmp_path)
+    generate_markdown_report(diag_data, "reports/first.md", run=run)
+    store.commit(run)
+
+    opened = store.open(DATA_HASH, "target")
+    _, model = load_training(opened)
+    loaded = load_shap(opened, model)
+    assert isinstance(loaded["shap_values"].values, np.memmap)
+    np.testing.assert_array_equal(loaded["shap_values"].values, np.asarray(shap_data["shap_values"].values))
+    assert loaded["data_sample"].equals(shap_data["data_sample"]) and loaded["explainer"] is not None
+    report_from_run(opened, "reports/again.md")
+    assert (tmp_path / "reports/again.md").read_text() == (tmp_path / "reports/first.md").read_text()
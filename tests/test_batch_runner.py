@@ -0,0 +1,36 @@
+# tests/test_batch_runner.py
+import json
+
+import pytest
+
+from utils.batch_runner import load_manifest, run_batch
+
+
+def test_manifest_paths_resolve_against_the_manifest(tmp_path):
+    (tmp_path / "jobs.csv").write_text("dataset,target,name\ndata/a.csv,y,\n/abs/b.csv,label,bee\n")
+    jobs = load_manifest(str(tmp_path / "jobs.csv"))
+    assert jobs == [
+        {"dataset": str(tmp_path / "data" / "a.csv"), "target": "y", "name": "a"},
+        {"dataset": "/abs/b.csv", "target": "label", "name": "bee"},
+    ]
+    (tmp_path / "jobs.json").write_text(json.dumps([{"dataset": "a.csv"}]))
+    with pytest.raises(ValueError, match="needs 'dataset' and 'target'"):
+        load_manifest(str(tmp_path / "jobs.json"))
+
+
+def test_batch_skips_unchanged_datasets_and_reports_failures(classification_df, tmp_path):
+    classification_df.to_csv(tmp_path / "clf.csv", index=False)
+    manifest = tmp_path / "jobs.json"
+    manifest.write_text(json.dumps([
+        {"dataset": "clf.csv", "target": "target"},
+        {"dataset": "missing.csv", "target": "target"},
+    ]))
+    state = str(tmp_path / "runs")
+
+    first = run_batch(str(manifest), state_dir=state, workers=1)
+    assert first[0]["status"] == "done" and first[0]["task_type"] == "classification"
+    assert first[1]["status"] == "failed"
+
+    second = run_batch(str(manifest), state_dir=state, workers=1)
+    assert second[0]["status"] == "skipped" and second[0]["best_model"] == first[0]["best_model"]
+    assert run_batch(str(manifest), state_dir=state, workers=1, force=True)[0]["status"] == "done"
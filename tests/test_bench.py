@@ -0,0 +1,45 @@
+# tests/test_bench.py
+import numpy as np
+import pytest
+
+from benchmark.bench import STARTUP_MODULES, compare_results, measure, measure_import
+from benchmark.synthetic import make_dataset
+
+
+def test_synthetic_dataset_is_seeded_and_shaped():
+    df = make_dataset(rows=1000, cols=6, n_categorical=2, imbalance=4.0, missing_rate=0.1)
+    assert df.shape == (1000, 7) and df.equals(make_dataset(rows=1000, cols=6, n_categorical=2,
+                                                            imbalance=4.0, missing_rate=0.1))
+    counts = df["target"].value_counts()
+    assert counts.max() / counts.min() == pytest.approx(4.0, rel=0.05)
+    assert 0.05 < df["num_0"].isna().mean() < 0.15 and df["cat_0"].notna().all()
+
+
+def test_measure_runs_the_allocation_pass_in_process():
+    calls = []
+
+    def stage(n_workers):
+        calls.append(n_workers)
+        return np.ones(2**20).sum()
+
+    result, metrics = measure(stage, trace_allocations=True)
+    assert result == 2**20 and calls == [None, 1]
+    assert metrics["wall_s"] >= 0 and metrics["peak_rss_mb"] > 0
+    assert metrics["alloc_peak_mb"] >= 8  # the 1M-float64 array
+
+
+def test_compare_flags_regressions_over_tolerance():
+    record = {"scenario": {"rows": 10}, "stage": "profile", "error": None,
+              "wall_s": 1.0, "peak_rss_mb": 100.0, "alloc_peak_mb": None}
+    baseline = {"results": [record]}
+    assert compare_results({"results": [{**record, "wall_s": 1.1}]}, baseline) == []
+    slower = compare_results({"results": [{**record, "wall_s": 1.5, "peak_rss_mb": 200.0}]}, baseline)
+    assert [r["metric"] for r in slower] == ["wall_s", "peak_rss_mb"]
+    failed = compare_results({"results": [{**record, "error": "boom"}]}, baseline)
+    assert failed[0]["metric"] == "error"
+
+
+@pytest.mark.parametrize("module", STARTUP_MODULES)
+def test_entry_points_load_heavy_libraries_lazily(module):
+    _, loaded = measure_import(module, repeats=1)
+    assert loaded == []
@@ -0,0 +1,51 @@
+# tests/test_cache.py
+import os
+import threading
+
+from utils.cache import StageCache
+
+
+def test_hit_after_miss(tmp_path):
+    cache = StageCache(str(tmp_path))
+    calls = []
+    compute = lambda: calls.append(1) or {"value": 42}  # noqa: E731
+    assert cache.get_or_compute("stage", ("key",), compute) == {"value": 42}
+    assert cache.get_or_compute("stage", ("key",), compute) == {"value": 42}
+    assert len(calls) == 1
+    assert cache.stats()["by_stage"]["stage"] == {"hits": 1, "misses": 1}
+
+
+def test_unreadable_entry_is_recomputed(tmp_path):
+    cache = StageCache(str(tmp_path))
+    cache.get_or_compute("stage", (1,), lambda: "old")
+    path, = [os.path.join(tmp_path, f) for f in os.listdir(tmp_path) if f.endswith(".pkl")]
+    with open(path, "wb") as f:
+        f.write(b"not a pickle")
+    assert cache.get_or_compute("stage", (1,), lambda: "new") == "new"
+
+
+def test_eviction_keeps_size_bounded(tmp_path):
+    cache = StageCache(str(tmp_path), max_bytes=5_000)
+    for i in range(20):
+        cache.get_or_compute("stage", (i,), lambda: b"x" * 1_000)
+    assert cache.size_bytes() <= 5_000
+
+
+def test_sessions_sharing_a_directory(tmp_path):
+    errors = []
+
+    def session(seed):
+        cache = StageCache(str(tmp_path), max_bytes=20_000)
+        try:
+            for i in range(40):
+                value = cache.get_or_compute("stage", ((seed + i) % 25,), lambda: bytes(2_000))
+                assert value == bytes(2_000)
+        except Exception as e:  # pragma: no cover - reported below
+            errors.append(e)
+
+    threads = [threading.Thread(target=session, args=(s,)) for s in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
@@ -0,0 +1,29 @@
+# tests/test_catalog.py
+import numpy as np
+import pandas as pd
+
+from explainability.fairness_checker import sensitive_candidates
+from utils.catalog import ColumnCatalog
+from utils.ingest import build_feature_matrix
+
+
+def test_catalog_matches_pandas(classification_df):
+    catalog = ColumnCatalog.build(classification_df)
+    assert catalog.nunique("target") == 2
+    assert catalog.null_counts() == classification_df.isna().sum().to_dict()
+
+
+def test_consumers_give_the_same_answer_with_a_catalog(classification_df):
+    catalog = ColumnCatalog.build(classification_df)
+    X, y = build_feature_matrix(classification_df, "target")
+    X_cat, y_cat = build_feature_matrix(classification_df, "target", catalog=catalog)
+    assert X.equals(X_cat) and np.array_equal(y, y_cat)
+
+    df = pd.DataFrame({
+        "sex": ["f", "m"] * 50,
+        "income": np.linspace(0, 1, 100),
+        "id": np.arange(100),
+        "region": pd.Categorical(["n", "s", "e", "w"] * 25),
+        "target": [0, 1] * 50,
+    })
+    assert sensitive_candidates(df, exclude=["target"], catalog=ColumnCatalog.build(df)) == ["sex", "region"]
@@ -0,0 +1,56 @@
+# tests/test_error_analysis.py
+import numpy as np
+import pandas as pd
+
+from explainability.error_analysis import SliceFinder, _bin_column, find_error_clusters
+
+
+def test_low_cardinality_values_get_one_code_each():
+    values = pd.Series([1.0, 2.0, 2.0, 3.0, np.nan])
+    codes, labels = _bin_column(values, "x", n_bins=8)
+    assert labels == ["x = 1", "x = 2", "x = 3", "x is missing"]
+    assert codes.tolist() == [0, 1, 1, 2, 3]
+
+
+def test_values_missing_from_the_sample_get_an_other_code():
+    # One rare value in a million rows: the 100k-row sample (seeded) does not contain it
+    values = pd.Series(np.r_[np.zeros(1_000_000), [7.0], [np.nan]])
+    codes, labels = _bin_column(values, "x", n_bins=8)
+    assert labels == ["x = 0", "x is other", "x is missing"]
+    assert labels[codes[1_000_000]] == "x is other"
+    assert labels[codes[-1]] == "x is missing"
+    assert codes.max() == len(labels) - 1
+
+
+def test_high_cardinality_values_use_quantile_bins():
+    values = pd.Series(np.arange(1000, dtype=float))
+    codes, labels = _bin_column(values, "x", n_bins=4)
+    assert len(labels) == 4
+    assert np.bincount(codes).tolist() == [250, 250, 250, 250]
+
+
+def test_categories_keep_the_most_frequent_levels():
+    values = pd.Series(["a"] * 5 + ["b"] * 3 + ["c", "d"])
+    codes, labels = _bin_column(values, "s", n_bins=3)
+    assert labels == ["s = 'a'", "s = 'b'", "s is other"]
+    assert codes.tolist() == [0] * 5 + [1] * 3 + [2, 2]
+
+
+def test_slice_finder_locates_the_failing_segment():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame({"age": rng.integers(18, 80, 5000).astype(float), "region": rng.choice(list("nsew"), 5000)})
+    errors = ((X["age"] > 65) & (X["region"] == "s")) | (rng.random(5000) < 0.02)
+    top = SliceFinder(X, errors).search(top_k=1)[0]
+    assert set(top["features"]) == {"age", "region"}
+    assert "region = 's'" in top["condition"]
+    assert top["error_rate"] > 0.8
+
+
+def test_find_error_clusters_regression_uses_largest_residuals():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame({"a": rng.normal(size=1000), "b": rng.normal(size=1000)})
+    y = X["a"].to_numpy()
+    y_pred = y + np.where(X["b"] > 1, 5.0, 0.0)
+    clusters = find_error_clusters(X, y, y_pred, task_type="regression")
+    assert clusters and clusters[0]["features"] == ["b"]
+    assert clusters[0]["mean_abs_residual"] > 1
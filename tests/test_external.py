@@ -0,0 +1,52 @@
+# tests/test_external.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.external import FOLD_BLOCK_ROWS, FeatureStore, evaluate_models_external, fold_slices
+
+
+def test_fold_slices_partition_the_rows():
+    n_splits, start, stop = 3, 5, 100
+    owned = np.zeros(stop - start, dtype=int)
+    for fold in range(n_splits):
+        hold = np.r_[tuple(fold_slices(start, stop, fold, n_splits, block=8))]
+        train = np.r_[tuple(fold_slices(start, stop, fold, n_splits, block=8, holdout=False))]
+        assert not np.intersect1d(hold, train).size and len(hold) + len(train) == stop - start
+        assert ((hold + start) // 8 % n_splits == fold).all()
+        owned[hold] += 1
+    assert (owned == 1).all()
+
+
+def test_feature_store_spills_features_and_encodes_labels(tmp_path):
+    df = pd.DataFrame({"a": [1.0, np.nan, 3.0, 4.0], "b": [1, 2, 3, 4], "s": list("wxyz"),
+                       "target": ["no", "yes", None, "no"]})
+    df.to_csv(tmp_path / "t.csv", index=False)
+    with FeatureStore(str(tmp_path / "t.csv"), "target", chunksize=2, spill_dir=str(tmp_path)) as store:
+        assert store.features == ["a", "b"] and store.rows == 3
+        np.testing.assert_array_equal(store.X, [[1, 1], [0, 2], [4, 4]])
+        assert store.classes == ["no", "yes"] and store.y.tolist() == [0, 1, 0]
+        spill = store.spill_dir
+    assert not (tmp_path / spill).exists()
+
+
+@pytest.mark.parametrize("task_type", ["classification", "regression"])
+def test_external_training_streams_interleaved_folds(task_type, tmp_path):
+    # Folds own blocks of FOLD_BLOCK_ROWS rows, so the table needs a few blocks per fold
+    rng = np.random.default_rng(0)
+    n = FOLD_BLOCK_ROWS * 4
+    df = pd.DataFrame(rng.normal(size=(n, 3)), columns=["a", "b", "c"])
+    signal = 3 * df["a"] - 2 * df["b"] + 0.1 * rng.normal(size=n)
+    df["target"] = np.where(signal > 0, "yes", "no") if task_type == "classification" else signal
+    df.to_csv(tmp_path / "data.csv", index=False)
+
+    results, best = evaluate_models_external(str(tmp_path / "data.csv"), "target", cv=3, chunksize=5000,
+                                             n_workers=1, spill_dir=str(tmp_path))
+    assert list(results["task_type"].unique()) == [task_type]
+    assert len(results) == 2 and results["rows_evaluated"].eq(n).all()
+    assert results.iloc[0]["score_mean"] > 0.9
+    assert results.attrs["classes"] == (["no", "yes"] if task_type == "classification" else None)
+    X = results.attrs["sample"].to_numpy()
+    if results.attrs["scaler"] is not None:
+        X = results.attrs["scaler"].transform(X)
+    assert len(best.predict(X)) == len(X)
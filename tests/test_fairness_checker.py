@@ -0,0 +1,71 @@
+# tests/test_fairness_checker.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from explainability.fairness_checker import check_fairness, fairness_report, sensitive_candidates
+
+
+@pytest.fixture
+def outcomes():
+    rng = np.random.default_rng(0)
+    n = 2000
+    sensitive = pd.DataFrame({"sex": rng.choice(["f", "m"], n), "age_band": rng.choice(["<40", "40+"], n)})
+    y_true = rng.integers(0, 2, n)
+    # The model is right 90% of the time for "m" and 60% for "f"
+    hit = rng.random(n) < np.where(sensitive["sex"] == "m", 0.9, 0.6)
+    y_pred = np.where(hit, y_true, 1 - y_true)
+    y_score = np.clip(y_pred * 0.8 + rng.random(n) * 0.2, 0, 1)
+    return y_true, y_pred, y_score, sensitive
+
+
+def test_vectorized_metrics_match_per_group_pandas(outcomes):
+    y_true, y_pred, y_score, sensitive = outcomes
+    report = fairness_report(y_true, y_pred, sensitive, y_score=y_score, n_bootstrap=0)
+    assert set(report["attributes"]) == {"sex", "age_band", "sex & age_band"}
+
+    frame = sensitive.assign(y=y_true, p=y_pred)
+    for _, row in report.iterrows():
+        attrs = row["attributes"].split(" & ")
+        mask = np.logical_and.reduce([frame[a] == v for a, v in zip(attrs, row["group"].split(" & "))])
+        group = frame[mask]
+        assert row["size"] == len(group)
+        assert row["accuracy"] == pytest.approx((group["y"] == group["p"]).mean())
+        assert row["selection_rate"] == pytest.approx((group["p"] == 1).mean())
+        assert row["tpr"] == pytest.approx((group.loc[group["y"] == 1, "p"] == 1).mean())
+
+
+def test_bootstrap_intervals_cover_the_point_estimate(outcomes):
+    y_true, y_pred, _, sensitive = outcomes
+    report = fairness_report(y_true, y_pred, sensitive[["sex"]], n_bootstrap=200)
+    assert "calibration_gap" not in report.columns  # no scores given
+    assert (report["accuracy_lo"] <= report["accuracy"]).all()
+    assert (report["accuracy"] <= report["accuracy_hi"]).all()
+    by_group = report.set_index("group")
+    assert by_group.loc["f", "accuracy_hi"] < by_group.loc["m", "accuracy_lo"]
+
+
+def test_small_groups_are_suppressed(outcomes):
+    y_true, y_pred, _, sensitive = outcomes
+    sensitive = sensitive.assign(rare=np.where(np.arange(len(y_true)) < 10, "x", "y"))
+    report = fairness_report(y_true, y_pred, sensitive[["rare"]], n_bootstrap=0, min_group_size=30)
+    assert report["group"].tolist() == ["y"]
+
+
+def test_check_fairness_keeps_its_legacy_shape(outcomes):
+    y_true, y_pred, _, sensitive = outcomes
+    result = check_fairness(y_true, y_pred, sensitive["sex"])
+    assert set(result) == {"f", "m"}
+    assert set(result["m"]) == {"accuracy", "pred_positive_rate"}
+    assert result["m"]["accuracy"] > result["f"]["accuracy"]
+
+
+def test_sensitive_candidates():
+    df = pd.DataFrame({
+        "sex": ["f", "m"] * 50,
+        "income": np.linspace(0, 1, 100),
+        "id": np.arange(100),
+        "region": pd.Categorical(["n", "s", "e", "w"] * 25),
+        "target": [0, 1] * 50,
+    })
+    assert sensitive_candidates(df, exclude=["target"]) == ["sex", "region"]
@@ -0,0 +1,42 @@
+# tests/test_incremental.py
+import numpy as np
+import pytest
+
+from models.incremental import refresh_from_file
+
+
+def test_appended_rows_update_profile_and_model(classification_df, tmp_path):
+    path = tmp_path / "table.csv"
+    bundle, state = str(tmp_path / "model.joblib"), str(tmp_path / "profile.pkl")
+    classification_df.iloc[:300].to_csv(path, index=False)
+
+    profile, report = refresh_from_file(str(path), "target", bundle, state)
+    assert report["full_retrain"] and profile["rows"] == 300
+
+    profile, report = refresh_from_file(str(path), "target", bundle, state)
+    assert report == {"new_rows": 0}
+
+    classification_df.iloc[300:].to_csv(path, mode="a", header=False, index=False)
+    profile, report = refresh_from_file(str(path), "target", bundle, state, holdout_fraction=0.2)
+    assert profile["rows"] == 400 and report["new_rows"] == 100
+    assert report["trained_rows"] == 80 and report["holdout_rows"] == 20
+    assert np.isfinite(report["score_before"]) and isinstance(report["accepted"], bool)
+    assert (tmp_path / "model.joblib.holdout.npz").exists()
+
+
+@pytest.mark.parametrize("history, appended", [
+    (["no", "yes"], ["no", "yes"]),
+    ([0.0, 1.0], [0, 1]),  # float labels written back as ints still match by value
+])
+def test_categorical_targets_warm_start(classification_df, tmp_path, history, appended):
+    path = tmp_path / "table.csv"
+    bundle, state = str(tmp_path / "model.joblib"), str(tmp_path / "profile.pkl")
+    df = classification_df.copy()
+    df["target"] = np.where(df["target"] == 1, history[1], history[0])
+    df.iloc[:300].to_csv(path, index=False)
+    refresh_from_file(str(path), "target", bundle, state)
+
+    tail = df.iloc[300:].assign(target=np.where(classification_df["target"].iloc[300:] == 1, appended[1], appended[0]))
+    tail.to_csv(path, mode="a", header=False, index=False)
+    _, report = refresh_from_file(str(path), "target", bundle, state)
+    assert "full_retrain" not in report and report["new_rows"] == 100
@@ -0,0 +1,57 @@
+# tests/test_ingest.py
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.ingest as ingest
+from utils.ingest import build_feature_matrix, compact_dtypes, load_dataset, numeric_features
+
+
+def test_compact_dtypes():
+    df = pd.DataFrame({"f": [0.5, 1.5, 2.5, 3.5], "i": [1, 2, 3, 200], "s": ["a", "b", "a", "a"]})
+    out = compact_dtypes(df.copy())
+    assert out["f"].dtype == np.float32
+    assert out["i"].dtype == np.int16
+    assert isinstance(out["s"].dtype, pd.CategoricalDtype)
+
+
+def test_chunked_csv_keeps_large_integers_with_gaps(monkeypatch):
+    monkeypatch.setattr(ingest, "CSV_CHUNKSIZE", 2)
+    csv = "id,x\n1,0.5\n,1.5\n123456789,2.5\n5,3.5\n"
+    df = load_dataset(io.StringIO(csv))
+    assert df["id"].dtype == np.float64
+    assert df["id"].iloc[2] == 123456789
+    assert df["x"].dtype == np.float32
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".feather"])
+def test_columnar_formats_are_compacted(tmp_path, suffix):
+    pytest.importorskip("pyarrow")
+    df = pd.DataFrame({"f": np.arange(10, dtype=np.float64), "i": np.arange(10), "s": ["a", "b"] * 5})
+    path = tmp_path / f"data{suffix}"
+    df.to_parquet(path) if suffix == ".parquet" else df.to_feather(path)
+    out = load_dataset(str(path))
+    assert out["f"].dtype == np.float32
+    assert out["i"].dtype == np.int8
+    assert isinstance(out["s"].dtype, pd.CategoricalDtype)
+
+
+def test_feature_matrix_passes_through_until_modified(classification_df):
+    X, y = build_feature_matrix(classification_df, "target")
+    assert X.dtypes.eq(np.float32).all() and not X.isna().any().any()
+    assert numeric_features(X) is X
+
+    with_text = X.assign(note="x")
+    assert "note" not in numeric_features(with_text).columns
+    with_gap = X.assign(extra=np.array([np.nan] + [1.0] * (len(X) - 1), dtype=np.float32))
+    assert numeric_features(with_gap)["extra"].iloc[0] == 0
+
+
+def test_rows_without_a_target_are_dropped(classification_df):
+    df = classification_df.assign(target=np.where(classification_df["target"] == 1, "yes", "no"))
+    df.loc[[3, 7], "target"] = None
+    X, y = build_feature_matrix(df, "target")
+    assert len(X) == len(y) == len(df) - 2 and 3 not in X.index
+    assert y.attrs["classes"] == ["no", "yes"] and set(y) == {0, 1}
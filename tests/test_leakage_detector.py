@@ -0,0 +1,61 @@
+# tests/test_leakage_detector.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from profiler.leakage_detector import CorrelationEngine, detect_high_correlation, detect_target_leakage
+
+
+@pytest.fixture
+def correlated():
+    rng = np.random.default_rng(3)
+    base = rng.normal(size=2000)
+    df = pd.DataFrame({
+        "a": base,
+        "b": base * 2 + rng.normal(scale=0.1, size=2000),
+        "c": rng.normal(size=2000),
+        "d": -base + rng.normal(scale=0.5, size=2000),
+        "const": np.ones(2000),
+    })
+    y = pd.Series((base > 0).astype(int))
+    return df, y
+
+
+def _pairwise_matrix(engine):
+    corr = engine._correlate(engine.Z, engine.Z, engine.mask, engine.mask)
+    return pd.DataFrame(corr, index=engine.columns, columns=engine.columns)
+
+
+@pytest.mark.parametrize("missing", [0.0, 0.2])
+def test_correlations_match_pandas(correlated, missing):
+    df, y = correlated
+    if missing:
+        rng = np.random.default_rng(4)
+        df = df.mask(rng.random(df.shape) < missing).assign(const=1.0)
+    engine = CorrelationEngine(df)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected = df.corr()  # NaN for the constant column, like the engine
+    np.testing.assert_allclose(_pairwise_matrix(engine), expected, atol=1e-5)
+    np.testing.assert_allclose(engine.target_correlations(y), df.corrwith(y.astype(float)), atol=1e-5)
+
+
+def test_detectors_report_strong_pairs(correlated):
+    df, y = correlated
+    assert [name for name, _ in detect_target_leakage(df, y, threshold=0.75)] == ["a", "b"]
+    assert detect_high_correlation(df, threshold=0.9, block_size=2) == [("a", "b")]
+
+
+def test_sampled_engine_reports_error_bound(correlated):
+    df, _ = correlated
+    engine = CorrelationEngine(df, sample_rows=500)
+    assert engine.n == 500
+    assert 0 < engine.error_bound < 0.1
+
+
+def test_detectors_return_the_sampling_error_bound(correlated):
+    df, y = correlated
+    leaks, bound = detect_target_leakage(df, y, threshold=0.75, sample_rows=500, return_error_bound=True)
+    assert [name for name, _ in leaks] == ["a", "b"] and 0 < bound < 0.1
+    pairs, bound = detect_high_correlation(df, sample_rows=500, return_error_bound=True)
+    assert pairs == [("a", "b")] and 0 < bound < 0.1
+    assert detect_high_correlation(df, return_error_bound=True) == ([("a", "b")], 0.0)
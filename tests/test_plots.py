@@ -0,0 +1,69 @@
+# tests/test_plots.py
+import threading
+
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+import visualizer.plots as plots
+from visualizer.plots import figure_bytes, plot_confusion_matrix, plot_shap_summary, stratified_sample
+
+
+def _shap_data(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return {"shap_values": rng.normal(size=(rows, 4)),
+            "data_sample": pd.DataFrame(rng.normal(size=(rows, 4)), columns=list("abcd"))}
+
+
+def test_small_inputs_draw_points_as_svg():
+    fig = plot_shap_summary(_shap_data(100))
+    assert isinstance(fig, Figure) and fig.explainml_points == 400
+    payload, mime = figure_bytes(fig)
+    assert mime == "image/svg+xml" and payload.lstrip().startswith(b"<?xml")
+
+
+def test_large_inputs_switch_to_density_png():
+    fig = plot_shap_summary(_shap_data(6000))
+    assert fig.explainml_points == 0
+    assert figure_bytes(fig, fmt="png")[1] == "image/png"
+
+
+def test_same_input_returns_the_cached_figure():
+    data = _shap_data(50, seed=1)
+    assert plot_shap_summary(data) is plot_shap_summary(data)
+    assert plot_shap_summary(data, mode="sample", max_points=20) is not plot_shap_summary(data)
+
+
+def test_cache_is_bounded_and_thread_safe(monkeypatch):
+    monkeypatch.setattr(plots, "FIGURE_CACHE_SIZE", 3)
+    figures, errors = [], []
+
+    def draw(seed):
+        try:
+            figures.append(plot_shap_summary(_shap_data(40, seed=100 + seed)))
+        except Exception as e:  # surfaced below
+            errors.append(e)
+
+    threads = [threading.Thread(target=draw, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and len({id(f) for f in figures}) == 6
+    assert len(plots._figure_cache) <= 3
+
+
+def test_stratified_sample_is_deterministic_and_proportional():
+    values = np.random.default_rng(0).exponential(size=(1000, 2))
+    rows = stratified_sample(values, 100)
+    assert len(rows) == 100 and np.array_equal(rows, stratified_sample(values, 100))
+    # Each |SHAP| decile keeps its share, so the tails survive subsampling
+    magnitude = np.abs(values).sum(axis=1)
+    deciles = np.searchsorted(np.quantile(magnitude, np.linspace(0.1, 0.9, 9)), magnitude[rows], side="right")
+    assert np.bincount(deciles, minlength=10).tolist() == [10] * 10
+
+
+def test_confusion_matrix():
+    fig = plot_confusion_matrix([0, 1, 1, 0], [0, 1, 0, 0])
+    assert isinstance(fig, Figure)
+    assert fig is plot_confusion_matrix([0, 1, 1, 0], [0, 1, 0, 0])
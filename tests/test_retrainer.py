@@ -0,0 +1,61 @@
+# tests/test_retrainer.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.retrainer import FixPlan, apply_fixes_and_retrain, compile_fix_plan
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        "keep": [1.0, 2.0, 3.0, 4.0],
+        "gaps": [1.0, np.nan, 3.0, np.nan],
+        "skewed": [-1.0, 0.0, 10.0, 100.0],
+        "leak": [0, 1, 0, 1],
+        "target": [0.5, 1.0, 100.0, 1000.0],
+    })
+
+
+def test_compile_fix_plan():
+    suggestions = [
+        {"type": "leakage", "feature": "leak"},
+        {"type": "collinearity", "feature": "keep, other"},
+        {"type": "imputation", "feature": "gaps"},
+        {"type": "transformation", "feature": "skewed"},
+        {"type": "balancing", "feature": "target"},
+        {"type": "error", "feature": "keep"},
+    ]
+    plan = compile_fix_plan(suggestions, "target")
+    assert (plan.drop, plan.impute, plan.log, plan.resample) == (["leak", "other"], ["gaps"], ["skewed"], "smote")
+
+
+def test_target_is_never_fixed():
+    suggestions = [{"type": kind, "feature": "target"} for kind in ("removal", "imputation", "transformation")]
+    plan = compile_fix_plan(suggestions, "target")
+    assert plan.drop == plan.impute == plan.log == []
+
+
+def test_apply_fits_once_and_survives_a_round_trip(frame, tmp_path):
+    plan = FixPlan("target", drop=["leak"], impute=["gaps"], log=["skewed"])
+    out = plan.apply(frame)
+    assert list(out.columns) == ["keep", "gaps", "skewed", "target"]
+    assert out["gaps"].tolist() == [1.0, 2.0, 3.0, 2.0]
+    np.testing.assert_allclose(out["skewed"], np.log1p(frame["skewed"] + 1.0))
+    assert out["target"].equals(frame["target"])
+
+    plan.save(tmp_path / "plan.json")
+    reloaded = FixPlan.load(tmp_path / "plan.json")
+    assert reloaded.fitted
+    new_rows = pd.DataFrame({"keep": [5.0], "gaps": [np.nan], "skewed": [3.0], "leak": [1], "target": [0.0]})
+    applied = reloaded.apply(new_rows)
+    assert applied["gaps"].tolist() == [2.0]  # the training median, not the new rows'
+    assert "leak" not in applied
+
+
+def test_apply_fixes_and_retrain_returns_the_fixed_frame(classification_df):
+    suggestions = [{"type": "removal", "feature": "f2"}, {"type": "imputation", "feature": "f3"}]
+    result = apply_fixes_and_retrain(classification_df, "target", suggestions, n_workers=1)
+    assert set(result) == {"plan", "data", "results_df", "model"}
+    assert "f2" not in result["data"] and not result["data"]["f3"].isna().any()
+    assert result["results_df"].attrs["features"] == ["f0", "f1", "f3"]
@@ -0,0 +1,75 @@
+# tests/test_scheduler.py
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import numpy as np
+import pytest
+
+from models.scheduler import TaskScheduler, shared
+from models.trainer import evaluate_models
+from utils.ingest import build_feature_matrix
+
+
+def _row_sum(name, row):
+    return name, float(shared(name)[row].sum()), shared("context")["tag"]
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _map(n_workers, arrays, tag):
+    tasks = [(name, row) for name in arrays for row in range(len(arrays[name]))]
+    with TaskScheduler(arrays, n_workers=n_workers, max_tasks=len(tasks), context={"tag": tag}) as scheduler:
+        return scheduler.map(_row_sum, tasks)
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_map_sees_shared_arrays_and_context(n_workers):
+    arrays = {"a": np.arange(12.0).reshape(4, 3), "b": np.ones((2, 5))}
+    outcomes = _map(n_workers, arrays, "ctx")
+    assert [error for _, error in outcomes] == [None] * 6
+    assert [result for result, _ in outcomes] == [
+        ("a", 3.0, "ctx"), ("a", 12.0, "ctx"), ("a", 21.0, "ctx"), ("a", 30.0, "ctx"),
+        ("b", 5.0, "ctx"), ("b", 5.0, "ctx"),
+    ]
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_concurrent_schedulers_keep_their_own_arrays(n_workers):
+    results = {}
+
+    def run(i):
+        results[i] = _map(n_workers, {"a": np.full((3, 2), float(i))}, i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(3):
+        assert [result for result, _ in results[i]] == [("a", 2.0 * i, i)] * 3
+
+
+def test_shared_outside_a_task_raises():
+    with pytest.raises(RuntimeError):
+        shared("a")
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_deadline_reports_futures_timeout(n_workers):
+    with TaskScheduler({"x": np.zeros(1)}, n_workers=n_workers, max_tasks=4) as scheduler:
+        outcomes = scheduler.map(_sleep, [(0.2,)] * 4, deadline=time.monotonic() + 0.1)
+    errors = [error for _, error in outcomes if error is not None]
+    assert errors and all(isinstance(error, FutureTimeoutError) for error in errors)
+
+
+def test_evaluate_models_pool_matches_inline(classification_df):
+    X, y = build_feature_matrix(classification_df, "target")
+    inline, _ = evaluate_models(X, y, cv=3, n_workers=1)
+    pooled, _ = evaluate_models(X, y, cv=3, n_workers=2)
+    assert list(inline["model"]) == list(pooled["model"])
+    np.testing.assert_allclose(inline["score_mean"], pooled["score_mean"])
+    np.testing.assert_array_equal(inline.iloc[0]["oof_pred"], pooled.iloc[0]["oof_pred"])
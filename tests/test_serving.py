@@ -0,0 +1,119 @@
+# tests/test_serving.py
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+
+from models.serving import MicroBatcher, ModelBundle
+from models.trainer import evaluate_models
+from utils.ingest import build_feature_matrix
+
+
+@pytest.fixture
+def bundle():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 3)).astype(np.float32)
+    y = (X[:, 0] > 0).astype(int)
+    return ModelBundle(LogisticRegression().fit(X, y), ["a", "b", "c"], "classification", classes=["no", "yes"])
+
+
+@pytest.fixture
+def rows():
+    return pd.DataFrame({"c": [0.1, 0.2], "a": [2.0, -2.0], "b": [0.0, 0.0], "extra": ["x", "y"]})
+
+
+def test_prepare_orders_columns_and_rejects_bad_input(bundle, rows):
+    np.testing.assert_allclose(bundle.prepare(rows), [[2.0, 0.0, 0.1], [-2.0, 0.0, 0.2]], rtol=1e-6)
+    assert bundle.prepare(rows.assign(b=[None, 1.0]))[0, 1] == 0.0
+    with pytest.raises(ValueError, match="Missing feature columns"):
+        bundle.prepare(rows.drop(columns="b"))
+    with pytest.raises(ValueError, match="non-numeric"):
+        bundle.prepare(rows.assign(b=["1.0", "oops"]))
+
+
+def test_bundle_round_trip(bundle, rows, tmp_path):
+    bundle.save(tmp_path / "bundle.joblib")
+    loaded = ModelBundle.load(tmp_path / "bundle.joblib")
+    assert loaded.predict(rows)["predictions"].tolist() == ["yes", "no"]
+
+
+def test_string_target_predictions_are_decoded(tmp_path):
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame(rng.normal(size=(300, 3)), columns=["a", "b", "c"])
+    df["target"] = np.where(df["a"] > 0, "yes", "no")
+    X, y = build_feature_matrix(df, "target")
+    results, _ = evaluate_models(X, y, cv=3, n_workers=1)
+    assert results.attrs["classes"] == ["no", "yes"]
+
+    ModelBundle.from_results(results, X).save(tmp_path / "bundle.joblib")
+    bundle = ModelBundle.load(tmp_path / "bundle.joblib")
+    rows = pd.DataFrame({"a": [3.0, -3.0, 2.5], "b": 0.0, "c": 0.0})
+    assert bundle.predict(rows)["predictions"].tolist() == ["yes", "no", "yes"]
+    batcher = MicroBatcher(bundle, max_wait_ms=1)
+    try:
+        assert batcher.submit(rows)["predictions"].tolist() == ["yes", "no", "yes"]
+    finally:
+        batcher.close()
+
+
+def test_bad_request_does_not_fail_its_batch(bundle, rows):
+    batcher = MicroBatcher(bundle, max_wait_ms=100)
+    requests = {"good": rows, "also_good": rows.iloc[:1], "missing": rows.drop(columns="a"),
+                "text": rows.assign(a=["x", "y"])}
+    outcomes, start = {}, threading.Barrier(len(requests))
+
+    def submit(name, frame):
+        start.wait()
+        try:
+            outcomes[name] = batcher.submit(frame)["predictions"].tolist()
+        except ValueError as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=submit, args=item) for item in requests.items()]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert outcomes["good"] == ["yes", "no"] and outcomes["also_good"] == ["yes"]
+    assert isinstance(outcomes["missing"], ValueError) and isinstance(outcomes["text"], ValueError)
+    metrics = batcher.metrics.snapshot()
+    assert (metrics["requests"], metrics["errors"], metrics["rows"]) == (4, 2, 3)
+
+
+def test_model_failure_stays_with_its_request(bundle, rows):
+    model = bundle.model
+
+    class PickyModel:
+        """Fails on any matrix containing a row whose first feature is exactly 9."""
+
+        def predict(self, X):
+            if (X[:, 0] == 9).any():
+                raise RuntimeError("cannot score 9")
+            return model.predict(X)
+
+    bundle.model = PickyModel()
+    batcher = MicroBatcher(bundle, max_wait_ms=100)
+    outcomes, start = {}, threading.Barrier(2)
+
+    def submit(name, frame):
+        start.wait()
+        try:
+            outcomes[name] = batcher.submit(frame)["predictions"].tolist()
+        except RuntimeError as e:
+            outcomes[name] = e
+
+    threads = [threading.Thread(target=submit, args=("good", rows)),
+               threading.Thread(target=submit, args=("bad", rows.assign(a=[9.0, 9.0])))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert outcomes["good"] == ["yes", "no"]
+    assert isinstance(outcomes["bad"], RuntimeError)
+    assert batcher.metrics.snapshot()["errors"] == 1
@@ -0,0 +1,76 @@
+# tests/test_shap_engine.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import StandardScaler
+
+import explainability.shap_engine as shap_engine
+from explainability.shap_engine import explain_adaptive, explain_model_with_shap, model_family
+
+
+@pytest.fixture
+def forest():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.normal(size=(600, 5)).astype(np.float32), columns=[f"f{i}" for i in range(5)])
+    y = (X["f0"] + 0.3 * X["f1"] > 0).astype(int)
+    return RandomForestClassifier(n_estimators=20, max_depth=5, random_state=0).fit(X.to_numpy(), y), X
+
+
+def _values(shap_data):
+    return np.asarray(shap_data["shap_values"].values)
+
+
+def test_family_dispatch(forest):
+    assert model_family(forest[0]) == "tree"
+    assert model_family(LinearRegression()) == "linear"
+
+
+def test_chunked_pool_matches_in_process(forest):
+    model, X = forest
+    whole = explain_model_with_shap(model, X, sample_size=None)
+    chunked = explain_model_with_shap(model, X, sample_size=None, chunk_size=150, n_workers=2)
+    np.testing.assert_allclose(_values(chunked), _values(whole), atol=1e-6)
+
+
+
+def test_chunked_temp_output_is_removed(forest, tmp_path, monkeypatch):
+    model, X = forest
+    monkeypatch.setattr(shap_engine.tempfile, "tempdir", str(tmp_path))
+    chunked = explain_model_with_shap(model, X, sample_size=None, chunk_size=150, n_workers=2)
+    assert not isinstance(chunked["shap_values"].values, np.memmap)
+    assert list(tmp_path.iterdir()) == []
+
+    def failing_chunk(*args):
+        raise RuntimeError("chunk failed")
+
+    monkeypatch.setattr(shap_engine, "_explain_chunk", failing_chunk)
+    with pytest.raises(RuntimeError, match="chunk failed"):
+        explain_model_with_shap(model, X, sample_size=None, chunk_size=150, n_workers=1)
+    assert list(tmp_path.iterdir()) == []
+
+def test_scaled_linear_model_is_additive_in_training_space(regression_df):
+    X = regression_df.drop(columns="target").astype(np.float32)
+    scaler = StandardScaler().fit(X.to_numpy())
+    model = LinearRegression().fit(scaler.transform(X.to_numpy()), regression_df["target"])
+    shap_data = explain_model_with_shap(model, X, sample_size=100, scaler=scaler)
+    explanation = shap_data["shap_values"]
+    sample = shap_data["data_sample"]
+    pred = model.predict(scaler.transform(sample.to_numpy()))
+    np.testing.assert_allclose(explanation.values.sum(axis=1) + explanation.base_values, pred, atol=1e-3)
+    np.testing.assert_array_equal(explanation.data, sample.to_numpy())  # plots show raw values
+
+
+def test_adaptive_converges_on_the_top_features(forest, monkeypatch):
+    model, X = forest
+    monkeypatch.setattr(shap_engine, "STRATA_SAMPLE_ROWS", 300)
+    predicted = []
+    predict = model.predict
+    monkeypatch.setattr(model, "predict", lambda A: predicted.append(len(A)) or predict(A))
+    result = explain_adaptive(model, X, tolerance=0.2, batch_size=60, time_budget=60)
+    convergence = result["convergence"]
+    assert predicted == [300]  # strata come from the sample only
+    assert convergence["stop_reason"] == "converged"
+    assert convergence["rows"] <= 300
+    assert list(convergence["importance"]["feature"][:2]) == ["f0", "f1"]
@@ -0,0 +1,59 @@
+# tests/test_stage_graph.py
+import threading
+import time
+
+import pytest
+
+from utils.stage_graph import StageFailed, StageGraph
+
+
+def _collect(graph):
+    return {name: (result, error) for name, result, error in graph.run()}
+
+
+def test_stages_receive_their_inputs():
+    graph = (StageGraph()
+             .add("load", lambda r: 2)
+             .add("square", lambda r: r["load"] ** 2, requires=["load"])
+             .add("report", lambda r: (r["square"], r.get("optional")), requires=["square"]))
+    assert _collect(graph) == {"load": (2, None), "square": (4, None), "report": ((4, None), None)}
+
+
+def test_failure_skips_hard_dependents_only():
+    def boom(r):
+        raise RuntimeError("no data")
+
+    graph = (StageGraph()
+             .add("load", boom)
+             .add("train", lambda r: 1, requires=["load"])
+             .add("summary", lambda r: "load" in r, after=["load"]))
+    out = _collect(graph)
+    assert isinstance(out["load"][1], RuntimeError)
+    assert isinstance(out["train"][1], StageFailed) and "'load' failed" in str(out["train"][1])
+    assert out["summary"] == (False, None)
+
+
+def test_unknown_dependency_is_rejected():
+    with pytest.raises(ValueError, match="unknown stage 'missing'"):
+        StageGraph().add("train", lambda r: 1, requires=["missing"])
+
+
+def test_exclusive_stages_never_overlap():
+    active, peak, lock = [0], [0], threading.Lock()
+
+    def heavy(r):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return True
+
+    graph = StageGraph(max_workers=4)
+    for name in ("training", "shap", "fix_impact"):
+        graph.add(name, heavy, exclusive=True)
+    graph.add("light", lambda r: time.sleep(0.05) or True)
+    out = _collect(graph)
+    assert all(result for result, _ in out.values())
+    assert peak[0] == 1
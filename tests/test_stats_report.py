@@ -0,0 +1,87 @@
+# tests/test_stats_report.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from profiler.stats_report import ProfileAccumulator, analyze_dataset, analyze_dataset_file, analyze_dataset_incremental
+
+
+def _assert_profiles_match(streamed, in_memory):
+    for key in ("rows", "columns", "task_type", "class_distribution", "target_cardinality", "missing_data"):
+        assert streamed[key] == in_memory[key], key
+    assert streamed["imbalance_ratio"] == pytest.approx(in_memory["imbalance_ratio"])
+    assert streamed["missing_percentage"] == pytest.approx(in_memory["missing_percentage"])
+    assert streamed["numeric_skew"].keys() == in_memory["numeric_skew"].keys()
+    for col, value in in_memory["numeric_skew"].items():
+        assert streamed["numeric_skew"][col] == pytest.approx(value, rel=1e-9, nan_ok=True), col
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".parquet"])
+def test_streamed_profile_matches_pandas(classification_df, tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    df = classification_df.assign(label=np.where(classification_df["f0"] > 0, "x", "y"))
+    path = tmp_path / f"data{suffix}"
+    df.to_csv(path, index=False) if suffix == ".csv" else df.to_parquet(path, row_group_size=64)
+    _assert_profiles_match(analyze_dataset_file(str(path), "target", chunksize=70), analyze_dataset(df, "target"))
+
+
+def test_merged_chunks_match_pandas(classification_df):
+    df = classification_df.assign(label=np.where(classification_df["f0"] > 0, "x", "y"))
+    parts = [ProfileAccumulator("target").update(df.iloc[lo:lo + 70]) for lo in range(0, len(df), 70)]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    _assert_profiles_match(merged.result(), analyze_dataset(df, "target"))
+
+
+def test_save_load_round_trip(classification_df, tmp_path):
+    acc = ProfileAccumulator("target").update(classification_df)
+    acc.save(tmp_path / "state.json")
+    _assert_profiles_match(ProfileAccumulator.load(tmp_path / "state.json").result(), acc.result())
+
+
+def test_incremental_profile_of_appended_rows(classification_df, tmp_path):
+    path, state = tmp_path / "data.csv", tmp_path / "state.json"
+    classification_df.iloc[:250].to_csv(path, index=False)
+    analyze_dataset_incremental(str(path), "target", str(state), chunksize=64)
+    classification_df.iloc[250:].to_csv(path, mode="a", header=False, index=False)
+    profile = analyze_dataset_incremental(str(path), "target", str(state), chunksize=64)
+    _assert_profiles_match(profile, analyze_dataset(pd.read_csv(path), "target"))
+
+
+def test_appended_csv_rows_are_read_from_the_saved_offset(classification_df, tmp_path):
+    path, state = tmp_path / "data.csv", tmp_path / "state.json"
+    classification_df.iloc[:250].to_csv(path, index=False)
+    analyze_dataset_incremental(str(path), "target", str(state))
+
+    # An unbalanced quote in the history would swallow every later row if it were re-tokenized
+    lines = path.read_bytes().split(b"\n")
+    lines[5] = b'"' + lines[5][1:]
+    path.write_bytes(b"\n".join(lines))
+    with open(path, "a") as f:
+        classification_df.iloc[250:].to_csv(f, header=False, index=False)
+        f.write("0.5,0.5,0.5")  # a row still being written
+    profile = analyze_dataset_incremental(str(path), "target", str(state))
+    assert profile["rows"] == 400
+
+    with open(path, "a") as f:
+        f.write(",0.5,1\n")
+    assert analyze_dataset_incremental(str(path), "target", str(state))["rows"] == 401
+
+
+def test_many_target_labels_are_sketched_not_counted(tmp_path):
+    df = pd.DataFrame({"x": np.arange(5000.0), "target": [f"id-{i}" for i in range(5000)]})
+    halves = [ProfileAccumulator("target") for _ in range(2)]
+    for acc, part in zip(halves, (df.iloc[:3000], df.iloc[3000:])):
+        for start in range(0, len(part), 500):
+            acc.update(part.iloc[start:start + 500])
+    assert not halves[0].track_classes and halves[0].class_counts == {}
+
+    halves[0].save(tmp_path / "state.json")
+    merged = ProfileAccumulator.load(tmp_path / "state.json").merge(halves[1])
+    profile = merged.result()
+    assert profile["task_type"] == analyze_dataset(df, "target")["task_type"]
+    assert profile["class_distribution"] is None and profile["imbalance_ratio"] is None
+    assert profile["target_cardinality"] == pytest.approx(5000, rel=0.05)
+    assert len((tmp_path / "state.json").read_text()) < 20_000
@@ -0,0 +1,60 @@
+# tests/test_tracing.py
+import threading
+
+from utils import tracing
+from utils.tracing import Tracer, get_tracer, span, traced, use_tracer
+
+
+def test_spans_nest_and_record_shape():
+    tracer = Tracer()
+
+    @traced("outer")
+    def work(data):
+        with span("inner", rows=3):
+            return len(data)
+
+    with use_tracer(tracer):
+        work([[1, 2]] * 5)
+    inner, outer = tracer.spans
+    assert (outer.name, outer.depth, inner.parent) == ("outer", 0, outer)
+    assert inner.attrs["rows"] == 3
+    assert "peak_rss_mb" in outer.attrs
+    assert [s["span"] for s in tracer.summary()] == ["outer", "inner"]
+    assert len(tracer.to_chrome_trace()["traceEvents"]) == 2
+
+
+def test_errors_are_recorded_on_the_span():
+    tracer = Tracer(sample_memory=False)
+    with use_tracer(tracer):
+        try:
+            with span("failing"):
+                raise KeyError("x")
+        except KeyError:
+            pass
+    assert tracer.spans[0].attrs["error"] == "KeyError: 'x'"
+
+
+def test_default_tracer_is_bounded():
+    for _ in range(tracing.DEFAULT_TRACER_SPANS + 10):
+        with span("noop"):
+            pass
+    assert len(get_tracer().spans) == tracing.DEFAULT_TRACER_SPANS
+
+
+def test_one_sampler_thread_for_concurrent_spans():
+    tracer, barrier = Tracer(), threading.Barrier(4)
+    samplers = []
+
+    def work():
+        with use_tracer(tracer), span("work"):
+            barrier.wait()
+            samplers.append(sum(t.name == "explainml-rss" for t in threading.enumerate()))
+            barrier.wait()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert samplers == [1] * 4
+    assert len(tracer.spans) == 4
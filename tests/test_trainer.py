@@ -0,0 +1,40 @@
+# tests/test_trainer.py
+import numpy as np
+import pytest
+from sklearn.metrics import f1_score
+
+from models.trainer import evaluate_models
+from utils.ingest import build_feature_matrix
+
+
+def test_classification_keeps_out_of_fold_predictions(classification_df):
+    X, y = build_feature_matrix(classification_df, "target")
+    results, best = evaluate_models(X, y, cv=3, n_workers=1)
+    top = results.iloc[0]
+    assert top["model_obj"] is best and results["task_type"].eq("classification").all()
+    assert top["oof_pred"].shape == (len(y),)
+    # Per-fold F1 averages to about the pooled out-of-fold F1
+    assert f1_score(y, top["oof_pred"], average="macro") == pytest.approx(top["score_mean"], abs=0.05)
+    np.testing.assert_allclose(top["oof_proba"].sum(axis=1), 1, rtol=1e-5)
+
+
+def test_linear_regressor_is_scaled(regression_df):
+    X, y = build_feature_matrix(regression_df, "target")
+    results, best = evaluate_models(X, y, cv=3, n_workers=1, candidates=["LinearRegression"])
+    assert results.attrs["scaler"] is not None
+    pred = best.predict(results.attrs["scaler"].transform(X.to_numpy()))
+    assert np.corrcoef(pred, y)[0, 1] > 0.99
+
+
+def test_race_reports_its_rounds(classification_df):
+    X, y = build_feature_matrix(classification_df, "target")
+    results, _ = evaluate_models(X, y, cv=3, n_workers=1, strategy="race", race_min_rows=100)
+    assert results.attrs["race"]
+    assert results.iloc[0]["rows_evaluated"] == len(y)
+
+
+@pytest.mark.parametrize("growth, drop", [(1, 0.5), (0.5, 0.5), (3, 1.0), (3, -0.1)])
+def test_race_rejects_parameters_that_never_finish(classification_df, growth, drop):
+    X, y = build_feature_matrix(classification_df, "target")
+    with pytest.raises(ValueError, match="race_growth"):
+        evaluate_models(X, y, strategy="race", race_growth=growth, race_drop_fraction=drop)
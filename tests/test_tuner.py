@@ -0,0 +1,50 @@
+# tests/test_tuner.py
+import optuna
+import pytest
+from sklearn.linear_model import LogisticRegression, Ridge
+from sklearn.ensemble import RandomForestRegressor
+
+import models.tuner as tuner
+from models.tuner import tune_model
+from utils.ingest import build_feature_matrix
+
+optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+
+class PruneEverything(optuna.pruners.BasePruner):
+    def prune(self, study, trial):
+        return True
+
+
+def test_tune_returns_params_from_the_search_space(classification_df):
+    X, y = build_feature_matrix(classification_df, "target")
+    params = tune_model(LogisticRegression, X, y, n_trials=4, cv=3)
+    assert set(params) == {"C"} and 1e-3 <= params["C"] <= 1e2
+
+
+def test_study_resumes_from_its_journal(regression_df, tmp_path):
+    X, y = build_feature_matrix(regression_df, "target")
+    storage = str(tmp_path / "study.log")
+    kwargs = dict(cv=3, storage_path=storage, study_name="resume", budget="n_estimators")
+    tune_model(RandomForestRegressor, X, y, n_trials=2, **kwargs)
+    tune_model(RandomForestRegressor, X, y, n_trials=4, n_workers=2, **kwargs)
+    study = optuna.load_study(study_name="resume",
+                              storage=optuna.storages.JournalStorage(optuna.storages.JournalFileStorage(storage)))
+    assert len(study.trials) == 4
+
+
+def test_row_budget_tunes_on_growing_subsets(classification_df):
+    X, y = build_feature_matrix(classification_df, "target")
+    params = tune_model(LogisticRegression, X, y, n_trials=3, cv=3, budget="rows", budget_levels=(0.5, 1.0))
+    assert set(params) == {"C"}
+
+
+def test_all_pruned_returns_defaults_and_removes_the_journal(classification_df, tmp_path, monkeypatch):
+    X, y = build_feature_matrix(classification_df, "target")
+    monkeypatch.setattr(tuner.tempfile, "tempdir", str(tmp_path))
+    assert tune_model(LogisticRegression, X, y, n_trials=3, cv=3, pruner=PruneEverything()) == {}
+    assert list(tmp_path.iterdir()) == []
+
+    with pytest.raises(ValueError, match="No search space"):
+        tune_model(Ridge, X, y, n_trials=2, cv=3)
+    assert list(tmp_path.iterdir()) == []
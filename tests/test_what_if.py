@@ -0,0 +1,55 @@
+# tests/test_what_if.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender.what_if import evaluate_fixes, rank_suggestions
+
+
+@pytest.fixture
+def leaky_df():
+    rng = np.random.default_rng(0)
+    n = 600
+    signal = rng.normal(size=n)
+    y = (signal + 0.8 * rng.normal(size=n) > 0).astype(int)
+    return pd.DataFrame({
+        "signal": signal,
+        "noise": rng.normal(size=n),
+        "leak": y + 0.01 * rng.normal(size=n),
+        "target": y,
+    })
+
+
+SUGGESTIONS = [
+    {"type": "removal", "feature": "noise", "suggestion": "Drop noise", "priority": "low"},
+    {"type": "leakage", "feature": "leak", "suggestion": "Drop leak", "priority": "critical"},
+    {"type": "error", "feature": "signal", "suggestion": "Inspect slice", "priority": "high"},
+]
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_fixes_are_scored_against_the_same_folds(leaky_df, n_workers):
+    impact = evaluate_fixes(leaky_df, "target", SUGGESTIONS, cv=3, repeats=1, n_workers=n_workers,
+                            time_budget=120)
+    assert impact.attrs["metric"] == "f1_macro"
+    assert list(impact.index) == [1, 0, 2]  # leakage first, unscorable last
+    leak, noise, manual = impact.loc[1], impact.loc[0], impact.loc[2]
+    assert leak["folds"] == 3 and leak["score_change"] < -0.05
+    assert leak["ci_low"] <= leak["score_change"] <= leak["ci_high"]
+    assert noise["status"] == "ok" and abs(noise["score_change"]) < 0.1
+    assert manual["status"] == "no automatic fix"
+
+    ranked = rank_suggestions(SUGGESTIONS, impact)
+    assert [s["type"] for s in ranked] == ["leakage", "removal", "error"]
+
+
+def test_regression_targets_use_r2(regression_df):
+    suggestions = [{"type": "removal", "feature": "a", "suggestion": "Drop a", "priority": "low"}]
+    impact = evaluate_fixes(regression_df, "target", suggestions, cv=3, repeats=1, n_workers=1)
+    assert impact.attrs["metric"] == "r2"
+    assert impact.loc[0, "score_change"] < 0  # "a" carries most of the signal
+
+
+def test_exhausted_budget_is_reported_not_raised(leaky_df):
+    impact = evaluate_fixes(leaky_df, "target", SUGGESTIONS[:1], n_workers=2, time_budget=0)
+    assert impact.loc[0, "status"] == "time budget exhausted"
@@ -0,0 +1,183 @@
+# utils/artifacts.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import joblib
+import numpy as np
+
+from utils.cache import atomic_write, hash_bytes, library_versions
+
+ARTIFACT_DIR = ".explainml_artifacts"
+INDEX_FILE = "index.json"
+RUN_FILE = "run.json"
+LOCK_STALE_SECONDS = 30  # an index lock this old was left by a crashed process
+
+
+class ArtifactRun:
+    """
+    One versioned run directory. put() writes plain arrays as .npy and anything else
+    (fitted models, frames, dicts) with joblib, whose numpy buffers stay memory-mappable.
+    get() loads lazily and read-only memory-mapped, so opening a run costs one JSON read
+    and workers can map the same file (see file()) instead of receiving a pickled copy.
+    """
+
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self._loaded = {}
+        self._lock = threading.Lock()  # app stages on worker threads put into the same run
+
+    @property
+    def version(self):
+        return self.meta["version"]
+
+    def __contains__(self, name):
+        return name in self.meta["artifacts"]
+
+    def names(self):
+        return list(self.meta["artifacts"])
+
+    def file(self, name):
+        return os.path.join(self.path, self.meta["artifacts"][name]["file"])
+
+    def put(self, name, value):
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            filename = f"{name}.npy"
+            atomic_write(os.path.join(self.path, filename), lambda f: np.save(f, value))
+        else:
+            filename = f"{name}.joblib"
+            atomic_write(os.path.join(self.path, filename), lambda f: joblib.dump(value, f))
+        with self._lock:
+            self.meta["artifacts"][name] = {
+                "file": filename,
+                "bytes": os.path.getsize(os.path.join(self.path, filename)),
+                "created": time.time(),
+            }
+            self._loaded.pop(name, None)
+            self._write_meta()
+
+    def get(self, name, default=None):
+        if name not in self:
+            return default
+        if name not in self._loaded:
+            path = self.file(name)
+            if path.endswith(".npy"):
+                self._loaded[name] = np.load(path, mmap_mode="r")
+            else:
+                self._loaded[name] = joblib.load(path, mmap_mode="r")
+        return self._loaded[name]
+
+    def _write_meta(self):
+        payload = json.dumps(self.meta, indent=2, default=str).encode()
+        atomic_write(os.path.join(self.path, RUN_FILE), lambda f: f.write(payload))
+
+
+class ArtifactStore:
+    """
+    Local store of past runs, indexed by dataset content hash and target. Every run is a
+    new version; only committed versions are returned by open(), and versions written
+    with other library versions (pickled models may not load) are skipped.
+    """
+
+    def __init__(self, root=ARTIFACT_DIR):
+        self.root = root
+        self.versions = library_versions()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(dataset_hash, target):
+        return f"{dataset_hash[:16]}-{hash_bytes(str(target).encode())[:8]}"
+
+    def _index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_index(self, index):
+        payload = json.dumps(index, indent=2, default=str).encode()
+        atomic_write(os.path.join(self.root, INDEX_FILE), lambda f: f.write(payload))
+
+    @contextmanager
+    def _index_lock(self):
+        """Hold an exclusively created lock file so one process at a time rewrites the index."""
+        path = os.path.join(self.root, f"{INDEX_FILE}.lock")
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                        os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue  # released between the two calls
+                time.sleep(0.01)
+        try:
+            yield
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+    def begin(self, dataset_hash, target) -> ArtifactRun:
+        """
+        Start a new (uncommitted) version for this dataset/target. The version is
+        reserved by creating its directory, so concurrent runs never share one;
+        directories left by interrupted attempts are skipped, not reused.
+        """
+        key = self.key(dataset_hash, target)
+        entry = self._index().get(key, {})
+        os.makedirs(os.path.join(self.root, key), exist_ok=True)
+        existing = [int(name[1:]) for name in os.listdir(os.path.join(self.root, key))
+                    if name.startswith("v") and name[1:].isdigit()]
+        version = max([v["version"] for v in entry.get("versions", [])] + existing + [0]) + 1
+        while True:
+            path = os.path.join(self.root, key, f"v{version}")
+            try:
+                os.makedirs(path, exist_ok=False)
+                break
+            except FileExistsError:
+                version += 1  # taken by a concurrent run since listdir()
+        run = ArtifactRun(path, {
+            "key": key, "dataset_hash": dataset_hash, "target": target, "version": version,
+            "libraries": self.versions, "created": time.time(), "artifacts": {},
+        })
+        run._write_meta()
+        return run
+
+    def commit(self, run: ArtifactRun):
+        # Read-modify-write under the lock, or concurrent commits could drop each other's version
+        with self._index_lock():
+            index = self._index()
+            entry = index.setdefault(run.meta["key"], {
+                "dataset_hash": run.meta["dataset_hash"], "target": run.meta["target"], "versions": []
+            })
+            entry["versions"].append({
+                "version": run.version, "created": run.meta["created"], "libraries": run.meta["libraries"],
+            })
+            self._write_index(index)
+
+    def runs(self, dataset_hash, target):
+        """Committed versions for this dataset/target, newest first."""
+        entry = self._index().get(self.key(dataset_hash, target), {})
+        return sorted(entry.get("versions", []), key=lambda v: v["version"], reverse=True)
+
+    def open(self, dataset_hash, target, version=None):
+        """The requested (default: newest compatible) committed run, or None."""
+        for v in self.runs(dataset_hash, target):
+            if version is not None and v["version"] != version:
+                continue
+            if version is None and v["libraries"] != self.versions:
+                continue
+            path = os.path.join(self.root, self.key(dataset_hash, target), f"v{v['version']}")
+            try:
+                with open(os.path.join(path, RUN_FILE)) as f:
+                    return ArtifactRun(path, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Ignoring unreadable run {path}: {e}")
+        return None
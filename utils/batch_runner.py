@@ -0,0 +1,207 @@
+# utils/batch_runner.py
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from models.scheduler import default_worker_budget
+from utils.cache import atomic_write, hash_bytes, hash_file
+from utils.tracing import span
+
+INDEX_FILE = "index.json"
+
+
+def load_manifest(path) -> list:
+    """
+    Dataset/target pairs from a CSV (columns dataset,target[,name]) or a JSON list of
+    {"dataset", "target"[, "name"]} objects. Relative paths resolve against the manifest.
+    """
+    if path.lower().endswith(".json"):
+        with open(path) as f:
+            entries = json.load(f)
+    else:
+        entries = pd.read_csv(path, dtype=str).to_dict("records")
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for entry in entries:
+        if not entry.get("dataset") or not entry.get("target"):
+            raise ValueError(f"Manifest entry needs 'dataset' and 'target': {entry}")
+        dataset = entry["dataset"] if os.path.isabs(entry["dataset"]) else os.path.join(base, entry["dataset"])
+        name = entry.get("name") if isinstance(entry.get("name"), str) else None
+        jobs.append({
+            "dataset": dataset,
+            "target": entry["target"],
+            "name": name or os.path.splitext(os.path.basename(dataset))[0],
+        })
+    return jobs
+
+
+class Checkpoint:
+    """One pickle per finished stage in a run directory keyed by dataset content and target."""
+
+    def __init__(self, state_dir, name, data_hash, target):
+        self.path = os.path.join(state_dir, f"{name}-{data_hash[:12]}-{hash_bytes(target.encode())[:8]}")
+        os.makedirs(self.path, exist_ok=True)
+
+    def _file(self, stage):
+        return os.path.join(self.path, f"{stage}.pkl")
+
+    def run(self, stage, compute):
+        """Load the stage's checkpoint if an earlier (possibly interrupted) run wrote it."""
+        path = self._file(stage)
+        with span(stage) as stage_span:
+            if os.path.exists(path):
+                try:
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                    stage_span.set(resumed=True)
+                    return value
+                except Exception as e:
+                    print(f"⚠️ Ignoring unreadable checkpoint {path}: {e}")
+            stage_span.set(resumed=False)
+            value = compute()
+            atomic_write(path, lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+            return value
+
+
+def run_dataset(job, state_dir, data_hash, n_workers=1, chunksize=100_000):
+    """Profile, train and diagnose one dataset, checkpointing after each stage."""
+    from profiler.stats_report import analyze_dataset_file
+    from profiler.leakage_detector import CorrelationEngine, detect_target_leakage, detect_high_correlation
+    from models.trainer import evaluate_models
+    from recommender.fix_generator import generate_suggestions
+    from utils.catalog import ColumnCatalog
+    from utils.ingest import load_dataset, build_feature_matrix
+
+    started = time.perf_counter()
+    path, target = job["dataset"], job["target"]
+    checkpoint = Checkpoint(state_dir, job["name"], data_hash, target)
+
+    profile = checkpoint.run("profile", lambda: analyze_dataset_file(path, target, chunksize=chunksize))
+
+    data = {}
+
+    def features():
+        if not data:
+            df = load_dataset(path)
+            data["catalog"] = ColumnCatalog.build(df)
+            data["X"], data["y"] = build_feature_matrix(df, target, catalog=data["catalog"])
+        return data["X"], data["y"]
+
+    def train():
+        X, y = features()
+        results_df, _ = evaluate_models(X, y, n_workers=n_workers, catalog=data["catalog"])
+        return results_df.drop(columns=["model_obj", "oof_pred", "oof_proba"])
+
+    results_df = checkpoint.run("training", train)
+
+    def diagnose():
+        X, y = features()
+        engine = CorrelationEngine(X, catalog=data["catalog"])
+        leaks = detect_target_leakage(X, y, engine=engine)
+        corrs = detect_high_correlation(X, engine=engine)
+        return generate_suggestions({
+            "target": target,
+            "issues": {
+                "imbalance_ratio": profile.get("imbalance_ratio"),
+                "missing_percentage": profile["missing_percentage"],
+                "numeric_skew": profile["numeric_skew"],
+                "target_leakage": leaks,
+                "high_correlation": corrs,
+            },
+        })
+
+    suggestions = checkpoint.run("diagnostics", diagnose)
+
+    best = results_df.iloc[0]
+    priorities = [s["priority"] for s in suggestions]
+    return {
+        "name": job["name"],
+        "dataset": path,
+        "target": target,
+        "status": "done",
+        "rows": profile["rows"],
+        "columns": profile["columns"],
+        "task_type": best["task_type"],
+        "best_model": best["model"],
+        "metric": "R²" if best["task_type"] == "regression" else "F1",
+        "score": float(best["score_mean"]),
+        "suggestions": len(suggestions),
+        "critical": priorities.count("critical"),
+        "high": priorities.count("high"),
+        "top_suggestions": [s["suggestion"] for s in suggestions[:3]],
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def run_batch(manifest_path, state_dir=".explainml_runs", workers=None, force=False, chunksize=100_000):
+    """
+    Run every manifest entry on a pool of `workers` processes (each training with its
+    share of the cores). Datasets whose content hash and target match a finished run
+    in the index are skipped; unfinished ones resume from their last checkpoint.
+    Returns one summary dict per manifest entry, in manifest order.
+    """
+    jobs = load_manifest(manifest_path)
+    os.makedirs(state_dir, exist_ok=True)
+    index_path = os.path.join(state_dir, INDEX_FILE)
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    workers = max(1, min(workers or default_worker_budget(), len(jobs) or 1))
+    threads_per_job = max(1, default_worker_budget() // workers)
+
+    summaries, pending = [None] * len(jobs), []
+    for i, job in enumerate(jobs):
+        try:
+            data_hash = hash_file(job["dataset"])
+        except OSError as e:
+            summaries[i] = {**job, "status": "failed", "error": str(e)}
+            continue
+        previous = index.get(f"{job['dataset']}::{job['target']}")
+        if (not force and previous and previous["hash"] == data_hash
+                and previous["target"] == job["target"] and previous["summary"].get("status") == "done"):
+            summaries[i] = {**previous["summary"], "status": "skipped"}
+            print(f"⏭️ {job['name']}: unchanged since last run")
+            continue
+        pending.append((i, job, data_hash))
+
+    def record(i, job, data_hash, summary):
+        summaries[i] = summary
+        if summary["status"] == "done":
+            index[f"{job['dataset']}::{job['target']}"] = {"hash": data_hash, "target": job["target"], "summary": summary}
+            atomic_write(index_path, lambda f: f.write(json.dumps(index, indent=2, default=str).encode()))
+            print(f"✅ {job['name']}: {summary['best_model']} ({summary['metric']} = {summary['score']:.3f})")
+        else:
+            print(f"❌ {job['name']}: {summary['error']}")
+
+    def failure(job, e):
+        return {**job, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+    if workers == 1:
+        for i, job, data_hash in pending:
+            try:
+                summary = run_dataset(job, state_dir, data_hash, threads_per_job, chunksize)
+            except Exception as e:
+                summary = failure(job, e)
+            record(i, job, data_hash, summary)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(run_dataset, job, state_dir, data_hash, threads_per_job, chunksize): (i, job, data_hash)
+                for i, job, data_hash in pending
+            }
+            for future in as_completed(futures):
+                i, job, data_hash = futures[future]
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    summary = failure(job, e)
+                record(i, job, data_hash, summary)
+
+    return summaries
@@ -0,0 +1,156 @@
+# utils/cache.py
+import hashlib
+import os
+import pickle
+import tempfile
+from importlib import metadata
+
+from utils.logger import logger
+from utils.tracing import span
+
+CACHE_LIBRARIES = ("pandas", "numpy", "scikit-learn", "xgboost", "shap")
+
+
+def hash_bytes(data: bytes) -> str:
+    """Fast content hash for dataset bytes."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def hash_file(path, block_size=1 << 20) -> str:
+    """hash_bytes() of a file's content, streamed so large tables are never read whole."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def atomic_write(path, write):
+    """Call write(f) on a temp file next to `path`, then swap it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def library_versions():
+    versions = {}
+    for lib in CACHE_LIBRARIES:
+        try:
+            versions[lib] = metadata.version(lib)
+        except metadata.PackageNotFoundError:
+            versions[lib] = None
+    return versions
+
+
+def _remove_if_present(path):
+    """os.remove() that tolerates another process having removed the file first."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class StageCache:
+    """
+    Content-addressed, disk-backed cache for pipeline stage outputs.
+    Entries are pickles named by a hash of (stage, inputs, library versions);
+    the least recently used entries are evicted once the directory exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=".explainml_cache", max_bytes=None):
+        self.cache_dir = cache_dir
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("EXPLAINML_CACHE_MB", 1024)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.versions = library_versions()
+        self.hits = {}
+        self.misses = {}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, stage: str, *parts) -> str:
+        payload = repr((stage, parts, sorted(self.versions.items()))).encode("utf-8")
+        return f"{stage}-{hash_bytes(payload)}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get_or_compute(self, stage: str, key_parts: tuple, compute):
+        """Return the cached output for this stage/input combination, computing it on a miss."""
+        key = self.key(stage, *key_parts)
+        path = self._path(key)
+        with span(stage) as stage_span:
+            if os.path.exists(path):
+                try:
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                    try:
+                        os.utime(path)  # mark as recently used
+                    except FileNotFoundError:
+                        pass
+                    self.hits[stage] = self.hits.get(stage, 0) + 1
+                    stage_span.set(cached=True)
+                    return value
+                except FileNotFoundError:
+                    pass  # evicted by another session sharing the directory
+                except Exception as e:
+                    logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                    _remove_if_present(path)
+
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            stage_span.set(cached=False)
+            value = compute()
+            self._store(path, value)
+            return value
+
+    def _store(self, path: str, value):
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not cache {os.path.basename(path)}: {e}")
+            if tmp_path:
+                _remove_if_present(tmp_path)
+            return
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue  # removed by another session since listdir()
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            _remove_if_present(path)
+            total -= size
+
+    def stats(self):
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "by_stage": {s: {"hits": self.hits.get(s, 0), "misses": self.misses.get(s, 0)}
+                         for s in sorted(set(self.hits) | set(self.misses))},
+            "size_mb": round(self.size_bytes() / (1024 * 1024), 2),
+        }
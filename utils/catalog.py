@@ -0,0 +1,135 @@
+# utils/catalog.py
+import numpy as np
+import pandas as pd
+
+# Above this many rows, non-categorical cardinalities are HyperLogLog estimates
+EXACT_CARDINALITY_ROWS = 200_000
+HLL_PRECISION = 14          # 2^14 registers, ~0.8% standard error
+BINCOUNT_MAX_RANGE = 1 << 20
+
+
+def _role(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype):
+        return "boolean"
+    if pd.api.types.is_numeric_dtype(dtype):
+        return "numeric"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "datetime"
+    if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return "categorical"
+    return "other"
+
+
+def hll_registers(hashes: np.ndarray, precision=HLL_PRECISION) -> np.ndarray:
+    """HyperLogLog registers of 64-bit hashes; sketches of two sets merge with np.maximum."""
+    m = 1 << precision
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # rank = leading zeros in the remaining bits + 1
+    width = 64 - precision
+    with np.errstate(divide="ignore"):
+        top_bit = np.where(rest > 0, np.floor(np.log2(rest.astype(np.float64))), -1)
+    rank = (width - top_bit).astype(np.uint8)
+    registers = np.zeros(m, dtype=np.uint8)
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def hll_estimate(registers: np.ndarray) -> int:
+    """Distinct-count estimate from HyperLogLog registers."""
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.exp2(-registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)  # linear counting for small sets
+    return int(round(estimate))
+
+
+def hll_cardinality(hashes: np.ndarray, precision=HLL_PRECISION) -> int:
+    """HyperLogLog distinct-count estimate from 64-bit hashes (e.g. pd.util.hash_array)."""
+    return hll_estimate(hll_registers(hashes, precision))
+
+
+def _cardinality(s: pd.Series, lo, hi, exact_threshold):
+    """(distinct non-null values, exact?) using the cheapest exact method available."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes = s.cat.codes.to_numpy()
+        return int(np.count_nonzero(np.bincount(codes[codes >= 0], minlength=1))), True
+    if pd.api.types.is_bool_dtype(s.dtype):
+        values = s.dropna().to_numpy(dtype=bool)
+        return int(values.any()) + int(not values.all()) if len(values) else 0, True
+    if pd.api.types.is_integer_dtype(s.dtype) and lo is not None and pd.notna(lo) and hi - lo < BINCOUNT_MAX_RANGE:
+        values = s.dropna().to_numpy(dtype=np.int64)
+        return int(np.count_nonzero(np.bincount(values - int(lo)))), True
+    if len(s) <= exact_threshold:
+        return int(s.nunique()), True
+    values = s.dropna()
+    if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object:
+        values = values.astype(str)
+    return hll_cardinality(pd.util.hash_array(values.to_numpy())), False
+
+
+class ColumnCatalog:
+    """
+    Per-column metadata for one DataFrame, computed once: dtype, role
+    (numeric/categorical/boolean/datetime/other), null count, min/max for numeric
+    columns and cardinality (exact, or a HyperLogLog estimate on tall tables).
+    Stages take it as `catalog=` instead of re-deriving the same stats per column.
+    """
+
+    def __init__(self, table: pd.DataFrame, rows: int):
+        self.table = table
+        self.rows = rows
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, exact_threshold=EXACT_CARDINALITY_ROWS):
+        roles = {col: _role(dtype) for col, dtype in df.dtypes.items()}
+        nulls = df.isna().sum()
+        numeric = [col for col, role in roles.items() if role == "numeric"]
+        mins = df[numeric].min() if numeric else pd.Series(dtype=float)
+        maxs = df[numeric].max() if numeric else pd.Series(dtype=float)
+
+        records = []
+        for col in df.columns:
+            lo, hi = mins.get(col), maxs.get(col)
+            cardinality, exact = _cardinality(df[col], lo, hi, exact_threshold)
+            records.append({
+                "column": col,
+                "dtype": str(df[col].dtype),
+                "role": roles[col],
+                "null_count": int(nulls[col]),
+                "cardinality": cardinality,
+                "cardinality_exact": exact,
+                "min": lo,
+                "max": hi,
+            })
+        table = pd.DataFrame.from_records(records, columns=[
+            "column", "dtype", "role", "null_count", "cardinality", "cardinality_exact", "min", "max"
+        ]).set_index("column")
+        return cls(table, len(df))
+
+    def __contains__(self, col):
+        return col in self.table.index
+
+    def columns(self, *roles, exclude=()):
+        """Column names with one of `roles` (all columns if none given), in frame order."""
+        mask = self.table["role"].isin(roles) if roles else np.ones(len(self.table), dtype=bool)
+        return [col for col in self.table.index[mask] if col not in exclude]
+
+    def nunique(self, col) -> int:
+        return int(self.table.at[col, "cardinality"])
+
+    def exact_nunique(self, df: pd.DataFrame, col) -> int:
+        """Exact distinct count, computing (and remembering) it if only an estimate is stored."""
+        if not self.table.at[col, "cardinality_exact"]:
+            self.table.at[col, "cardinality"] = int(df[col].nunique())
+            self.table.at[col, "cardinality_exact"] = True
+        return self.nunique(col)
+
+    def null_counts(self) -> dict:
+        return self.table["null_count"].to_dict()
+
+    def dtypes(self) -> dict:
+        return self.table["dtype"].to_dict()
@@ -1,14 +1,18 @@
 # utils/helpers.py
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
 
 # utils/helpers.py
-def detect_task_type(y: pd.Series) -> str:
+def detect_task_type(y: pd.Series, n_unique: int = None) -> str:
+    """`n_unique` (e.g. from a ColumnCatalog) saves the distinct count pass."""
+    return task_type_from_stats(y.dtype, y.nunique() if n_unique is None else n_unique)
+
+def task_type_from_stats(dtype, n_unique: int) -> str:
+    """Same rule as detect_task_type, from a dtype and distinct count alone."""
     # If numeric, treat as regression
-    if y.dtype in ['int64', 'float64'] and y.nunique() > 20:
+    if dtype in ['int64', 'float64'] and n_unique > 20:
         return 'regression'
     # If categorical or low unique count
-    if y.dtype == 'object' or y.nunique() <= 20:
+    if dtype == 'object' or dtype == 'category' or n_unique <= 20:
         return 'classification'
     return 'regression'
 
@@ -26,7 +30,8 @@ def safe_drop_target(df: pd.DataFrame, target: str):
     y = df[target].copy()
 
     # Encode if categorical
-    if y.dtype == 'object':
+    if y.dtype == 'object' or y.dtype == 'category':
+        from sklearn.preprocessing import LabelEncoder
         le = LabelEncoder()
         y = pd.Series(le.fit_transform(y), name=target, index=df.index)
     else:
@@ -0,0 +1,152 @@
+# utils/ingest.py
+import os
+
+import numpy as np
+import pandas as pd
+
+# Strings with at most this share of distinct values become categoricals
+CATEGORY_RATIO = 0.5
+CSV_CHUNKSIZE = 500_000
+FEATURE_MATRIX_FLAG = "explainml_feature_matrix"
+# Largest integer float32 represents exactly; integer columns with NaN beyond it stay float64
+FLOAT32_EXACT_INT = 2**24
+
+
+def _source_name(source):
+    return str(getattr(source, "name", source)).lower()
+
+
+def _smallest_int(lo, hi):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+def _compact_arrow(table, category_ratio=CATEGORY_RATIO):
+    """Downcast columns on the Arrow side, before they ever become 64-bit pandas arrays."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = []
+    for col in table.columns:
+        t = col.type
+        if pa.types.is_floating(t):
+            col = col.cast(pa.float32())
+        elif pa.types.is_integer(t) and len(col) and col.null_count < len(col):
+            bounds = pc.min_max(col)
+            col = col.cast(pa.from_numpy_dtype(_smallest_int(bounds["min"].as_py(), bounds["max"].as_py())))
+        elif (pa.types.is_string(t) or pa.types.is_large_string(t)) and len(col):
+            if pc.count_distinct(col).as_py() <= category_ratio * len(col):
+                col = pc.dictionary_encode(col)
+        columns.append(col)
+    return pa.table(columns, names=table.column_names)
+
+
+def _integers_beyond_float32(s: pd.Series) -> bool:
+    """True for integer-valued floats (e.g. an int column with NaN) too large for float32."""
+    values = s.to_numpy()
+    values = values[np.isfinite(values)]
+    if not values.size or np.abs(values).max() <= FLOAT32_EXACT_INT:
+        return False
+    return bool(np.all(values == np.round(values)))
+
+
+def compact_dtypes(df: pd.DataFrame, category_ratio=CATEGORY_RATIO, categories=True) -> pd.DataFrame:
+    """
+    Downcast floats to float32, ints to the smallest int, low-cardinality strings to category.
+    Integer columns read as float64 because of NaN keep float64 when float32 would round them.
+    """
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_float_dtype(s) and s.dtype != np.float32:
+            if not _integers_beyond_float32(s):
+                df[col] = s.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(s) and not pd.api.types.is_extension_array_dtype(s) and len(s):
+            df[col] = s.astype(_smallest_int(s.min(), s.max()))
+        elif categories and s.dtype == object and len(s):
+            if s.nunique() <= category_ratio * len(s):
+                df[col] = s.astype("category")
+    return df
+
+
+def load_dataset(source, category_ratio=CATEGORY_RATIO) -> pd.DataFrame:
+    """
+    Read a CSV, Parquet or Feather file (path or file-like upload) into compact dtypes.
+    Parquet/Feather paths are memory-mapped and downcast in Arrow; CSV is read in
+    chunks that are downcast as they arrive, so the 64-bit frame never exists whole.
+    Chunks that settle on different dtypes are upcast losslessly by the concat.
+    """
+    name = _source_name(source)
+    is_path = isinstance(source, (str, os.PathLike))
+
+    if name.endswith((".parquet", ".pq")):
+        import pyarrow.parquet as pq
+        table = pq.read_table(source, memory_map=is_path)
+        return _compact_arrow(table, category_ratio).to_pandas(self_destruct=True)
+
+    if name.endswith((".feather", ".arrow", ".ipc")):
+        import pyarrow.feather as feather
+        table = feather.read_table(source, memory_map=is_path)
+        return _compact_arrow(table, category_ratio).to_pandas(self_destruct=True)
+
+    chunks = [compact_dtypes(chunk, categories=False) for chunk in pd.read_csv(source, chunksize=CSV_CHUNKSIZE)]
+    df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+    del chunks
+    # Category conversion after concat so all chunks share one set of categories
+    return compact_dtypes(df, category_ratio)
+
+
+def build_feature_matrix(df: pd.DataFrame, target: str, catalog=None):
+    """
+    Return (X_num, y): every numeric feature packed once into one contiguous float32
+    array (NaN -> 0), wrapped in a DataFrame that shares its memory. Later stages
+    recognize it via numeric_features() and use it without copying. A string target
+    is label-encoded, with the original labels in y.attrs["classes"]. Rows without a
+    target value are dropped (they would otherwise become a "nan" class).
+    """
+    if df[target].isna().any():
+        df = df[df[target].notna()]
+    if catalog is not None:
+        feature_cols = catalog.columns("numeric", exclude=(target,))
+    else:
+        feature_cols = [
+            c for c in df.columns
+            if c != target and pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])
+        ]
+    matrix = np.empty((len(df), len(feature_cols)), dtype=np.float32)
+    for j, col in enumerate(feature_cols):
+        matrix[:, j] = df[col].to_numpy(dtype=np.float32, na_value=np.nan)
+    np.nan_to_num(matrix, copy=False, nan=0.0)
+
+    X_num = pd.DataFrame(matrix, columns=feature_cols, index=df.index, copy=False)
+    X_num.attrs[FEATURE_MATRIX_FLAG] = True
+
+    y = df[target]
+    if y.dtype == 'object' or isinstance(y.dtype, pd.CategoricalDtype):
+        from sklearn.preprocessing import LabelEncoder
+        encoder = LabelEncoder()
+        y = pd.Series(encoder.fit_transform(y.astype(str)), name=target, index=df.index)
+        # Original labels for the codes, carried into evaluate_models' results (and model bundles)
+        y.attrs["classes"] = encoder.classes_.tolist()
+    return X_num, y
+
+
+def _is_feature_matrix(X: pd.DataFrame) -> bool:
+    """
+    attrs survive assign()/concat(), so the flag alone is not trusted: the frame must
+    still be all float32 without NaN (min() propagates NaN without a mask copy).
+    """
+    if not X.attrs.get(FEATURE_MATRIX_FLAG) or X.shape[1] == 0:
+        return False
+    if not all(dtype == np.float32 for dtype in X.dtypes):
+        return False
+    return not np.isnan(X.to_numpy().min())
+
+
+def numeric_features(X: pd.DataFrame) -> pd.DataFrame:
+    """X's numeric columns with NaN -> 0; a prebuilt feature matrix passes through uncopied."""
+    if _is_feature_matrix(X):
+        return X
+    return X.select_dtypes(include=[np.number]).fillna(0)
@@ -1,10 +1,43 @@
 # utils/logger.py
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; span fields (from `extra={"span": ...}`) are merged in."""
+
+    def format(self, record):
+        payload = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(getattr(record, "span", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+# Handlers run on a background listener thread so logging never blocks a stage
+_log_queue = queue.SimpleQueue()
+_file_handler = logging.FileHandler("explainml.log")
+_file_handler.setFormatter(JsonFormatter())
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+_listener = logging.handlers.QueueListener(_log_queue, _file_handler, _stream_handler, respect_handler_level=True)
+_listener.start()
+atexit.register(_listener.stop)
+
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # final formatting happens on the listener
 
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.FileHandler("explainml.log"), logging.StreamHandler()]
+    handlers=[_queue_handler]
 )
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
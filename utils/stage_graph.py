@@ -0,0 +1,72 @@
+# utils/stage_graph.py
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StageFailed(Exception):
+    """Raised in place of a stage's output when the stage (or a required input) failed."""
+
+
+class StageGraph:
+    """
+    Pipeline stages as a DAG, run on a thread pool as soon as their inputs are ready.
+    Each stage is `func(results)` where `results` maps finished stage names to outputs.
+    `requires` are hard dependencies (a failure skips the stage); `after` are soft ones
+    the stage waits for but can run without (their result is then missing).
+    Heavy stages release the GIL in numpy/sklearn or fan out to the process pool.
+    `exclusive` stages (process pools, pyplot) never run at the same time as each other.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+
+    def add(self, name, func, requires=(), after=(), exclusive=False):
+        for dep in (*requires, *after):
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'.")
+        self.stages[name] = {"func": func, "requires": tuple(requires), "after": tuple(after),
+                             "exclusive": exclusive}
+        return self
+
+    def run(self):
+        """
+        Yield (name, result, error) in completion order; the caller (e.g. the Streamlit
+        script thread) renders each stage as it arrives. Skipped stages come back with a
+        StageFailed error naming the failed input.
+        """
+        results, errors, pending, running = {}, {}, dict(self.stages), {}
+
+        def ready(stage):
+            deps = stage["requires"] + stage["after"]
+            if not all(dep in results or dep in errors for dep in deps):
+                return False
+            return not (stage["exclusive"] and any(self.stages[n]["exclusive"] for n in running.values()))
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="explainml-stage") as pool:
+            while pending or running:
+                for name in [n for n, stage in pending.items() if ready(stage)]:
+                    if not ready(pending[name]):
+                        continue  # an exclusive stage was just started in this sweep
+                    stage = pending.pop(name)
+                    failed = [dep for dep in stage["requires"] if dep in errors]
+                    if failed:
+                        errors[name] = StageFailed(f"skipped: '{failed[0]}' failed")
+                        yield name, None, errors[name]
+                        continue
+                    # Each stage runs in a copy of this context so spans reach the active tracer
+                    ctx = contextvars.copy_context()
+                    running[pool.submit(ctx.run, stage["func"], results)] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+                        yield name, None, e
+                    else:
+                        yield name, results[name], None
@@ -0,0 +1,294 @@
+# utils/tracing.py
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from utils.logger import logger
+
+
+def _proc_rss(pid="self"):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _descendant_pids():
+    """PIDs of this process' children, grandchildren, ... from /proc (Linux fallback)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+    found, frontier = [], [os.getpid()]
+    while frontier:
+        children = [pid for pid, ppid in parents.items() if ppid in frontier]
+        found.extend(children)
+        frontier = children
+    return found
+
+
+def rss_bytes(include_children=False):
+    """
+    Current resident set size of this process (None if unavailable); with
+    include_children, plus that of every descendant (e.g. process pool workers).
+    """
+    try:
+        import psutil
+        procs = [psutil.Process()]
+        if include_children:
+            procs += procs[0].children(recursive=True)
+        total = 0
+        for proc in procs:
+            try:
+                total += proc.memory_info().rss
+            except psutil.Error:
+                pass  # exited since it was listed
+        return total
+    except ImportError:
+        pass
+    try:
+        total = _proc_rss()
+    except (OSError, ValueError):
+        return None
+    if include_children:
+        for pid in _descendant_pids():
+            try:
+                total += _proc_rss(pid)
+            except (OSError, ValueError):
+                pass
+    return total
+
+
+class RSSSampler:
+    """
+    Background thread that records the process' peak RSS while a block runs;
+    include_children adds the RSS of its worker processes to every sample.
+    """
+
+    def __init__(self, interval=0.01, include_children=False):
+        self.interval = interval
+        self.include_children = include_children
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = rss_bytes(self.include_children)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes(self.include_children)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        rss = rss_bytes(self.include_children)
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+        return False
+
+
+class _PeakWatch:
+    def __init__(self, start):
+        self.start = self.peak = start
+
+    def observe(self, rss):
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+
+
+class _PeakMonitor:
+    """
+    One shared sampling thread for all open spans: it polls RSS while at least one
+    span is watching and feeds every sample to each of them, then exits.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._watches = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self):
+        watch = _PeakWatch(rss_bytes())
+        with self._lock:
+            self._watches.add(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="explainml-rss", daemon=True)
+                self._thread.start()
+        return watch
+
+    def release(self, watch):
+        watch.observe(rss_bytes())
+        with self._lock:
+            self._watches.discard(watch)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._watches:
+                    self._thread = None
+                    return
+                watches = list(self._watches)
+            rss = rss_bytes()
+            for watch in watches:
+                watch.observe(rss)
+            time.sleep(self.interval)
+
+
+_peak_monitor = _PeakMonitor()
+
+
+class Span:
+    def __init__(self, name, parent=None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+        self.attrs = attrs
+        self.start = None
+        self.duration = None
+        self.thread_id = threading.get_ident()
+
+    def set(self, **attrs):
+        """Attach extra attributes (e.g. rows/cols known only mid-stage)."""
+        self.attrs.update(attrs)
+
+    def to_dict(self):
+        return {
+            "span": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "depth": self.depth,
+            "start": self.start,
+            "duration_s": round(self.duration, 6) if self.duration is not None else None,
+            **self.attrs,
+        }
+
+
+class Tracer:
+    """
+    Collects timed spans for one run. Each span records wall time, the RSS
+    high-water mark while it was open and optional row/column counts; finished
+    spans are logged as structured JSON and can be exported as a Chrome trace.
+    With `max_spans`, only the most recent spans are kept.
+    """
+
+    def __init__(self, sample_memory=True, max_spans=None):
+        self.sample_memory = sample_memory
+        self.spans = deque(maxlen=max_spans)
+        self._stack = threading.local()
+        self._origin = time.perf_counter()
+
+    def _current(self):
+        stack = getattr(self._stack, "spans", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name, data=None, rows=None, cols=None, **attrs):
+        shape = getattr(data, "shape", None)
+        if shape is not None:
+            rows = rows if rows is not None else shape[0]
+            cols = cols if cols is not None else (shape[1] if len(shape) > 1 else 1)
+        if rows is not None:
+            attrs["rows"] = int(rows)
+        if cols is not None:
+            attrs["cols"] = int(cols)
+
+        span = Span(name, parent=self._current(), **attrs)
+        if not hasattr(self._stack, "spans"):
+            self._stack.spans = []
+        self._stack.spans.append(span)
+
+        watch = _peak_monitor.watch() if self.sample_memory else None
+        span.start = time.perf_counter() - self._origin
+        try:
+            yield span
+        except Exception as e:
+            span.set(error=f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            span.duration = time.perf_counter() - self._origin - span.start
+            if watch:
+                _peak_monitor.release(watch)
+                if watch.peak is not None:
+                    span.set(peak_rss_mb=round(watch.peak / 2**20, 1),
+                             rss_growth_mb=round((watch.peak - watch.start) / 2**20, 1))
+            self._stack.spans.pop()
+            self.spans.append(span)
+            logger.info(f"{name} finished in {span.duration:.3f}s", extra={"span": span.to_dict()})
+
+    def summary(self, max_depth=None):
+        """Finished spans in start order, as plain dicts (for tables/JSON)."""
+        spans = sorted(self.spans, key=lambda s: s.start)
+        return [s.to_dict() for s in spans if max_depth is None or s.depth <= max_depth]
+
+    def to_chrome_trace(self):
+        """Trace-event format, loadable in chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        events = []
+        for s in sorted(self.spans, key=lambda s: s.start):
+            events.append({
+                "name": s.name,
+                "ph": "X",
+                "ts": round(s.start * 1e6, 1),
+                "dur": round(s.duration * 1e6, 1),
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": s.attrs,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, filepath="reports/trace.json"):
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+        return filepath
+
+
+# Spans outside use_tracer() (scripts, long-lived services) are logged; only the latest are kept
+DEFAULT_TRACER_SPANS = 1000
+_default_tracer = Tracer(max_spans=DEFAULT_TRACER_SPANS)
+_active_tracer = contextvars.ContextVar("explainml_tracer", default=_default_tracer)
+
+
+def get_tracer() -> Tracer:
+    return _active_tracer.get()
+
+
+@contextmanager
+def use_tracer(tracer: Tracer):
+    """Route spans opened in this thread/context to `tracer` (e.g. one per app run)."""
+    token = _active_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _active_tracer.reset(token)
+
+
+def span(name, data=None, rows=None, cols=None, **attrs):
+    """Time a block on the active tracer: `with span("training", data=X): ...`."""
+    return get_tracer().span(name, data=data, rows=rows, cols=cols, **attrs)
+
+
+def traced(name=None):
+    """Decorator form of `span`; rows/cols come from the first argument with a .shape."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            data = next((a for a in args if hasattr(a, "shape")), None)
+            with span(name or func.__name__, data=data):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
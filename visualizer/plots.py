@@ -1,17 +1,232 @@
 # visualizer/plots.py
-import matplotlib.pyplot as plt
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
 import shap
+from matplotlib.cm import ScalarMappable
+from matplotlib.figure import Figure
+
+from utils.cache import hash_bytes
+
+MAX_SCATTER_POINTS = 5000   # beeswarm above this many rows -> density bins or a subsample
+VECTOR_MAX_POINTS = 2000    # vector (SVG/PDF) output only while markers stay this few
+DENSITY_BINS = 120
+FIGURE_CACHE_SIZE = 16
+
+# Figures are plain Figure objects (never registered with pyplot), so threads can draw
+# at once without sharing pyplot's current figure or touching the global backend
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def _cached(key, draw):
+    """Return the figure drawn for `key` before, drawing and remembering it on a miss."""
+    with _figure_cache_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+    fig = draw()  # outside the lock: a concurrent miss on the same key just draws twice
+    with _figure_cache_lock:
+        fig = _figure_cache.setdefault(key, fig)
+        _figure_cache.move_to_end(key)
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return fig
+
+
+def _array_key(*arrays):
+    parts = []
+    for a in arrays:
+        a = np.ascontiguousarray(a.astype(str) if a.dtype == object else a)
+        parts.append(f"{a.dtype}{a.shape}{hash_bytes(a.view(np.uint8).reshape(-1).data)}")
+    return "|".join(parts)
+
+
+def _shap_matrix(shap_values):
+    """(rows, features) SHAP values: the positive class for binary models, mean |SHAP| over classes otherwise."""
+    values = np.asarray(getattr(shap_values, "values", shap_values), dtype=np.float32)
+    if values.ndim == 3:
+        values = values[:, :, 1] if values.shape[2] == 2 else np.abs(values).mean(axis=2)
+    return values
+
+
+def stratified_sample(values, n, seed=0):
+    """
+    Deterministic subsample of n rows stratified by total |SHAP| deciles, so the rare
+    high-impact rows that define a beeswarm's tails are kept in proportion.
+    """
+    if len(values) <= n:
+        return np.arange(len(values))
+    magnitude = np.abs(values).sum(axis=1)
+    strata = np.minimum((np.argsort(np.argsort(magnitude)) * 10) // len(values), 9)
+    rng = np.random.default_rng(seed)
+    picks = []
+    for s in range(10):
+        members = np.flatnonzero(strata == s)
+        take = int(round(n * len(members) / len(values)))
+        picks.append(rng.choice(members, min(take, len(members)), replace=False))
+    return np.sort(np.concatenate(picks))
+
+
+def _draw_density(values, features, names, max_display):
+    """
+    Beeswarm-like summary from per-feature density bins: each feature is one image row
+    whose opacity is the share of rows at that SHAP value and whose color is their mean
+    (percentile-scaled) feature value. One image artist regardless of row count.
+    """
+    order = np.argsort(np.abs(values).mean(axis=0))[::-1][:max_display]
+    values, features = values[:, order], features[:, order]
+    n_rows, n_feat = values.shape
+
+    # Color/axis bounds from a strided probe; exact quantiles of every row buy nothing visible
+    step = max(1, n_rows // 20_000)
+    lo, hi = np.percentile(values[::step], [0, 100])
+    if hi <= lo:
+        lo, hi = lo - 1, hi + 1
+    bins = np.clip(((values - lo) / (hi - lo) * DENSITY_BINS).astype(np.int64), 0, DENSITY_BINS - 1)
+
+    f_lo, f_hi = np.nanpercentile(features[::step], [5, 95], axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scaled = np.clip((features - f_lo) / np.where(f_hi > f_lo, f_hi - f_lo, 1.0), 0, 1)
+    scaled = np.nan_to_num(scaled, nan=0.5)
 
-def plot_shap_summary(shap_data):
-    """Plot SHAP summary using matplotlib backend."""
-    fig, ax = plt.subplots(figsize=(8, 6))
-    shap.summary_plot(shap_data["shap_values"], shap_data["data_sample"], show=False)
+    # One bincount over (feature, bin) cells for counts and summed feature values
+    cells = (bins + np.arange(n_feat) * DENSITY_BINS).ravel()
+    counts = np.bincount(cells, minlength=n_feat * DENSITY_BINS).reshape(n_feat, DENSITY_BINS)
+    sums = np.bincount(cells, weights=scaled.ravel(), minlength=n_feat * DENSITY_BINS).reshape(n_feat, DENSITY_BINS)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_value = np.where(counts > 0, sums / counts, 0.5)
+
+    image = shap.plots.colors.red_blue(mean_value)
+    density = counts / np.maximum(counts.max(axis=1, keepdims=True), 1)
+    image[..., 3] = np.sqrt(density)
+
+    fig = Figure(figsize=(8, max(3, 0.4 * n_feat + 1.5)))
+    ax = fig.subplots()
+    ax.imshow(image, aspect="auto", interpolation="nearest",
+              extent=(lo, hi, -0.5, n_feat - 0.5))
+    ax.set_yticks(range(n_feat))
+    ax.set_yticklabels([names[i] for i in order][::-1])
+    ax.axvline(0, color="#999999", linewidth=0.8, zorder=0)
+    ax.set_xlabel("SHAP value (impact on model output)")
+    ax.set_title(f"SHAP summary ({n_rows:,} rows, density)", fontsize=10)
+    sm = ScalarMappable(cmap=shap.plots.colors.red_blue)
+    cbar = fig.colorbar(sm, ax=ax, ticks=[0, 1], aspect=40)
+    cbar.set_ticklabels(["Low", "High"])
+    cbar.set_label("Feature value")
+    fig.subplots_adjust(left=0.25)  # fixed margins; savefig(bbox_inches="tight") trims the rest
     return fig
 
+
+def _swarm_offsets(shaps, row_height=0.4, n_bins=100):
+    """
+    Vertical jitter for one beeswarm row, as shap's summary plot does it: points that
+    share one of `n_bins` SHAP-value bins stack outward alternately above and below.
+    """
+    span = shaps.max() - shaps.min()
+    quant = np.round(n_bins * (shaps - shaps.min()) / (span + 1e-8))
+    order = np.lexsort((np.random.default_rng(0).random(len(shaps)), quant))
+    sorted_bins = quant[order]
+    starts = np.r_[0, np.flatnonzero(np.diff(sorted_bins)) + 1]
+    layer = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+    ys = np.empty(len(shaps))
+    ys[order] = np.ceil(layer / 2) * (layer % 2 * 2 - 1)
+    return ys * 0.9 * (row_height / np.max(np.abs(ys) + 1))
+
+
+def _draw_points(values, features, names, max_display):
+    """shap's beeswarm summary, drawn on its own Figure (one scatter per feature row)."""
+    order = np.argsort(np.abs(values).mean(axis=0))[::-1][:max_display]
+    n_feat = len(order)
+    fig = Figure(figsize=(8, 0.4 * n_feat + 1.5))
+    ax = fig.subplots()
+    cmap = shap.plots.colors.red_blue
+    for pos, i in enumerate(order[::-1]):
+        shaps, feature = values[:, i], features[:, i].astype(np.float64)
+        ax.axhline(pos, color="#cccccc", lw=0.5, dashes=(1, 5), zorder=-1)
+        ys = pos + _swarm_offsets(shaps)
+        nan_mask = np.isnan(feature)
+        present = feature[~nan_mask]
+        vmin, vmax = np.percentile(present, [5, 95]) if len(present) else (0.0, 1.0)
+        if vmax <= vmin and len(present):
+            vmin, vmax = present.min(), present.max()
+        ax.scatter(shaps[nan_mask], ys[nan_mask], color="#777777", s=16, linewidth=0, zorder=3)
+        ax.scatter(shaps[~nan_mask], ys[~nan_mask], c=np.clip(feature[~nan_mask], vmin, vmax), cmap=cmap,
+                   vmin=vmin, vmax=vmax, s=16, linewidth=0, zorder=3)
+    ax.axvline(0, color="#999999", zorder=-1)
+    ax.set_yticks(range(n_feat))
+    ax.set_yticklabels([names[i] for i in order][::-1])
+    ax.set_ylim(-1, n_feat)
+    ax.set_xlabel("SHAP value (impact on model output)")
+    for side in ("right", "top", "left"):
+        ax.spines[side].set_visible(False)
+    cbar = fig.colorbar(ScalarMappable(cmap=cmap), ax=ax, ticks=[0, 1], aspect=80)
+    cbar.set_ticklabels(["Low", "High"])
+    cbar.set_label("Feature value")
+    cbar.outline.set_visible(False)
+    fig.subplots_adjust(left=0.25)
+    return fig
+
+
+def plot_shap_summary(shap_data, mode="auto", max_points=MAX_SCATTER_POINTS, max_display=20):
+    """
+    Plot SHAP summary as a matplotlib Figure.
+    mode="points" draws shap's beeswarm, "sample" draws it on a stratified subsample of
+    `max_points` rows and "density" pre-aggregates into per-feature bins; "auto" picks
+    points for small inputs and density above `max_points`. Figures are cached by input.
+    """
+    values = _shap_matrix(shap_data["shap_values"])
+    data = shap_data["data_sample"]
+    names = list(data.columns) if isinstance(data, pd.DataFrame) else [f"Feature {i}" for i in range(values.shape[1])]
+    features = np.asarray(data, dtype=np.float32)
+    if mode == "auto":
+        mode = "points" if len(values) <= max_points else "density"
+
+    def draw():
+        if mode == "density":
+            fig = _draw_density(values, features, names, max_display)
+            fig.explainml_points = 0
+            return fig
+        rows = stratified_sample(values, max_points) if mode == "sample" else np.arange(len(values))
+        fig = _draw_points(values[rows], features[rows], names, max_display)
+        n_points = len(rows) * min(max_display, values.shape[1])
+        for artist in fig.axes[0].collections:
+            artist.set_rasterized(n_points > VECTOR_MAX_POINTS)
+        fig.explainml_points = n_points
+        return fig
+
+    key = ("shap_summary", mode, max_points, max_display, tuple(names), _array_key(values, features))
+    return _cached(key, draw)
+
+
+def figure_bytes(fig, fmt=None, dpi=110):
+    """
+    Serialize a figure for reports: SVG while it has few enough markers to stay
+    light as vectors, PNG otherwise. Returns (bytes, mime type).
+    """
+    if fmt is None:
+        fmt = "svg" if getattr(fig, "explainml_points", 0) <= VECTOR_MAX_POINTS else "png"
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi, bbox_inches="tight")
+    return buffer.getvalue(), {"svg": "image/svg+xml", "png": "image/png", "pdf": "application/pdf"}[fmt]
+
+
 def plot_confusion_matrix(y_true, y_pred):
     from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
-    fig, ax = plt.subplots()
-    cm = confusion_matrix(y_true, y_pred)
-    disp = ConfusionMatrixDisplay(cm)
-    disp.plot(ax=ax)
-    return fig
\ No newline at end of file
+
+    y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+
+    def draw():
+        fig = Figure()
+        ax = fig.subplots()
+        cm = confusion_matrix(y_true, y_pred)
+        disp = ConfusionMatrixDisplay(cm)
+        # Per-cell labels only while they stay readable
+        disp.plot(ax=ax, include_values=len(cm) <= 20)
+        fig.explainml_points = 0
+        return fig
+
+    return _cached(("confusion_matrix", _array_key(y_true, y_pred)), draw)